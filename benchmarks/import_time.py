@@ -0,0 +1,64 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+Benchmark import time with python -X importtime:
+    python benchmarks/import_time.py [module ...] [--n-slowest N]
+"""
+
+from argparse import ArgumentParser
+from os.path import abspath, dirname
+from subprocess import PIPE, run
+from sys import executable
+
+
+def time_import(module):
+    """
+    Import module in a fresh interpreter with -X importtime.
+    :param module: str;
+    :return: list; [(cumulative microseconds, self microseconds, module name), ...] in import order
+    """
+
+    completed_process = run(
+        [executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        cwd=dirname(dirname(abspath(__file__))),
+        stdout=PIPE,
+        stderr=PIPE,
+        universal_newlines=True)
+    if completed_process.returncode:
+        raise RuntimeError(completed_process.stderr)
+
+    times = []
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    return times
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=['ccal'])
+    parser.add_argument('--n-slowest', type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        times = time_import(module)
+        total_us = max(t[0] for t in times if t[2].strip() == module)
+        print('import {}: {:.1f} ms ({} modules)'.format(
+            module, total_us / 1000, len(times)))
+        times = [
+            t for t in sorted(times, reverse=True) if t[2].strip() != module
+        ]
+        for cumulative_us, self_us, name in times[:args.n_slowest]:
+            print('\t{:>10.1f} ms  {}'.format(cumulative_us / 1000, name))
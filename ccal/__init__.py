@@ -14,19 +14,71 @@ Authors:
 RANDOM_SEED = 20121020
 
 import sys
-
-from .computational_cancer_biology import (association, gsea, inference,
-                                           mutual_vulnerability, oncogps)
-from .support.file import (load_data_table, read_gct, read_gmt, read_gmts,
-                           write_data_table, write_gct, write_rnk)
-from .support.plot import (plot_clustermap, plot_distribution, plot_heatmap,
-                           plot_nmf, plot_points, plot_violin_box_or_bar)
-from .support.system import install_libraries
+from importlib import import_module
 
 sys.setrecursionlimit(10000)
 
-install_libraries([
-    'rpy2',
-    'biopython',
-    'plotly',
-])
+# Submodules and functions exported by ccal, imported on first access so that importing ccal (and each worker process
+# importing ccal) doesn't import matplotlib, seaborn, rpy2, sklearn, statsmodels, ...
+LAZY_SUBMODULES = {
+    'association': '.computational_cancer_biology.association',
+    'gsea': '.computational_cancer_biology.gsea',
+    'inference': '.computational_cancer_biology.inference',
+    'mutual_vulnerability': '.computational_cancer_biology.mutual_vulnerability',
+    'oncogps': '.computational_cancer_biology.oncogps',
+}
+LAZY_FUNCTIONS = {
+    'load_data_table': '.support.file',
+    'read_gct': '.support.file',
+    'read_gene_sets': '.support.file',
+    'read_gmt': '.support.file',
+    'read_gmts': '.support.file',
+    'write_data_table': '.support.file',
+    'write_gct': '.support.file',
+    'write_rnk': '.support.file',
+    'plot_clustermap': '.support.plot',
+    'plot_distribution': '.support.plot',
+    'plot_heatmap': '.support.plot',
+    'plot_nmf': '.support.plot',
+    'plot_points': '.support.plot',
+    'plot_violin_box_or_bar': '.support.plot',
+    'install_libraries': '.support.system',
+}
+
+
+def __getattr__(name):
+    """
+    Import a lazily exported submodule or function on first access (PEP 562).
+    :param name: str;
+    :return: module or function;
+    """
+
+    if name in LAZY_SUBMODULES:
+        attribute = import_module(LAZY_SUBMODULES[name], __name__)
+    elif name in LAZY_FUNCTIONS:
+        attribute = getattr(
+            import_module(LAZY_FUNCTIONS[name], __name__), name)
+    else:
+        raise AttributeError('module {} has no attribute {}.'.format(
+            __name__, name))
+
+    # Import only once
+    globals()[name] = attribute
+
+    return attribute
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_SUBMODULES) | set(LAZY_FUNCTIONS))
+
+
+if sys.version_info < (3, 7):  # Module __getattr__ (PEP 562) needs a module subclass before Python 3.7
+
+    class _LazyModule(type(sys)):
+        def __getattr__(self, name):
+            return __getattr__(name)
+
+        def __dir__(self):
+            return __dir__()
+
+    sys.modules[__name__].__class__ = _LazyModule
@@ -14,15 +14,10 @@ Authors:
 from math import ceil, sqrt
 from os.path import join
 
-from matplotlib.colorbar import ColorbarBase, make_axes
-from matplotlib.gridspec import GridSpec
-from matplotlib.pyplot import figure, subplot
 from numpy import array, unique
 from numpy.random import choice, get_state, seed, set_state, shuffle
 from pandas import DataFrame, Series, concat, read_csv
 from scipy.stats import norm
-from seaborn import heatmap
-from statsmodels.sandbox.stats.multicomp import multipletests
 
 from .. import RANDOM_SEED
 from ..machine_learning.score import compute_similarity_matrix
@@ -30,13 +25,9 @@ from ..mathematics.information import information_coefficient
 from ..support.d1 import get_unique_in_order
 from ..support.d2 import (get_top_and_bottom_indices, normalize_2d_or_1d,
                           split_dataframe)
-from ..support.file import establish_filepath
+from ..support.file import establish_filepath, load_matrix
 from ..support.log import print_log
 from ..support.parallel_computing import parallelize
-from ..support.plot import (CMAP_BINARY, CMAP_CATEGORICAL,
-                            CMAP_CONTINUOUS_ASSOCIATION, FIGURE_SIZE,
-                            FONT_LARGER, FONT_LARGEST, FONT_STANDARD, SPACING,
-                            plot_clustermap, save_plot)
 from ..support.str_ import title_str, untitle_str
 
 
@@ -54,7 +45,7 @@ def make_association_summary_panel(target,
     """
     Plot summary association panel.
     :param target: Series; (n_elements);
-    :param data_bundle: dict;
+    :param data_bundle: dict; features may be DataFrame or LazyMatrix (see load_data_table)
     :param annotation_files: dict;
     :param order: iterable;
     :param target_ascending: bool;
@@ -64,6 +55,14 @@ def make_association_summary_panel(target,
     :return: None
     """
 
+    from matplotlib.colorbar import ColorbarBase, make_axes
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import figure, subplot
+    from seaborn import heatmap
+
+    from ..support.plot import (FIGURE_SIZE, FONT_LARGER, FONT_LARGEST,
+                                FONT_STANDARD, SPACING, save_plot)
+
     # Prepare target for plotting
     target, target_min, target_max, target_cmap = _prepare_data_for_plotting(
         target, target_type)
@@ -96,8 +95,8 @@ def make_association_summary_panel(target,
         order = sorted(data_bundle.keys())
     for features_name, features_dict in [(k, data_bundle[k]) for k in order]:
 
-        # Read features
-        features = features_dict['dataframe']
+        # Read features (only columns in target if on disk)
+        features = load_matrix(features_dict['dataframe'], columns=target.index)
 
         # Prepare features for plotting
         features, features_min, features_max, features_cmap = _prepare_data_for_plotting(
@@ -242,7 +241,7 @@ def make_association_panels(target,
     """
     Annotate target with each features in the features bundle.
     :param target: DataFrame or Series; (n_targets, n_elements) or (n_elements)
-    :param data_bundle: dict;
+    :param data_bundle: dict; features may be DataFrame or LazyMatrix (see load_data_table)
     :param dropna: str; 'any' or 'all'
     :param target_ascending: bool; target is ascending from left to right or not
     :param target_prefix: str; prefix added before the target name
@@ -280,7 +279,7 @@ def make_association_panels(target,
 
             make_association_panel(
                 t,
-                data_dict['dataframe'],
+                load_matrix(data_dict['dataframe'], columns=t.index),
                 dropna=dropna,
                 target_ascending=target_ascending,
                 n_jobs=n_jobs,
@@ -451,6 +450,8 @@ def compute_association(target,
                                             'fdr (forward)', 'fdr (reverse)', 'fdr'))
     """
 
+    from statsmodels.sandbox.stats.multicomp import multipletests
+
     # TODO: make empty DataFrame to absorb the results instead of concatenation
 
     # Make sure target is a Series and features a DataFrame
@@ -728,6 +729,12 @@ def _plot_association_panel(target,
     :return: None
     """
 
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import figure, subplot
+    from seaborn import heatmap
+
+    from ..support.plot import FONT_LARGEST, FONT_STANDARD, SPACING, save_plot
+
     # Prepare target for plotting
     target, target_min, target_max, target_cmap = _prepare_data_for_plotting(
         target, target_type)
@@ -837,6 +844,9 @@ def _plot_association_panel(target,
 
 
 def _prepare_data_for_plotting(dataframe, data_type, max_std=3):
+    from ..support.plot import (CMAP_BINARY, CMAP_CATEGORICAL,
+                                CMAP_CONTINUOUS_ASSOCIATION)
+
     if data_type == 'continuous':
         return normalize_2d_or_1d(
             dataframe, method='-0-',
@@ -879,6 +889,8 @@ def make_comparison_panel(matrix1,
     :return: DataFrame; association or distance matrix
     """
 
+    from ..support.plot import plot_clustermap
+
     # Compute association or distance matrix, which is returned at the end
     comparison_matrix = compute_similarity_matrix(
         matrix2, matrix1, function, axis=axis, is_distance=is_distance)
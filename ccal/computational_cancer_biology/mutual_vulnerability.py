@@ -11,32 +11,42 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from os.path import join
+from hashlib import sha1
+from os.path import isfile, join
+from pickle import dump, load
 
-from matplotlib.gridspec import GridSpec
-from matplotlib.pyplot import close, figure, plot, show, subplot
-from numpy import argmin, asarray, cumsum, empty, linspace, log, sign, where
+from numpy import (arange, asarray, ceil, cumsum, empty, isin, isnan, linspace,
+                   log, nan, nanmax, nanmin, sign, where, zeros)
 from pandas import DataFrame, Index, Series, concat
-from seaborn import distplot, rugplot
-from statsmodels.sandbox.distributions.extras import ACSkewT_gen
 
-from ..mathematics.equation import define_x_coordinates_for_reflection
-from ..support.d1 import normalize_1d
+from ..machine_learning.fit import fit_skew_t
+from ..mathematics.equation import (define_skew_t_pdf,
+                                    define_x_coordinates_for_reflection)
 from ..support.d2 import split_dataframe
 from ..support.file import establish_filepath
 from ..support.parallel_computing import parallelize
-from ..support.plot import (CMAP_CATEGORICAL, DPI, FIGURE_SIZE, decorate,
-                            save_plot)
 
+# Essentiality index raising fractional difference to each feature's scale
+SCALED_FRACTIONAL_DIFFERENCE = 'where(f2 < f1, ((f1 - f2) / f1)**scale, 0)'
 
-def fit_essentiality(feature_x_sample, filepath_prefix, features=(), n_jobs=1):
+
+def fit_essentiality(feature_x_sample,
+                     filepath_prefix,
+                     features=(),
+                     n_jobs=1,
+                     cache=False):
     """
-    Fit skew-t PDF to the distribution of each feature, gene.
+    Fit skew-t PDF to the distribution of each feature, gene. Features with 0
+    variance (fewer than 2 distinct non-NaN values) can't be fit and are
+    skipped.
     :param feature_x_sample: DataFrame; (n_features, n_samples)
     :param filepath_prefix: str;
     :param features: iterable; selected features to fit
     :param n_jobs: int; number of jobs for parallel computing
-    :return: DataFrame; (n_features, 5 [N, DF, Shape, Location, Scale])
+    :param cache: bool; reuse fits of features whose values are unchanged
+    (keyed by the hash of the values) from <filepath_prefix>skew_t_fit.cache.pkl
+    and update it
+    :return: DataFrame; (n_fit_features, 5 [N, DF, Shape, Location, Scale])
     """
     if len(features):  # Fit selected features
         is_ = Index(features) & feature_x_sample.index
@@ -48,10 +58,53 @@ def fit_essentiality(feature_x_sample, filepath_prefix, features=(), n_jobs=1):
     else:  # Fit all features
         print('Fitting all features ...')
 
-    print('Fitting with {} jobs ...'.format(n_jobs))
-    f_x_f = concat(
-        parallelize(_fit_essentiality,
-                    split_dataframe(feature_x_sample, n_jobs), n_jobs))
+    is_constant = (feature_x_sample.nunique(axis=1) < 2).values
+    if is_constant.any():
+        print('Skipping {} features with 0 variance: {} ...'.format(
+            is_constant.sum(), ', '.join(
+                map(str, feature_x_sample.index[is_constant]))))
+        feature_x_sample = feature_x_sample.ix[~is_constant, :]
+
+    # Hash each feature's values and look up cached fits
+    cache_filepath = '{}skew_t_fit.cache.pkl'.format(filepath_prefix)
+    fits = {}
+    if cache:
+        hashes = Series(
+            [
+                sha1(asarray(f_v.dropna(), dtype=float).tobytes()).hexdigest()
+                for f_i, f_v in feature_x_sample.iterrows()
+            ],
+            index=feature_x_sample.index)
+        if isfile(cache_filepath):
+            with open(cache_filepath, 'rb') as f:
+                fits = load(f)
+        is_cached = hashes.isin(list(fits)).values
+        print('Using {} cached fits ...'.format(is_cached.sum()))
+    else:
+        is_cached = zeros(feature_x_sample.shape[0], dtype=bool)
+
+    f_x_f = DataFrame(
+        index=feature_x_sample.index,
+        columns=['N', 'DF', 'Shape', 'Location', 'Scale'],
+        dtype=float)
+
+    f_x_s = feature_x_sample.ix[~is_cached, :]
+    if f_x_s.shape[0]:
+        n_jobs = min(n_jobs, f_x_s.shape[0])
+        print('Fitting {} features with {} jobs ...'.format(f_x_s.shape[0],
+                                                            n_jobs))
+        f_x_f.ix[f_x_s.index, :] = concat(
+            parallelize(_fit_essentiality,
+                        split_dataframe(f_x_s, n_jobs), n_jobs))
+
+    if cache:
+        for f_i, h in hashes.ix[is_cached].iteritems():
+            f_x_f.ix[f_i, :] = fits[h]
+        for f_i, h in hashes.ix[~is_cached].iteritems():
+            fits[h] = tuple(f_x_f.ix[f_i, :])
+        establish_filepath(cache_filepath)
+        with open(cache_filepath, 'wb') as f:
+            dump(fits, f)
 
     # Sort by shape
     f_x_f.sort_values('Shape', inplace=True)
@@ -64,19 +117,19 @@ def fit_essentiality(feature_x_sample, filepath_prefix, features=(), n_jobs=1):
 
 
 def _fit_essentiality(f_x_s):
-    f_x_f = DataFrame(
-        index=f_x_s.index, columns=['N', 'DF', 'Shape', 'Location', 'Scale'])
-
-    for i, (f_i, f_v) in enumerate(f_x_s.iterrows()):
-        print('Fitting {} (@{}/{}) ...'.format(f_i, i, f_x_s.shape[0]))
+    """
+    Fit skew-t PDF to the distribution of each feature in a block.
+    :param f_x_s: DataFrame; (n_features, n_samples)
+    :return: DataFrame; (n_features, 5 [N, DF, Shape, Location, Scale])
+    """
 
-        # Fit skew-t PDF and save
-        skew_t = ACSkewT_gen()
-        f_v.dropna(inplace=True)
-        df, shape, location, scale = skew_t.fit(f_v)
-        f_x_f.ix[f_i, :] = f_v.size, df, shape, location, scale
+    print('Fitting {} features ({} ... {}) ...'.format(
+        f_x_s.shape[0], f_x_s.index[0], f_x_s.index[-1]))
 
-    return f_x_f
+    return DataFrame(
+        [fit_skew_t(f_v) for f_v in asarray(f_x_s, dtype=float)],
+        index=f_x_s.index,
+        columns=['N', 'DF', 'Shape', 'Location', 'Scale'])
 
 
 def plot_essentiality(feature_x_sample,
@@ -85,12 +138,12 @@ def plot_essentiality(feature_x_sample,
                       directory_path,
                       features=(),
                       enumerate_functions=False,
-                      figure_size=FIGURE_SIZE,
+                      figure_size=None,
                       n_x_grids=3000,
                       n_bins=50,
                       plot_fits=True,
                       show_plot=True,
-                      dpi=DPI):
+                      dpi=None):
     """
     Make essentiality plot for each gene.
     :param feature_x_sample: DataFrame or str;
@@ -105,15 +158,29 @@ def plot_essentiality(feature_x_sample,
 
     :param enumerate_functions: bool;
 
-    :param figure_size: tuple; figure size
+    :param figure_size: tuple; figure size; support.plot.FIGURE_SIZE if None
     :param n_x_grids: int; number of x grids
     :param n_bins: int; number of histogram bins
     :param plot_fits: bool; plot fitted lines or not
     :param show_plot: bool; show plot or not
-    :param dpi: int; dots per inch
+    :param dpi: int; dots per inch; support.plot.DPI if None
     :return: None
     """
 
+    # Plotting and statsmodels are imported only when plotting
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import close, figure, plot, show, subplot
+    from seaborn import distplot, rugplot
+    from statsmodels.sandbox.distributions.extras import ACSkewT_gen
+
+    from ..support.plot import (CMAP_CATEGORICAL, DPI, FIGURE_SIZE, decorate,
+                                save_plot)
+
+    if figure_size is None:
+        figure_size = FIGURE_SIZE
+    if dpi is None:
+        dpi = DPI
+
     # ==========================================================================
     # Select features to plot
     # ==========================================================================
@@ -404,87 +471,161 @@ def make_essentiality_matrix(feature_x_sample,
                              feature_x_fit,
                              n_grids=3000,
                              function='scaled_fractional_difference',
-                             factor=1):
+                             factor=1,
+                             n_jobs=1,
+                             batch_size=500):
     """
 
     :param feature_x_sample: DataFrame; (n_features, n_samples)
-    :param feature_x_fit: DataFrame;
+    :param feature_x_fit: DataFrame; (n_features, 5 [N, DF, Shape, Location,
+    Scale]); indexed by feature
     :param n_grids: int;
-    :param function: str;
+    :param function: str; 'scaled_fractional_difference' or an expression of
+    f1, f2, carea1, carea2, and scale (each feature's fitted scale)
     :param factor: number;
+    :param n_jobs: int; number of jobs for parallel computing
+    :param batch_size: int; number of features to compute in 1 array pass
     :return: DataFrame; (n_features, n_samples)
     """
 
     print('\tApplying {} to each feature ...'.format(function))
 
-    empty_ = empty(feature_x_sample.shape)
+    feature_x_fit = feature_x_fit.ix[feature_x_sample.index,
+                                     ['N', 'DF', 'Shape', 'Location', 'Scale']]
 
-    skew_t = ACSkewT_gen()
+    n_jobs = min(n_jobs, feature_x_sample.shape[0])
+    args = [(f_x_s, feature_x_fit.ix[f_x_s.index, :], n_grids, function,
+             factor, batch_size)
+            for f_x_s in split_dataframe(feature_x_sample, n_jobs)]
 
-    for i, (f_i, f_v) in enumerate(feature_x_sample.iterrows()):
+    return concat(parallelize(_make_essentiality_matrix, args, n_jobs))
 
-        # Build skew-t PDF
-        grids = linspace(f_v.min(), f_v.max(), n_grids)
-        n, df, shape, location, scale = feature_x_fit.ix[i, :]
-        skew_t_pdf = skew_t.pdf(grids, df, shape, loc=location, scale=scale)
 
-        # Build reflected skew-t PDF
-        skew_t_pdf_r = skew_t.pdf(
-            define_x_coordinates_for_reflection(skew_t_pdf, grids),
-            df,
-            shape,
-            loc=location,
-            scale=scale)
+def _make_essentiality_matrix(args):
+    """
+    Make essentiality matrix for a block of features.
+    :param args: tuple; (feature_x_sample, feature_x_fit, n_grids, function,
+    factor, batch_size)
+    :return: DataFrame; (n_features, n_samples)
+    """
 
-        # Set up function
-        if function.startswith('scaled_fractional_difference'):
-            function = 'where(f2 < f1, ((f1 - f2) / f1)**{}, 0)'.format(scale)
+    f_x_s, f_x_f, n_grids, function, factor, batch_size = args
 
-        ei = _compute_essentiality_index(skew_t_pdf, skew_t_pdf_r, function,
-                                         ['+', '-'][shape > 0],
-                                         grids[1] - grids[0])
+    # Compile function once for all features
+    if function.startswith('scaled_fractional_difference'):
+        function = SCALED_FRACTIONAL_DIFFERENCE
+    function = compile(function, '<essentiality index>', 'eval')
 
-        ei = normalize_1d(ei, '0-1')
+    a = asarray(f_x_s, dtype=float)
+    matrix = empty(a.shape)
 
-        empty_[i, :] = ei[[argmin(abs(grids - x))
-                           for x in asarray(f_v)]] * sign(shape) * factor
+    # Compute essentiality indices of features in batches (in array passes)
+    for i in range(0, a.shape[0], batch_size):
+        matrix[i:i + batch_size] = _compute_essentiality_matrix(
+            a[i:i + batch_size],
+            asarray(f_x_f.iloc[i:i + batch_size], dtype=float), n_grids,
+            function, factor)
 
-    return DataFrame(
-        empty_, index=feature_x_sample.index, columns=feature_x_sample.columns)
+    return DataFrame(matrix, index=f_x_s.index, columns=f_x_s.columns)
+
+
+def _compute_essentiality_matrix(a, fits, n_grids, function, factor):
+    """
+    Compute essentiality indices of features' values in 1 array pass.
+    :param a: array; (n_features, n_samples)
+    :param fits: array; (n_features, 5 [N, DF, Shape, Location, Scale])
+    :param n_grids: int;
+    :param function: code; compiled essentiality-index expression
+    :param factor: number;
+    :return: array; (n_features, n_samples)
+    """
+
+    # (n_features, 1) parameters
+    n, df, shape, location, scale = (fits[:, i:i + 1] for i in range(5))
+
+    # (n_features, n_grids) grids
+    mins = nanmin(a, axis=1)[:, None]
+    maxs = nanmax(a, axis=1)[:, None]
+    grids = mins + (maxs - mins) * linspace(0, 1, n_grids)
+
+    # Build skew-t PDFs and reflected skew-t PDFs
+    skew_t_pdf = define_skew_t_pdf(grids, df, shape, location, scale)
+    skew_t_pdf_r = define_skew_t_pdf(
+        define_x_coordinates_for_reflection(skew_t_pdf, grids), df, shape,
+        location, scale)
+
+    eis = _compute_essentiality_index(
+        skew_t_pdf,
+        skew_t_pdf_r,
+        function,
+        where(0 < shape, '-', '+'),
+        grids[:, 1:2] - grids[:, :1],
+        scale=scale)
+
+    # 0-1 normalize each feature's indices (/ size if max - min = 0)
+    eis_min = eis.min(axis=1, keepdims=True)
+    eis_range = eis.max(axis=1, keepdims=True) - eis_min
+    eis = where(eis_range == 0, eis / n_grids,
+                (eis - eis_min) / where(eis_range == 0, 1, eis_range))
+
+    eis *= sign(shape) * factor
+
+    # Index each value's nearest grid (the lower one if tied) analytically
+    steps = (maxs - mins) / (n_grids - 1)
+    is_nan = isnan(a)
+    grid_indices = ceil((where(is_nan, mins, a) - mins) / where(
+        steps == 0, 1, steps) - 0.5)
+    grid_indices = grid_indices.clip(0, n_grids - 1).astype(int)
+
+    matrix = eis[arange(a.shape[0])[:, None], grid_indices]
+    matrix[is_nan] = nan
+
+    return matrix
 
 
 def _compute_essentiality_index(f1,
                                 f2,
                                 function,
                                 area_direction=None,
-                                delta=None):
+                                delta=None,
+                                scale=None):
     """
     Make a function from f1 and f2.
-    :param f1: array; function on the top
-    :param f2: array; function at the bottom
-    :param area_direction: str; {'+', '-'}
-    :param function: str; ei = eval(function)
+    :param f1: array; (n_grids) or (n_functions, n_grids); function on the
+    top
+    :param f2: array; (n_grids) or (n_functions, n_grids); function at the
+    bottom
+    :param area_direction: str or array; {'+', '-'} or (n_functions, 1) of
+    them
+    :param function: str or code; ei = eval(function)
+    :param delta: number or array; (n_functions, 1); grid size for computing
+    areas
+    :param scale: number or array; (n_functions, 1); skew-t scale, which
+    function can use
     :return: array; ei
     """
 
-    if 'area' in function:  # Compute cumulative area
+    if isinstance(function, str):
+        function = compile(function, '<essentiality index>', 'eval')
+
+    if {'carea1', 'carea2'} & set(
+            function.co_names):  # Compute cumulative area
 
         # Compute delta area
-        darea1 = f1 / f1.sum() * delta
-        darea2 = f2 / f2.sum() * delta
+        darea1 = f1 / f1.sum(axis=-1, keepdims=True) * delta
+        darea2 = f2 / f2.sum(axis=-1, keepdims=True) * delta
 
         # Compute cumulative area
-        if area_direction == '+':  # Forward
-            carea1 = cumsum(darea1)
-            carea2 = cumsum(darea2)
-
-        elif area_direction == '-':  # Reverse
-            carea1 = cumsum(darea1[::-1])[::-1]
-            carea2 = cumsum(darea2[::-1])[::-1]
-
-        else:
+        area_direction = asarray(area_direction)
+        if not isin(area_direction, ('+', '-')).all():
             raise ValueError(
                 'Unknown area_direction: {}.'.format(area_direction))
 
+        is_forward = area_direction == '+'
+        carea1 = where(is_forward, cumsum(darea1, axis=-1),
+                       cumsum(darea1[..., ::-1], axis=-1)[..., ::-1])
+        carea2 = where(is_forward, cumsum(darea2, axis=-1),
+                       cumsum(darea2[..., ::-1], axis=-1)[..., ::-1])
+
     # Compute essentiality index
     return eval(function)
@@ -11,42 +11,34 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from colorsys import hsv_to_rgb, rgb_to_hsv
+from inspect import signature
+from multiprocessing import current_process
 from os.path import join
+from pickle import dump, load
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.colorbar import ColorbarBase, make_axes
-from matplotlib.colors import Normalize
-from matplotlib.gridspec import GridSpec
-from matplotlib.path import Path
-from matplotlib.pyplot import figure, savefig, subplot
-from numpy import (asarray, empty, linspace, ma, nansum, ndarray, ones, sqrt,
-                   zeros, zeros_like)
+from numpy import (array_split, asarray, concatenate, dot, empty, exp, finfo,
+                   inf, isnan, linspace, ma, maximum, meshgrid, minimum,
+                   nansum, ndarray, ones, partition, sort, sqrt, stack, where,
+                   zeros_like)
 from pandas import DataFrame, Series, isnull
 from scipy.spatial import ConvexHull, Delaunay
 from scipy.cluster.hierarchy import dendrogram, linkage
-from sklearn.svm import SVR
 
 from .. import RANDOM_SEED
-from ..machine_learning.classify import classify
-from ..machine_learning.cluster import (hierarchical_consensus_cluster,
-                                        nmf_consensus_cluster)
 from ..machine_learning.fit import fit_matrix
-from ..machine_learning.multidimentional_scale import mds
 from ..machine_learning.score import compute_association_and_pvalue
 from ..machine_learning.solve import solve_matrix_linear_equation
 from ..mathematics.equation import define_exponential_function
-from ..mathematics.information import EPS, bcv, information_coefficient, kde2d
+from ..mathematics.information import (EPS, estimate_bandwidth_bcv,
+                                       estimate_kde_2d, information_coefficient)
 from ..support.d2 import (drop_na_2d, drop_uniform_slice_from_dataframe,
                           normalize_2d_or_1d)
 from ..support.file import establish_filepath, load_gct, read_gct, write_gct
 from ..support.log import print_log
-from ..support.plot import (CMAP_BINARY, CMAP_CATEGORICAL, CMAP_CONTINUOUS,
-                            DPI, FIGURE_SIZE, assign_colors_to_states,
-                            decorate, plot_heatmap, plot_nmf, plot_points,
-                            save_plot)
+from ..support.parallel_computing import parallelize
+
+# matplotlib, seaborn, and sklearn (and the modules using them) are imported in
+# the functions using them so that importing this module stays fast
 
 
 # ==============================================================================
@@ -79,7 +71,8 @@ def define_components(a_matrix,
     :param std_max: number;
     :param n_jobs: int;
     :param n_clusterings: int; number of NMF for consensus clustering
-    :param algorithm: str; 'Alternating Least Squares' or 'Lee & Seung'
+    :param algorithm: str; 'Alternating Least Squares', 'Lee & Seung', or
+    'Mini-batch'
     :param random_seed: int;
     :return: dict; {k: {
                         w: W matrix (n_rows, k),
@@ -90,6 +83,12 @@ def define_components(a_matrix,
                     }
     """
 
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.pyplot import savefig
+
+    from ..machine_learning.cluster import nmf_consensus_cluster
+    from ..support.plot import DPI, plot_nmf, plot_points
+
     # Load A matrix
     a_matrix = load_gct(a_matrix)
 
@@ -160,6 +159,7 @@ def solve_for_components(w_matrix,
                          a_matrix_normalization_axis=0,
                          std_max=3,
                          method='nnls',
+                         n_jobs=1,
                          filepath_prefix=None):
     """
     Get H matrix of a_matrix in the space of w_matrix by solving W * H = A
@@ -170,12 +170,16 @@ def solve_for_components(w_matrix,
     :param how_to_drop_na_in_a_matrix: str; {'all', 'any'}
     :param a_matrix_normalization_method: str; {'-0-_clip_shift', 'rank'}
     :param std_max: number;
-    :param method: str; {'nnls', 'pinv'}
+    :param method: str; {'nnls', 'batch_nnls', 'pinv'}; 'batch_nnls' solves
+    all columns together and is the fastest for many columns
+    :param n_jobs: int; number of jobs for 'nnls'
     :param filepath_prefix: str; filepath_prefix_solved_nmf_h_k{}.{gct,
     pdf} will be saved
     :return: DataFrame; (k, n_columns)
     """
 
+    from ..support.plot import plot_nmf
+
     # Load A and W matrices
     w_matrix = load_gct(w_matrix)
     a_matrix = load_gct(a_matrix)
@@ -205,7 +209,8 @@ def solve_for_components(w_matrix,
     # Solve W * H = A
     print_log('Solving for components: W({}x{}) * H = A({}x{}) ...'.format(
         *w_matrix.shape, *a_matrix.shape))
-    h_matrix = solve_matrix_linear_equation(w_matrix, a_matrix, method=method)
+    h_matrix = solve_matrix_linear_equation(
+        w_matrix, a_matrix, method=method, n_jobs=n_jobs)
 
     if filepath_prefix:  # Save H matrix
         write_gct(h_matrix, filepath_prefix +
@@ -230,6 +235,8 @@ def normalize_a_matrix(a_matrix, a_matrix_normalization_method,
     :return:
     """
 
+    from ..support.plot import plot_heatmap
+
     # Normaliza A matrix columns
     if a_matrix_normalization_method == '-0-_clip_shift':
         a_matrix = normalize_2d_or_1d(
@@ -290,6 +297,15 @@ def define_states(matrix,
     coefficients (n_ks); d, cs, cccs = define_states(...)
     """
 
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import savefig
+
+    from ..machine_learning.cluster import hierarchical_consensus_cluster
+    from ..support.plot import DPI, plot_heatmap, plot_points
+
     if isinstance(matrix, str):  # Read form a .gct file
         matrix = read_gct(matrix)
 
@@ -391,6 +407,430 @@ def get_state_labels(clusterings, k):
     return clusterings.ix[k, :].tolist()
 
 
+# ==============================================================================
+# Onco-GPS model
+# ==============================================================================
+class OncoGPSModel:
+    """
+    Onco-GPS map fit once from a training H matrix and its states: H-matrix
+    normalizing parameters, component coordinates, component power, training
+    sample coordinates, state grids, and state classifier. New H matrices are
+    placed and classified by transform and predict without refitting, and
+    make_oncogps(..., model=model) plots with the fitted map. Constructor
+    parameters are kept as given; fitted component coordinates, n_pulls, and
+    power are stored in components_, n_pulls_, and power_.
+    """
+
+    def __init__(self,
+                 std_max=3,
+                 components=None,
+                 equilateral=False,
+                 informational_mds=True,
+                 mds_seed=RANDOM_SEED,
+                 mds_init=None,
+                 mds_n_jobs=1,
+                 n_pulls=None,
+                 power=None,
+                 fit_min=0,
+                 fit_max=2,
+                 power_min=1,
+                 power_max=5,
+                 n_grids=256,
+                 kde_bandwidth_factor=1,
+                 classification_space='2d',
+                 state_probability=True):
+        """
+        :param std_max: number; threshold to clip standardized values
+        :param components: DataFrame; (n_components, 2 [x, y]); component
+        coordinates
+        :param equilateral: bool;
+        :param informational_mds: bool; use informational MDS or not
+        :param mds_seed: int; random seed for setting the coordinates of the
+        multidimensional scaling
+        :param mds_init: None or str; {None, 'classical'}; initialize the
+        multidimensional scaling randomly (1000 runs) or with classical MDS
+        (a few runs; much faster)
+        :param mds_n_jobs: int; number of jobs for the multidimensional scaling
+        :param n_pulls: int; [1, n_components]; number of components
+        influencing a sample's coordinate
+        :param power: str or number; power to raise components' influence on
+        each sample
+        :param fit_min: number;
+        :param fit_max: number;
+        :param power_min: number;
+        :param power_max: number;
+        :param n_grids: int; number of grids; larger the n_grids, higher the
+        resolution
+        :param kde_bandwidth_factor: number; factor to multiply KDE bandwidths
+        :param classification_space: str; {'2d', 'nd'}; classify states using
+        sample coordinates or normalized H-matrix (component-space) values
+        :param state_probability: bool; calibrate the state classifier for
+        predict_proba
+        """
+
+        self.std_max = std_max
+        self.components = components
+        self.equilateral = equilateral
+        self.informational_mds = informational_mds
+        self.mds_seed = mds_seed
+        self.mds_init = mds_init
+        self.mds_n_jobs = mds_n_jobs
+        self.n_pulls = n_pulls
+        self.power = power
+        self.fit_min = fit_min
+        self.fit_max = fit_max
+        self.power_min = power_min
+        self.power_max = power_max
+        self.n_grids = n_grids
+        self.kde_bandwidth_factor = kde_bandwidth_factor
+        self.classification_space = classification_space
+        self.state_probability = state_probability
+
+        self.components_ = None
+        self.n_pulls_ = None
+        self.power_ = None
+        self.training_h = None
+        self.training_h_index = None
+        self.normalizing_size = None
+        self.normalizing_mean = None
+        self.normalizing_std = None
+        self.normalizing_min = None
+        self.normalizing_max = None
+        self.training_samples = None
+        self.n_states = None
+        self.state_grids = None
+        self.state_grids_probabilities = None
+        self.classifier = None
+
+    def fit(self, training_h, training_states):
+        """
+        Fit Onco-GPS map.
+        :param training_h: DataFrame; (n_nmf_component, n_samples); NMF H
+        matrix
+        :param training_states: iterable of int; (n_samples); sample states
+        :return: OncoGPSModel; self
+        """
+
+        from ..machine_learning.classify import fit_classifier
+        from ..machine_learning.multidimentional_scale import mds
+
+        # ======================================================================
+        # Process training H matrix
+        #   Drop samples with all-0 values before normalization
+        #   Normalize H matrix while saving normalizing parameters for
+        # normalizing testing H matrix later
+        #       -0- normalize
+        #       Clip values over 3 standard deviation
+        #       0-1 normalize
+        #   Drop samples with all-0 values after normalization
+        # ======================================================================
+        if not isinstance(training_states, Series):
+            training_states = Series(
+                list(training_states), index=training_h.columns)
+
+        training_h = drop_uniform_slice_from_dataframe(training_h, 0)
+
+        self.normalizing_size = training_h.shape[1]
+        self.normalizing_mean = training_h.mean(axis=1)
+        self.normalizing_std = training_h.std(axis=1)
+
+        training_h = normalize_2d_or_1d(training_h, '-0-', axis=1)
+
+        training_h = training_h.clip(lower=-self.std_max, upper=self.std_max)
+
+        self.normalizing_min = training_h.min(axis=1)
+        self.normalizing_max = training_h.max(axis=1)
+
+        training_h = normalize_2d_or_1d(training_h, '0-1', axis=1)
+
+        training_h = drop_uniform_slice_from_dataframe(training_h, 0)
+
+        self.training_h = training_h
+
+        # H-matrix rows (components) the classifier uses in 'nd' space
+        # (component coordinates can be indexed differently, e.g. 'Vertex 1')
+        self.training_h_index = training_h.index
+
+        # ======================================================================
+        # Get training component coordinates
+        #   If there are 3 components and equilateral == True, then use
+        # equilateral-triangle component coordinates;
+        #   else if component coordinates are specified, use them;
+        #   else, compute component coordinates using Newton's Laws
+        # ======================================================================
+        if self.equilateral and training_h.shape[0] == 3:
+            print_log('Using equilateral-triangle component coordinates ...')
+            components = DataFrame(
+                index=['Vertex 1', 'Vertex 2', 'Vertex 3'], columns=['x', 'y'])
+            components.iloc[0, :] = [0.5, sqrt(3) / 2]
+            components.iloc[1, :] = [1, 0]
+            components.iloc[2, :] = [0, 0]
+
+        elif isinstance(self.components, DataFrame):
+            print_log('Using given component coordinates ...')
+            components = self.components.copy()
+            components.index = training_h.index
+
+        else:
+            if self.informational_mds:
+                print_log(
+                    'Computing component coordinates using informational '
+                    'distance ...')
+                dissimilarity = information_coefficient
+            else:
+                print_log(
+                    'Computing component coordinates using Euclidean distance '
+                    '...')
+                dissimilarity = 'euclidean'
+            components = mds(training_h,
+                             dissimilarity=dissimilarity,
+                             n_jobs=self.mds_n_jobs,
+                             random_state=self.mds_seed,
+                             init=self.mds_init,
+                             cache=True)
+            components = DataFrame(
+                components, index=training_h.index, columns=['x', 'y'])
+            components = normalize_2d_or_1d(components, '0-1', axis=0)
+
+        self.components_ = components
+
+        # ======================================================================
+        # Get training component power
+        #   If n_pulls is not specified, all components pull a sample
+        #   If power is not specified, compute component power by fitting
+        # (power will be 1 if fitting fails)
+        # ======================================================================
+        self.n_pulls_ = self.n_pulls or training_h.shape[0]
+
+        self.power_ = self.power
+        if not self.power_:
+            print_log('Computing component power ...')
+            if training_h.shape[0] < 4:
+                print_log(
+                    '\tCould\'t model with Ae^(kx) + C; too few data points.')
+                self.power_ = 1
+            else:
+                try:
+                    self.power_ = _compute_component_power(
+                        training_h, self.fit_min, self.fit_max,
+                        self.power_min, self.power_max)
+                except RuntimeError as e:
+                    self.power_ = 1
+                    print_log(
+                        '\tCould\'t model with Ae^(kx) + C; {}; set power to '
+                        'be 1.'.format(e))
+
+        # ======================================================================
+        # Compute training sample coordinates
+        # Process training states
+        #   Keep only samples in H matrix
+        # ======================================================================
+        training_samples = DataFrame(
+            index=training_h.columns,
+            columns=['x', 'y', 'state', 'component_ratio', 'annotation'])
+
+        print_log(
+            'Computing training sample coordinates using {} components and '
+            '{:.3f} power ...'.format(self.n_pulls_, self.power_))
+        training_samples[['x', 'y']] = self.transform(
+            training_h, normalization=None)
+
+        training_samples['state'] = training_states.loc[training_h.columns]
+
+        self.training_samples = training_samples
+        self.n_states = training_samples['state'].unique().size
+
+        # ======================================================================
+        # Compute grid probabilities and states
+        # ======================================================================
+        print_log('Computing state grids and probabilities ...')
+        self.state_grids, self.state_grids_probabilities = \
+            _compute_state_grids_and_probabilities(
+                training_samples, self.n_grids, self.kde_bandwidth_factor)
+
+        # ======================================================================
+        # Train state classifier
+        # ======================================================================
+        print_log('Training state classifier in {} space ...'.format(
+            self.classification_space))
+        self.classifier = fit_classifier(
+            self._get_classifier_features(training_h,
+                                          training_samples[['x', 'y']]),
+            training_samples['state'],
+            probability=self.state_probability)
+
+        return self
+
+    def normalize(self, h, normalization='using_training_h'):
+        """
+        Normalize H matrix like the training H matrix was.
+        :param h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
+        :param normalization: str or None; {'using_training_h',
+        'using_testing_h', None}; normalize using the training H matrix's
+        normalizing parameters, h's own, or not at all
+        :return: DataFrame; (n_nmf_component, n_samples)
+        """
+
+        if normalization == 'using_training_h':
+            h = drop_uniform_slice_from_dataframe(h, 0)
+
+            a = asarray(h.loc[self.normalizing_mean.index, :], dtype=float)
+
+            # -0- normalize (by size if STD is 0) and clip
+            mean = asarray(self.normalizing_mean)[:, None]
+            std = asarray(self.normalizing_std)[:, None]
+            a = where(std == 0, a / self.normalizing_size,
+                      (a - mean) / where(std == 0, 1, std))
+            a = a.clip(-self.std_max, self.std_max)
+
+            # 0-1 normalize (by size if range is 0)
+            min_ = asarray(self.normalizing_min)[:, None]
+            range_ = asarray(self.normalizing_max)[:, None] - min_
+            a = where(range_ == 0, a / self.normalizing_size,
+                      (a - min_) / where(range_ == 0, 1, range_))
+
+            h = DataFrame(a, index=self.normalizing_mean.index,
+                          columns=h.columns)
+
+            return drop_uniform_slice_from_dataframe(h, 0)
+
+        elif normalization == 'using_testing_h':
+            h = drop_uniform_slice_from_dataframe(h, 0)
+            h = normalize_2d_or_1d(h, '-0-', axis=1)
+            h = h.clip(lower=-self.std_max, upper=self.std_max)
+            h = normalize_2d_or_1d(h, '0-1', axis=1)
+            return drop_uniform_slice_from_dataframe(h, 0)
+
+        elif normalization is None:
+            return h
+
+        else:
+            raise ValueError('Unknown normalization {}.'.format(normalization))
+
+    def transform(self, h, normalization='using_training_h'):
+        """
+        Compute sample coordinates.
+        :param h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
+        :param normalization: str or None; {'using_training_h',
+        'using_testing_h', None}
+        :return: DataFrame; (n_samples, 2 [x, y])
+        """
+
+        h = self.normalize(h, normalization=normalization)
+
+        return DataFrame(
+            _compute_sample_coordinates(self.components_, h, self.n_pulls_,
+                                        self.power_),
+            index=h.columns,
+            columns=['x', 'y'])
+
+    def predict(self, h, normalization='using_training_h', batch_size=10000):
+        """
+        Compute sample coordinates and classify samples into states.
+        :param h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
+        :param normalization: str or None; {'using_training_h',
+        'using_testing_h', None}
+        :param batch_size: int; number of samples to classify at a time
+        :return: Series; (n_samples); sample states
+        """
+
+        h = self.normalize(h, normalization=normalization)
+        coordinates = self.transform(h, normalization=None)
+
+        return self._predict_states(h, coordinates, batch_size=batch_size)
+
+    def predict_proba(self,
+                      h,
+                      normalization='using_training_h',
+                      batch_size=10000):
+        """
+        Compute calibrated state probabilities.
+        :param h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
+        :param normalization: str or None; {'using_training_h',
+        'using_testing_h', None}
+        :param batch_size: int; number of samples to classify at a time
+        :return: DataFrame; (n_samples, n_states); state probabilities
+        """
+
+        if not self.state_probability:
+            raise ValueError('Model was fit with state_probability=False.')
+
+        h = self.normalize(h, normalization=normalization)
+        coordinates = self.transform(h, normalization=None)
+        features = self._get_classifier_features(h, coordinates)
+
+        return DataFrame(
+            concatenate([
+                self.classifier.predict_proba(features[i:i + batch_size])
+                for i in range(0, features.shape[0], batch_size)
+            ]),
+            index=coordinates.index,
+            columns=self.classifier.classes_)
+
+    def _get_classifier_features(self, h, coordinates):
+        """
+        Get the features the state classifier uses.
+        :param h: DataFrame; (n_nmf_component, n_samples); normalized H matrix
+        :param coordinates: DataFrame; (n_samples, 2 [x, y]); sample
+        coordinates
+        :return: array; (n_samples, 2 or n_nmf_component)
+        """
+
+        if self.classification_space == '2d':
+            return asarray(coordinates, dtype=float)
+
+        elif self.classification_space == 'nd':
+            return asarray(
+                h.loc[self.training_h_index, coordinates.index],
+                dtype=float).T
+
+        else:
+            raise ValueError('Unknown classification_space {}.'.format(
+                self.classification_space))
+
+    def _predict_states(self, h, coordinates, batch_size=10000):
+        """
+        Classify samples into states in batches.
+        :param h: DataFrame; (n_nmf_component, n_samples); normalized H matrix
+        :param coordinates: DataFrame; (n_samples, 2 [x, y]); sample
+        coordinates
+        :param batch_size: int; number of samples to classify at a time
+        :return: Series; (n_samples); sample states
+        """
+
+        features = self._get_classifier_features(h, coordinates)
+
+        return Series(
+            concatenate([
+                self.classifier.predict(features[i:i + batch_size])
+                for i in range(0, features.shape[0], batch_size)
+            ]),
+            index=coordinates.index,
+            name='state')
+
+    def save(self, filepath):
+        """
+        Save Onco-GPS model.
+        :param filepath: str;
+        :return: None
+        """
+
+        establish_filepath(filepath)
+        with open(filepath, 'wb') as f:
+            dump(self, f)
+
+
+def load_oncogps_model(filepath):
+    """
+    Load Onco-GPS model saved by OncoGPSModel.save.
+    :param filepath: str;
+    :return: OncoGPSModel;
+    """
+
+    with open(filepath, 'rb') as f:
+        return load(f)
+
+
 def make_oncogps(training_h,
                  training_states,
                  std_max=3,
@@ -400,6 +840,7 @@ def make_oncogps(training_h,
                  equilateral=False,
                  informational_mds=True,
                  mds_seed=RANDOM_SEED,
+                 mds_init=None,
                  n_pulls=None,
                  power=None,
                  fit_min=0,
@@ -408,6 +849,7 @@ def make_oncogps(training_h,
                  power_max=5,
                  n_grids=256,
                  kde_bandwidth_factor=1,
+                 classification_space='2d',
                  samples_to_plot=None,
                  component_ratio=0,
                  training_annotation=(),
@@ -420,6 +862,8 @@ def make_oncogps(training_h,
                  annotation_ascending=True,
                  plot_samples_with_missing_annotation=False,
                  annotate_background=False,
+                 annotation_regressor='svr',
+                 n_jobs=1,
                  title='Onco-GPS Map',
                  title_fontsize=26,
                  title_fontcolor='#3326C0',
@@ -451,12 +895,17 @@ def make_oncogps(training_h,
                  legend_fontsize=16,
                  filepath=None,
                  extension='pdf',
-                 dpi=DPI):
+                 dpi=None,
+                 model=None,
+                 save_model=False):
     """
 
-    :param training_h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
-    :param training_states: iterable of int; (n_samples); sample states
-    :param std_max: number; threshold to clip standardized values
+    :param training_h: DataFrame; (n_nmf_component, n_samples); NMF H matrix;
+    ignored if model is given
+    :param training_states: iterable of int; (n_samples); sample states;
+    ignored if model is given
+    :param std_max: number; threshold to clip standardized values; the model's
+    is used if model is given
 
     :param testing_h: pandas DataFrame; (n_nmf_component, n_samples);
         NMF H matrix
@@ -470,6 +919,9 @@ def make_oncogps(training_h,
     :param informational_mds: bool; use informational MDS or not
     :param mds_seed: int; random seed for setting the coordinates of the
     multidimensional scaling
+    :param mds_init: None or str; {None, 'classical'}; initialize the
+    multidimensional scaling randomly (1000 runs) or with classical MDS (a few
+    runs; much faster)
 
     :param n_pulls: int; [1, n_components]; number of components influencing
     a sample's coordinate
@@ -483,6 +935,8 @@ def make_oncogps(training_h,
     :param n_grids: int; number of grids; larger the n_grids, higher the
     resolution
     :param kde_bandwidth_factor: number; factor to multiply KDE bandwidths
+    :param classification_space: str; {'2d', 'nd'}; classify testing states
+    using sample coordinates or normalized H-matrix values
 
     :param samples_to_plot: indexer; (n_training_samples),
     (n_testing_samples), or (n_sample_indices)
@@ -502,6 +956,10 @@ def make_oncogps(training_h,
     :param plot_samples_with_missing_annotation: bool;
 
     :param annotate_background: bool;
+    :param annotation_regressor: str; {'svr', 'kernel_smoothing'}; regressor
+    for annotating background; 'kernel_smoothing' is much faster
+    :param n_jobs: int; number of jobs for the multidimensional scaling and
+    for annotating background with 'svr'
 
     :param title: str;
     :param title_fontsize: number;
@@ -543,131 +1001,49 @@ def make_oncogps(training_h,
 
     :param filepath: str;
     :param extension: str;
-    :param dpi: number;
+    :param dpi: number; support.plot.DPI if None
+
+    :param model: OncoGPSModel; fitted Onco-GPS model to plot with instead of
+    fitting one from training_h and training_states; components through
+    classification_space are then ignored
+    :param save_model: bool; save the fitted model as
+    <filepath>.oncogps_model.pkl (load it with load_oncogps_model)
 
     :return: None
     """
 
     # ==========================================================================
-    # Process training H matrix
-    #   Set H matrix's indices to be str (better for .ix)
-    #   Drop samples with all-0 values before normalization
-    #   Normalize H matrix (May save normalizing parameters for normalizing
-    # testing H matrix later)
-    #       -0- normalize
-    #       Clip values over 3 standard deviation
-    #       0-1 normalize
-    #   Drop samples with all-0 values after normalization
-    # ==========================================================================
-    training_h_initial = training_h.copy()
-
-    if isinstance(testing_h,
-                  DataFrame) and testing_h_normalization == 'using_training_h':
-        normalizing_size = training_h.shape[1]
-        normalizing_mean = training_h.mean(axis=1)
-        normalizing_std = training_h.std(axis=1)
-    else:
-        normalizing_size = None
-        normalizing_mean = None
-        normalizing_std = None
-
-    training_h = drop_uniform_slice_from_dataframe(training_h, 0)
-
-    training_h = normalize_2d_or_1d(training_h, '-0-', axis=1)
-
-    training_h = training_h.clip(lower=-std_max, upper=std_max)
-
-    if testing_h_normalization == 'using_training_h':
-        normalizing_min = training_h.min(axis=1)
-        normalizing_max = training_h.max(axis=1)
-    else:
-        normalizing_min = None
-        normalizing_max = None
-
-    training_h = normalize_2d_or_1d(training_h, '0-1', axis=1)
-
-    training_h = drop_uniform_slice_from_dataframe(training_h, 0)
-
-    # ==========================================================================
-    # Get training component coordinates
-    #   If there are 3 components and equilateral == True, then use
-    # equilateral-triangle component coordinates;
-    #   else if component coordinates are specified, use them;
-    #   else, compute component coordinates using Newton's Laws
+    # Fit Onco-GPS model unless it is given
+    #   Normalize training H matrix (saving normalizing parameters for
+    # normalizing testing H matrix later)
+    #   Get training component coordinates and power
+    #   Compute training sample coordinates
+    #   Compute state grids and probabilities
+    #   Train state classifier
     # ==========================================================================
-    if equilateral and training_h.shape[0] == 3:
-        print_log('Using equilateral-triangle component coordinates ...'.
-                  format(components))
-        components = DataFrame(
-            index=['Vertex 1', 'Vertex 2', 'Vertex 3'], columns=['x', 'y'])
-        components.iloc[0, :] = [0.5, sqrt(3) / 2]
-        components.iloc[1, :] = [1, 0]
-        components.iloc[2, :] = [0, 0]
-
-    elif isinstance(components, DataFrame):
-        print_log('Using given component coordinates ...'.format(components))
-        components.index = training_h.index
-
-    else:
-        if informational_mds:
-            print_log(
-                'Computing component coordinates using informational distance '
-                '...')
-            dissimilarity = information_coefficient
-        else:
-            print_log(
-                'Computing component coordinates using Euclidean distance ...')
-            dissimilarity = 'euclidean'
-        components = mds(training_h,
-                         dissimilarity=dissimilarity,
-                         random_state=mds_seed)
-        components = DataFrame(
-            components, index=training_h.index, columns=['x', 'y'])
-        components = normalize_2d_or_1d(components, '0-1', axis=0)
-
-    # ==========================================================================
-    # Get training component power
-    #   If n_pulls is not specified, all components pull a sample
-    #   If power is not specified, compute component power by fitting (power
-    # will be 1 if fitting fails)
-    # ==========================================================================
-    if not n_pulls:
-        n_pulls = training_h.shape[0]
-
-    if not power:
-        print_log('Computing component power ...')
-        if training_h.shape[0] < 4:
-            print_log(
-                '\tCould\'t model with Ae^(kx) + C; too few data points.')
-            power = 1
-        else:
-            try:
-                power = _compute_component_power(training_h, fit_min, fit_max,
-                                                 power_min, power_max)
-            except RuntimeError as e:
-                power = 1
-                print_log(
-                    '\tCould\'t model with Ae^(kx) + C; {}; set power to be '
-                    '1.'.format(e))
-
-    # ==========================================================================
-    # Compute training sample coordinates
-    # Process training states
-    #   Series states
-    #   Keep only samples in H matrix
-    # ==========================================================================
-    training_samples = DataFrame(
-        index=training_h.columns,
-        columns=['x', 'y', 'state', 'component_ratio', 'annotation'])
-
-    print_log(
-        'Computing training sample coordinates using {} components and {:.3f} '
-        'power ...'.format(n_pulls, power))
-    training_samples[['x', 'y']] = _compute_sample_coordinates(
-        components, training_h, n_pulls, power)
-
-    training_samples.ix[:, 'state'] = Series(
-        training_states, index=training_h.columns)
+    if not isinstance(model, OncoGPSModel):
+        model = OncoGPSModel(
+            std_max=std_max,
+            components=components,
+            equilateral=equilateral,
+            informational_mds=informational_mds,
+            mds_seed=mds_seed,
+            mds_init=mds_init,
+            mds_n_jobs=n_jobs,
+            n_pulls=n_pulls,
+            power=power,
+            fit_min=fit_min,
+            fit_max=fit_max,
+            power_min=power_min,
+            power_max=power_max,
+            n_grids=n_grids,
+            kde_bandwidth_factor=kde_bandwidth_factor,
+            classification_space=classification_space).fit(
+                training_h, training_states)
+        if filepath and save_model:
+            model.save('{}.oncogps_model.pkl'.format(filepath))
+
+    training_samples = model.training_samples.copy()
 
     # ==========================================================================
     # Compute training component ratios
@@ -675,16 +1051,9 @@ def make_oncogps(training_h,
     if component_ratio and 0 < component_ratio:
         print_log('Computing training component ratios ...')
         training_samples['component_ratio'] = _compute_component_ratios(
-            training_h, component_ratio)
+            model.training_h, component_ratio)
 
     # ==========================================================================
-    # Compute grid probabilities and states
-    # ==========================================================================
-    print_log('Computing state grids and probabilities ...')
-    state_grids, state_grids_probabilities = \
-        _compute_state_grids_and_probabilities(
-            training_samples, n_grids, kde_bandwidth_factor)
-    # ==========================================================================
     # Process training annotation
     # ==========================================================================
     annotation_grids = annotation_grids_probabilities = None
@@ -706,7 +1075,11 @@ def make_oncogps(training_h,
             print_log('Computing annotation grids and probabilities ...')
             annotation_grids, annotation_grids_probabilities = \
                 _compute_annotation_grids_and_probabilities(
-                    training_samples, training_annotation, n_grids)
+                    training_samples,
+                    training_annotation,
+                    model.n_grids,
+                    regressor=annotation_regressor,
+                    n_jobs=n_jobs)
 
     # ==========================================================================
     # Process testing data
@@ -714,7 +1087,6 @@ def make_oncogps(training_h,
     if isinstance(testing_h, DataFrame):
         # ======================================================================
         # Process testing H matrix
-        #   Set H matrix's indices to be str (better for .ix)
         #   Drop samples with all-0 values before normalization
         #   Normalize H matrix (may use the normalizing parameters used in
         # normalizing training H matrix)
@@ -723,29 +1095,8 @@ def make_oncogps(training_h,
         #       0-1 normalize
         #   Drop samples with all-0 values after normalization
         # ======================================================================
-        if testing_h_normalization:
-            # TODO: fix passing of normalizing_
-            testing_h = drop_uniform_slice_from_dataframe(testing_h, 0)
-
-            testing_h = normalize_2d_or_1d(
-                testing_h,
-                '-0-',
-                axis=1,
-                normalizing_size=normalizing_size,
-                normalizing_mean=normalizing_mean,
-                normalizing_std=normalizing_std)
-
-            testing_h = testing_h.clip(lower=-std_max, upper=std_max)
-
-            testing_h = normalize_2d_or_1d(
-                testing_h,
-                '0-1',
-                axis=1,
-                normalizing_size=normalizing_size,
-                normalizing_min=normalizing_min,
-                normalizing_max=normalizing_max)
-
-            testing_h = drop_uniform_slice_from_dataframe(testing_h, 0)
+        testing_h = model.normalize(
+            testing_h, normalization=testing_h_normalization)
 
         # ======================================================================
         # Compute testing sample coordinates
@@ -757,28 +1108,15 @@ def make_oncogps(training_h,
 
         print_log(
             'Computing testing sample coordinates with {} components & {:.3f} '
-            'power ...'.format(n_pulls, power))
-        testing_samples.ix[:, ['x', 'y']] = _compute_sample_coordinates(
-            components, testing_h, n_pulls, power)
-
-        testing_samples.ix[:, 'state'] = classify(
-            training_samples.ix[:, ['x', 'y']], training_states,
-            testing_samples.ix[:, ['x', 'y']])
-        # TODO: classify in ND
-        # if not testing_h_normalization:
-        #     print('No normalization.')
-        #     print(training_h_initial.T.head())
-        #     print(testing_h.T.head())
-        #     testing_samples.ix[:, 'state'] = classify(training_h_initial.T,
-        #  training_states, testing_h.T)
-        # else:
-        #     print('Yes normalization.')
-        #     print(training_h.T.head())
-        #     print(testing_h.T.head())
-        #     testing_samples.ix[:, 'state'] = classify(training_h.T,
-        # training_states, testing_h.T)
-        testing_samples.ix[:, 'state'].T.to_csv(
-            '{}.testing_states.txt'.format(filepath), sep='\t')
+            'power ...'.format(model.n_pulls_, model.power_))
+        testing_samples[['x', 'y']] = model.transform(
+            testing_h, normalization=None)
+
+        testing_samples['state'] = model._predict_states(
+            testing_h, testing_samples[['x', 'y']])
+        if filepath:
+            testing_samples.ix[:, 'state'].T.to_csv(
+                '{}.testing_states.txt'.format(filepath), sep='\t')
 
         # ======================================================================
         # Compute training component ratios
@@ -822,11 +1160,11 @@ def make_oncogps(training_h,
 
     print_log('Plotting ...')
     return _plot_onco_gps(
-        components=components,
+        components=model.components_.copy(),
         samples=samples,
-        state_grids=state_grids,
-        state_grids_probabilities=state_grids_probabilities,
-        n_training_states=training_states.unique().size,
+        state_grids=model.state_grids,
+        state_grids_probabilities=model.state_grids_probabilities,
+        n_training_states=model.n_states,
         annotation_name=annotation_name,
         annotation_type=annotation_type,
         normalize_annotation=normalize_annotation,
@@ -836,7 +1174,7 @@ def make_oncogps(training_h,
         plot_samples_with_missing_annotation=plot_samples_with_missing_annotation,
         annotation_grids=annotation_grids,
         annotation_grids_probabilities=annotation_grids_probabilities,
-        std_max=std_max,
+        std_max=model.std_max,
         title=title,
         title_fontsize=title_fontsize,
         title_fontcolor=title_fontcolor,
@@ -871,6 +1209,112 @@ def make_oncogps(training_h,
         dpi=dpi)
 
 
+def make_oncogps_maps(training_h,
+                      training_states,
+                      annotations,
+                      directory_path,
+                      testing_h=None,
+                      extension='pdf',
+                      model=None,
+                      n_jobs=1,
+                      **kwargs):
+    """
+    Make 1 Onco-GPS map per annotation. Fit the Onco-GPS model (normalization,
+    component coordinates & power, sample coordinates, state grids, &
+    classifier) once, then plot the maps in n_jobs processes (Agg backend),
+    saving each as <directory_path>/<annotation_name>.<extension>.
+    :param training_h: DataFrame; (n_nmf_component, n_samples); NMF H matrix;
+    ignored if model is given
+    :param training_states: iterable of int; (n_samples); sample states;
+    ignored if model is given
+    :param annotations: DataFrame or dict; (n_annotations, n_samples) or
+    {annotation_name: Series (n_samples)}; annotations of training samples, or
+    of testing samples if testing_h is given
+    :param directory_path: str; directory to save the maps in
+    :param testing_h: DataFrame; (n_nmf_component, n_samples); NMF H matrix
+    :param extension: str;
+    :param model: OncoGPSModel; fitted Onco-GPS model
+    :param n_jobs: int; number of processes plotting maps
+    :param kwargs: other make_oncogps parameters; OncoGPSModel parameters
+    among them are used only for fitting the model when model is None
+    :return: OncoGPSModel; the model used for all maps
+    """
+
+    if not isinstance(model, OncoGPSModel):
+        model_parameters = {
+            k: v
+            for k, v in kwargs.items()
+            if k in signature(OncoGPSModel.__init__).parameters
+        }
+        model_parameters.setdefault('mds_n_jobs', n_jobs)
+        print_log('Fitting Onco-GPS model once for {} maps ...'.format(
+            len(annotations)))
+        model = OncoGPSModel(**model_parameters).fit(training_h,
+                                                     training_states)
+
+    kwargs = {
+        k: v
+        for k, v in kwargs.items() if k in signature(make_oncogps).parameters
+    }
+
+    if isinstance(annotations, DataFrame):
+        annotations = annotations.iterrows()
+    else:
+        annotations = annotations.items()
+
+    args = []
+    for annotation_name, annotation in annotations:
+        args.append((model, testing_h, annotation_name, annotation,
+                     join(directory_path, '{}.{}'.format(
+                         str(annotation_name).replace('/', '_'), extension)),
+                     extension, kwargs))
+
+    print_log('Plotting {} Onco-GPS maps ...'.format(len(args)))
+    if n_jobs == 1:
+        for a in args:
+            _make_oncogps_map(a)
+    else:
+        parallelize(_make_oncogps_map, args, n_jobs)
+
+    return model
+
+
+def _make_oncogps_map(args):
+    """
+    Make and save 1 annotated Onco-GPS map with a fitted Onco-GPS model.
+    :param args: tuple; (model, testing_h, annotation_name, annotation,
+    filepath, extension, kwargs)
+    :return: None
+    """
+
+    import matplotlib.pyplot as plt
+
+    model, testing_h, annotation_name, annotation, filepath, extension, \
+        kwargs = args
+
+    # Worker processes render off-screen and can not start their own pools
+    if current_process().daemon:
+        plt.switch_backend('Agg')
+        kwargs = dict(kwargs, n_jobs=1)
+
+    kwargs = dict(kwargs, annotation_name=annotation_name)
+
+    if isinstance(testing_h, DataFrame):
+        kwargs.update(testing_h=testing_h, testing_annotation=annotation)
+    else:
+        kwargs.update(training_annotation=annotation)
+
+    make_oncogps(
+        None,
+        None,
+        filepath=filepath,
+        extension=extension,
+        model=model,
+        **kwargs)
+
+    plt.close('all')
+
+
 def _compute_component_power(h, fit_min, fit_max, power_min, power_max):
     """
     Compute component power by fitting component magnitudes of samples to the
@@ -907,51 +1351,48 @@ def _compute_sample_coordinates(component_x_coordinates, component_x_samples,
     :return: DataFrame; (n_samples, n_dimension); sample_coordinates
     """
 
-    component_x_coordinates = asarray(component_x_coordinates)
-
-    # (n_samples, n_dimensions)
-    sample_coordinates = empty(
-        (component_x_samples.shape[1], component_x_coordinates.shape[1]))
-
-    for i, (_, c
-            ) in enumerate(component_x_samples.iteritems()):  # For each sample
+    component_x_coordinates = asarray(component_x_coordinates, dtype=float)
 
-        # Sample column
-        c = asarray(c)
+    # (n_points, n_samples)
+    c = asarray(component_x_samples, dtype=float)
+    n_points = c.shape[0]
 
-        # Silence components that are not pulling
-        threshold = sorted(c)[-n_influencing_components]
-        c[c < threshold] = 0
+    # Silence components that are not pulling: those below each sample's
+    # n_influencing_components-th largest value (NaN does not pull)
+    i = n_points - min(n_influencing_components, n_points)
+    thresholds = partition(where(isnan(c), -inf, c), i, axis=0)[i]
+    weights = where(c < thresholds, 0, c)**power
+    weights[isnan(weights)] = 0
 
-        # Compute coordinate in each dimension
-        for d in range(component_x_coordinates.shape[1]):
-            sample_coordinates[i, d] = nansum(
-                c**power * component_x_coordinates[:, d]) / nansum(c**power)
-
-    return sample_coordinates
+    # (n_samples, n_dimensions)
+    return dot(weights.T, component_x_coordinates) / weights.sum(
+        axis=0)[:, None]
 
 
 def _compute_component_ratios(h, n):
     """
     Compute the ratio between the sum of the top-n component values and the
     sum of the rest of the component values.
-    :param h: DataFrame;
+    :param h: DataFrame; (n_components, n_samples)
     :param n: number;
-    :return: array; ratios
+    :return: Series; (n_samples); ratios
     """
 
-    ratios = zeros(h.shape[1])
-
     if n and n < 1:  # If n is a fraction, compute its respective number
         n = int(h.shape[0] * n)
+    n = int(n)
 
-    # Compute pull ratio for each sample (column)
-    for i, (c_idx, c) in enumerate(h.iteritems()):
-        c_sorted = c.sort_values(ascending=False)
+    # Sort each sample (column) descendingly, NaN last
+    a = asarray(h, dtype=float)
+    a_sorted = -sort(-a, axis=0)
 
-        ratios[i] = c_sorted[:n].sum() / max(c_sorted[n:].sum(), EPS) * c.sum()
+    top = nansum(a_sorted[:n], axis=0)
+    rest = nansum(a_sorted[n:], axis=0)
 
-    return ratios
+    return Series(
+        top / maximum(rest, EPS) * nansum(a, axis=0),
+        index=h.columns,
+        name='component_ratio')
 
 
 def _compute_state_grids_and_probabilities(samples, n_grids,
@@ -964,45 +1405,29 @@ def _compute_state_grids_and_probabilities(samples, n_grids,
     :return:
     """
 
-    grids = zeros((n_grids, n_grids), dtype=int)
-    grids_probabilities = zeros((n_grids, n_grids))
+    x = asarray(samples.loc[:, 'x'], dtype=float)
+    y = asarray(samples.loc[:, 'y'], dtype=float)
+    states = asarray(samples.loc[:, 'state'])
 
     # Compute bandwidths created from all states' x & y coordinates and
     # rescale them
     bandwidths = asarray([
-        bcv(asarray(samples.ix[:, 'x'].tolist()))[0],
-        bcv(asarray(samples.ix[:, 'y'].tolist()))[0]
+        estimate_bandwidth_bcv(x), estimate_bandwidth_bcv(y)
     ]) * kde_bandwidths_factor
 
     # Estimate kernel density for each state using bandwidth created from all
-    # states' x & y coordinates
-    kdes = {}
-    for s in samples.ix[:, 'state'].unique():
-        coordinates = samples.ix[samples.ix[:, 'state'] == s, ['x', 'y']]
-        kde = kde2d(
-            asarray(coordinates.ix[:, 'x'], dtype=float),
-            asarray(coordinates.ix[:, 'y'], dtype=float),
-            bandwidths,
-            n=asarray([n_grids]),
-            lims=asarray([0, 1, 0, 1]))
-        kdes[s] = asarray(kde[2])
+    # states' x & y coordinates; stack them into (n_states, n_grids, n_grids)
+    unique_states = samples.loc[:, 'state'].unique()
+    kdes = empty((unique_states.size, n_grids, n_grids))
+    for i, s in enumerate(unique_states):
+        is_s = states == s
+        kdes[i] = estimate_kde_2d(
+            x[is_s], y[is_s], bandwidths, n_grids=n_grids,
+            lims=(0, 1, 0, 1))[2]
 
     # Assign the best KDE probability and state for each grid
-    for i in range(n_grids):
-        for j in range(n_grids):
-
-            # Find the maximum (best) probability and its state
-            best_state = None
-            best_probability = 0
-            for s, kde in kdes.items():
-                p = kde[i, j]
-                if best_probability < p:
-                    best_state = s
-                    best_probability = p
-
-            # Assign the maximum (best) probability and its state
-            grids[i, j] = best_state
-            grids_probabilities[i, j] = best_probability
+    grids = asarray(unique_states)[kdes.argmax(axis=0)].astype(int)
+    grids_probabilities = kdes.max(axis=0)
 
     return grids, grids_probabilities
 
@@ -1011,45 +1436,111 @@ def _compute_state_grids_and_probabilities(samples, n_grids,
 def _compute_annotation_grids_and_probabilities(samples,
                                                 annotation,
                                                 n_grids,
-                                                svr_kernel='rbf'):
+                                                regressor='svr',
+                                                svr_kernel='rbf',
+                                                bandwidth_factor=1,
+                                                n_jobs=1):
     """
-
-    :param samples:
-    :param annotation:
-    :param n_grids:
-    :return:
+    Predict annotation states (1 or -1) and probabilities on
+    n_grids x n_grids grids.
+    :param samples: DataFrame; (n_samples, 2+ [x, y, ...])
+    :param annotation: Series; (n_samples); sample annotation
+    :param n_grids: int;
+    :param regressor: str; {'svr', 'kernel_smoothing'}
+    :param svr_kernel: str; kernel of the SVRs
+    :param bandwidth_factor: number; factor to multiply the kernel-smoothing
+    bandwidths (Scott's rule) with
+    :param n_jobs: int; number of jobs for predicting grids with the SVRs
+    :return: array and array; (n_grids, n_grids) and (n_grids, n_grids);
+    annotation grids and probabilities
     """
 
+    from sklearn.svm import SVR
+
     i = ~annotation.isnull()
 
     annotation = normalize_2d_or_1d(annotation, '-0-')
 
-    svr_state = SVR(kernel=svr_kernel)
-    svr_probability = SVR(kernel=svr_kernel)
+    coordinates = asarray(samples.ix[i, ['x', 'y']], dtype=float)
+    values = asarray(annotation.ix[i], dtype=float)
 
-    svr_state.fit(
-        asarray(samples.ix[i, ['x', 'y']]), asarray(annotation.ix[i]))
-    svr_probability.fit(
-        asarray(samples.ix[i, ['x', 'y']]), asarray(annotation.ix[i].abs()))
+    fractions = linspace(0, 1, n_grids)
 
-    grids = empty((n_grids, n_grids), dtype=int)
-    grids_probability = empty((n_grids, n_grids))
+    if regressor == 'svr':
+        svr_state = SVR(kernel=svr_kernel).fit(coordinates, values)
+        svr_probability = SVR(kernel=svr_kernel).fit(coordinates, abs(values))
 
-    for i, fraction_i in enumerate(linspace(0, 1, n_grids)):
-        for j, fraction_j in enumerate(linspace(0, 1, n_grids)):
+        # (n_grids^2, 2 [x, y]) grid coordinates ordered as grids[i, j]
+        grid_coordinates = stack(
+            meshgrid(fractions, fractions, indexing='ij'), axis=-1).reshape(
+                -1, 2)
 
-            # Predicted annotation
-            p = svr_state.predict(asarray([[fraction_i, fraction_j]]))
-            if annotation.mean() <= p:
-                grids[i, j] = 1
-            else:
-                grids[i, j] = -1
+        # Predict all grids in 1 call per SVR per chunk
+        chunks = array_split(grid_coordinates, n_jobs)
+        if n_jobs == 1:
+            predictions = [
+                _predict_grids(((svr_state, svr_probability), chunks[0]))
+            ]
+        else:
+            predictions = parallelize(
+                _predict_grids,
+                [((svr_state, svr_probability), c) for c in chunks], n_jobs)
+
+        annotation_predictions, probabilities = (
+            concatenate(p).reshape(n_grids, n_grids)
+            for p in zip(*predictions))
+
+    elif regressor == 'kernel_smoothing':
+        annotation_predictions, probabilities = _smooth_on_grids(
+            coordinates, (values, abs(values)), fractions, bandwidth_factor)
+
+    else:
+        raise ValueError('Unknown regressor {}.'.format(regressor))
 
-            # Predicted probability
-            p = svr_probability.predict(asarray([[fraction_i, fraction_j]]))
-            grids_probability[i, j] = p
+    grids = where(annotation.mean() <= annotation_predictions, 1, -1)
 
-    return grids, grids_probability
+    return grids, probabilities
+
+
+def _predict_grids(args):
+    """
+    Predict grid coordinates with each regressor.
+    :param args: tuple; (iterable of fitted regressors, array (n, 2))
+    :return: list; (n_regressors) arrays (n)
+    """
+
+    regressors, coordinates = args
+
+    return [r.predict(coordinates) for r in regressors]
+
+
+def _smooth_on_grids(coordinates, values, fractions, bandwidth_factor=1):
+    """
+    Nadaraya-Watson Gaussian kernel smoothing of values on
+    n_fractions x n_fractions grids. The kernel is separable, so each
+    smoothing is 2 (n_fractions, n_samples) matrix multiplications.
+    :param coordinates: array; (n_samples, 2 [x, y])
+    :param values: iterable of arrays; (n_values, n_samples)
+    :param fractions: array; (n_fractions); grid coordinates in each
+    dimension
+    :param bandwidth_factor: number; factor to multiply Scott's-rule
+    bandwidths with
+    :return: list; (n_values) arrays (n_fractions, n_fractions)
+    """
+
+    n = coordinates.shape[0]
+    bandwidths = coordinates.std(
+        axis=0, ddof=1) * n**(-1 / 6) * bandwidth_factor
+
+    # (n_fractions, n_samples) kernel weights for each dimension
+    k_x = exp(-0.5 * (
+        (fractions[:, None] - coordinates[None, :, 0]) / bandwidths[0])**2)
+    k_y = exp(-0.5 * (
+        (fractions[:, None] - coordinates[None, :, 1]) / bandwidths[1])**2)
+
+    weights = maximum(dot(k_x, k_y.T), finfo(float).tiny)
+
+    return [dot(k_x * v, k_y.T) / weights for v in values]
 
 
 # ==============================================================================
@@ -1134,11 +1625,24 @@ def _plot_onco_gps(
 
     :param filepath: str;
     :param format: str;
-    :param dpi: number;
+    :param dpi: number; support.plot.DPI if None
 
     :return: None
     """
 
+    from matplotlib.colorbar import ColorbarBase, make_axes
+    from matplotlib.colors import Normalize, to_rgb
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.path import Path
+    from matplotlib.pyplot import figure, subplot
+
+    from ..support.plot import (CMAP_BINARY, CMAP_CATEGORICAL, CMAP_CONTINUOUS,
+                                DPI, FIGURE_SIZE, assign_colors_to_states,
+                                decorate, save_plot)
+
+    if dpi is None:
+        dpi = DPI
+
     # Set up figure
     figure(figsize=FIGURE_SIZE)
     gridspec = GridSpec(10, 16)
@@ -1249,49 +1753,28 @@ def _plot_onco_gps(
     # Assign colors to states
     state_colors = assign_colors_to_states(n_training_states, colors=colors)
 
-    # Plot background
+    # Compute which grids are in the convexhull (once for all plots)
     fraction_grids = linspace(0, 1, state_grids.shape[0])
-    image = ones((*state_grids.shape, 3))
+    is_in_convexhull = convexhull_region.contains_points(
+        stack(
+            meshgrid(fraction_grids, fraction_grids, indexing='ij'),
+            axis=-1).reshape(-1, 2)).reshape(state_grids.shape)
 
+    # Plot background
     if isinstance(annotation_grids, ndarray):
-        grids = annotation_grids
-        grids_probabilities = annotation_grids_probabilities
-
-        grid_probabilities_min = grids_probabilities.min()
-        grid_probabilities_max = grids_probabilities.max()
-        grid_probabilities_range = grid_probabilities_max - \
-                                   grid_probabilities_min
-
-        for i in range(grids.shape[0]):
-            for j in range(grids.shape[1]):
-
-                if convexhull_region.contains_point(
-                    (fraction_grids[i], fraction_grids[j])):
-                    if 0 < grids[i, j]:
-                        c = (1, 0, 0)
-                    else:
-                        c = (0, 0, 1)
-                    hsv = rgb_to_hsv(*c)
-                    o = (grids_probabilities[i, j] - grid_probabilities_min
-                         ) / grid_probabilities_range
-                    image[j, i] = hsv_to_rgb(hsv[0],
-                                             min(o * background_alpha_factor,
-                                                 1), hsv[2] * o + (1 - o))
+        # Red for high and blue for low annotation grids
+        image = _shade_grids(
+            where((0 < annotation_grids)[..., None], (1., 0., 0.),
+                  (0., 0., 1.)), annotation_grids_probabilities,
+            is_in_convexhull, background_alpha_factor)
 
         grids = state_grids
 
         # Plot soft contours for each state (masking points outside of Onco-GPS)
         for s in range(1, n_training_states + 1):
-            mask = zeros_like(grids, dtype=bool)
-            for i in range(grids.shape[0]):
-                for j in range(grids.shape[1]):
-
-                    if not convexhull_region.contains_point(
-                        (fraction_grids[i],
-                         fraction_grids[j])) or grids[i, j] != s:
-                        mask[i, j] = True
-
-            z = ma.array(state_grids_probabilities, mask=mask)
+            z = ma.array(
+                state_grids_probabilities,
+                mask=~is_in_convexhull | (grids != s))
             ax_map.contour(
                 z.transpose(),
                 n_contours // 2,
@@ -1309,17 +1792,14 @@ def _plot_onco_gps(
 
         # Plot boundary
         if state_boundary_color:
-            for i in range(0, grids.shape[0] - 1):
-                for j in range(0, grids.shape[1] - 1):
-
-                    if convexhull_region.contains_point(
-                        (fraction_grids[i], fraction_grids[j])) and (
-                            grids[i, j] != grids[i + 1, j] or
-                            grids[i, j] != grids[i, j + 1]):
-                        image[j, i] = state_boundary_color
+            is_boundary = zeros_like(grids, dtype=bool)
+            is_boundary[:-1, :-1] = is_in_convexhull[:-1, :-1] & (
+                (grids[:-1, :-1] != grids[1:, :-1]) |
+                (grids[:-1, :-1] != grids[:-1, 1:]))
+            image[is_boundary] = to_rgb(state_boundary_color)
 
         ax_map.imshow(
-            image,
+            image.transpose(1, 0, 2),
             interpolation=None,
             origin='lower',
             aspect='auto',
@@ -1327,27 +1807,16 @@ def _plot_onco_gps(
             clip_on=False,
             zorder=1)
     else:
-        grids = state_grids
-        grids_probabilities = state_grids_probabilities
-
-        grid_probabilities_min = grids_probabilities.min()
-        grid_probabilities_max = grids_probabilities.max()
-        grid_probabilities_range = grid_probabilities_max - \
-                                   grid_probabilities_min
-
-        for i in range(grids.shape[0]):
-            for j in range(grids.shape[1]):
-
-                if convexhull_region.contains_point(
-                    (fraction_grids[i], fraction_grids[j])):
-                    hsv = rgb_to_hsv(*state_colors[grids[i, j]][:3])
-                    o = (grids_probabilities[i, j] - grid_probabilities_min
-                         ) / grid_probabilities_range
-                    image[j, i] = hsv_to_rgb(hsv[0],
-                                             min(o * background_alpha_factor,
-                                                 1), hsv[2] * o + (1 - o))
+        # Look up state colors for all grids
+        state_rgbs = ones((max(state_colors.keys()) + 1, 3))
+        for s, c in state_colors.items():
+            state_rgbs[s] = c[:3]
+
+        image = _shade_grids(state_rgbs[state_grids],
+                             state_grids_probabilities, is_in_convexhull,
+                             background_alpha_factor)
         ax_map.imshow(
-            image,
+            image.transpose(1, 0, 2),
             interpolation=None,
             origin='lower',
             aspect='auto',
@@ -1356,15 +1825,7 @@ def _plot_onco_gps(
             zorder=1)
 
         # Plot contours (masking points outside of Onco-GPS)
-        mask = zeros_like(grids, dtype=bool)
-        for i in range(grids.shape[0]):
-            for j in range(grids.shape[1]):
-
-                if not convexhull_region.contains_point(
-                    (fraction_grids[i], fraction_grids[j])):
-                    mask[i, j] = True
-
-        z = ma.array(state_grids_probabilities, mask=mask)
+        z = ma.array(state_grids_probabilities, mask=~is_in_convexhull)
         ax_map.contour(
             z.transpose(),
             n_contours,
@@ -1585,12 +2046,42 @@ def _plot_onco_gps(
 
     return samples
 
+
+def _shade_grids(rgbs, probabilities, mask, alpha_factor=1):
+    """
+    Shade grid colors by their probabilities: the more probable, the more
+    saturated and the darker.
+    :param rgbs: array; (n_grids, n_grids, 3); grid RGB colors
+    :param probabilities: array; (n_grids, n_grids); grid probabilities
+    :param mask: array; (n_grids, n_grids); grids to shade (others are white)
+    :param alpha_factor: number; factor to multiply saturations with
+    :return: array; (n_grids, n_grids, 3); shaded RGB image indexed by x and y
+    grids
+    """
+
+    from matplotlib.colors import hsv_to_rgb, rgb_to_hsv
+
+    o = (probabilities - probabilities.min()) / (
+        probabilities.max() - probabilities.min())
+
+    hsvs = rgb_to_hsv(asarray(rgbs, dtype=float))
+    hsvs[..., 1] = minimum(o * alpha_factor, 1)
+    hsvs[..., 2] = hsvs[..., 2] * o + (1 - o)
+
+    image = ones(hsvs.shape)
+    image[mask] = hsv_to_rgb(hsvs)[mask]
+
+    return image
+
+
 def make_oncogps_in_3d(
         training_h,
         training_states,
         filepath,
         std_max=3,
         mds_seed=RANDOM_SEED,
+        mds_init=None,
+        n_jobs=1,
         power=None,
         fit_min=0,
         fit_max=2,
@@ -1622,6 +2113,8 @@ def make_oncogps_in_3d(
     :param filepath:
     :param std_max:
     :param mds_seed:
+    :param mds_init: None or str; {None, 'classical'}
+    :param n_jobs: int; number of jobs for the multidimensional scaling
     :param power:
     :param fit_min:
     :param fit_max:
@@ -1649,6 +2142,9 @@ def make_oncogps_in_3d(
     :return:
     """
 
+    from ..machine_learning.multidimentional_scale import mds
+    from ..support.plot import assign_colors_to_states
+
     # ==========================================================================
     # Process training H matrix
     #   Set H matrix's indices to be str (better for .ix)
@@ -1675,7 +2171,10 @@ def make_oncogps_in_3d(
     components = mds(training_h,
                      n_components=3,
                      dissimilarity=dissimilarity,
-                     random_state=mds_seed)
+                     n_jobs=n_jobs,
+                     random_state=mds_seed,
+                     init=mds_init,
+                     cache=True)
     components = DataFrame(
         components, index=training_h.index, columns=['x', 'y', 'z'])
     components = normalize_2d_or_1d(components, '-0-', axis=0)
@@ -32,7 +32,7 @@ def classify(training,
              class_weight=None,
              verbose=False,
              max_iter=-1,
-             decision_function_shape=None,
+             decision_function_shape='ovr',
              random_state=RANDOM_SEED):
     """
 
@@ -57,6 +57,64 @@ def classify(training,
     :return: n_samples; array-like; (1, n_testing_samples)
     """
 
+    clf = fit_classifier(
+        training,
+        training_classes,
+        c=c,
+        kernel=kernel,
+        degree=degree,
+        gamma=gamma,
+        coef0=coef0,
+        shrinking=shrinking,
+        probability=probability,
+        tol=tol,
+        cache_size=cache_size,
+        class_weight=class_weight,
+        verbose=verbose,
+        max_iter=max_iter,
+        decision_function_shape=decision_function_shape,
+        random_state=random_state)
+    return clf.predict(asarray(testing))
+
+
+def fit_classifier(training,
+                   training_classes,
+                   c=1.0,
+                   kernel='rbf',
+                   degree=3,
+                   gamma='auto',
+                   coef0=0.0,
+                   shrinking=True,
+                   probability=False,
+                   tol=0.001,
+                   cache_size=200,
+                   class_weight=None,
+                   verbose=False,
+                   max_iter=-1,
+                   decision_function_shape='ovr',
+                   random_state=RANDOM_SEED):
+    """
+    Train a classifier using training; the trained classifier can predict
+    many testing sets without retraining.
+    :param training: array-like; (n_training_samples, n_dimensions)
+    :param training_classes: array-like; (1, n_training_samples)
+    :param c:
+    :param kernel:
+    :param degree:
+    :param gamma:
+    :param coef0:
+    :param shrinking:
+    :param probability:
+    :param tol:
+    :param cache_size:
+    :param class_weight:
+    :param verbose:
+    :param max_iter:
+    :param decision_function_shape:
+    :param random_state:
+    :return: SVC; trained classifier
+    """
+
     clf = SVC(C=c,
               kernel=kernel,
               degree=degree,
@@ -72,7 +130,7 @@ def classify(training,
               decision_function_shape=decision_function_shape,
               random_state=random_state)
     clf.fit(asarray(training), asarray(training_classes))
-    return clf.predict(asarray(testing))
+    return clf
 
 
 def regress(training,
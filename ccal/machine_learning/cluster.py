@@ -180,7 +180,8 @@ def nmf_consensus_cluster(matrix,
     :param n_jobs: int;
     :param n_clusterings: int;
 
-    :param algorithm: str; 'Alternating Least Squares' or 'Lee & Seung'
+    :param algorithm: str; 'Alternating Least Squares', 'Lee & Seung', or
+    'Mini-batch'
 
     :param init:
     :param solver:
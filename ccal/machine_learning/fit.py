@@ -11,9 +11,9 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from numpy import array, sort
-from scipy.optimize import curve_fit
-
+from numpy import array, asarray, exp, inf, isnan, log, pi, sign, sort, sqrt
+from scipy.optimize import curve_fit, minimize
+from scipy.stats import kurtosis, skew, t
 
 
 def fit_matrix(matrix, function_to_fit, axis=0, sort_matrix=False, maxfev=1000):
@@ -41,3 +41,92 @@ def fit_matrix(matrix, function_to_fit, axis=0, sort_matrix=False, maxfev=1000):
     fit_parameters = curve_fit(function_to_fit, x, y, maxfev=maxfev)[0]
 
     return fit_parameters
+
+
+def fit_skew_t(x, max_iter=1000):
+    """
+    Fit skew-t PDF (Azzalini & Capitanio parametrization, as statsmodels'
+    ACSkewT_gen) to x by maximum likelihood, starting from moment estimates
+    and from a symmetric (shape=0) start.
+    :param x: array-like; (n_values); NaNs are ignored; raises ValueError if
+    the non-NaN values have 0 variance
+    :param max_iter: int; maximum number of L-BFGS-B iterations per start
+    :return: tuple; (n_values, df, shape, location, scale)
+    """
+
+    x = asarray(x, dtype=float)
+    x = x[~isnan(x)]
+
+    if x.size < 2 or not x.std():
+        raise ValueError(
+            'Can\'t fit skew-t to {} values with 0 variance.'.format(x.size))
+
+    df, shape, location, scale = _estimate_skew_t_parameters_by_moments(x)
+    starts = ([log(df), shape, location, log(scale)],
+              [log(df), 0, x.mean(), log(x.std())])
+
+    best = None
+    for start in starts:
+        result = minimize(
+            _compute_skew_t_negative_log_likelihood,
+            start,
+            args=(x, ),
+            method='L-BFGS-B',
+            bounds=((log(0.5), log(1000)), (-100, 100), (None, None),
+                    (None, None)),
+            options=dict(maxiter=max_iter))
+        if best is None or result.fun < best.fun:
+            best = result
+
+    log_df, shape, location, log_scale = best.x
+
+    return x.size, exp(log_df), shape, location, exp(log_scale)
+
+
+def _compute_skew_t_negative_log_likelihood(parameters, x):
+    """
+    Compute negative log likelihood of skew-t PDF at x.
+    :param parameters: array; (4 [log(df), shape, location, log(scale)])
+    :param x: array; (n_values)
+    :return: float;
+    """
+
+    log_df, shape, location, log_scale = parameters
+    df = exp(log_df)
+
+    z = (x - location) / exp(log_scale)
+
+    log_likelihood = (log(2) - log_scale + t.logpdf(z, df) + t.logcdf(
+        shape * z * sqrt((df + 1) / (df + z**2)), df + 1)).sum()
+
+    if isnan(log_likelihood):
+        return inf
+    else:
+        return -log_likelihood
+
+
+def _estimate_skew_t_parameters_by_moments(x):
+    """
+    Estimate skew-t parameters from moments: df from excess kurtosis, and
+    shape, location, and scale from skew-normal method of moments.
+    :param x: array; (n_values)
+    :return: tuple; (df, shape, location, scale)
+    """
+
+    # Degree of freedom of t with the same excess kurtosis
+    k = kurtosis(x)
+    if 0 < k:
+        df = min(6 / k + 4, 100)
+    else:
+        df = 100
+
+    # Skewness is at most ~0.995 for skew-normal
+    g = min(abs(skew(x)), 0.99)
+    g23 = g**(2 / 3)
+    delta = sign(skew(x)) * sqrt(pi / 2 * g23 / (g23 + ((4 - pi) / 2)**(2 / 3)))
+
+    shape = delta / sqrt(1 - delta**2)
+    scale = x.std() / sqrt(1 - 2 * delta**2 / pi)
+    location = x.mean() - scale * delta * sqrt(2 / pi)
+
+    return df, shape, location, scale
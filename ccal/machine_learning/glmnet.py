@@ -2,16 +2,25 @@ import numbers
 
 import numpy as np
 import pandas as pd
-import rpy2.robjects as ro
-from rpy2.robjects import numpy2ri
-from rpy2.robjects.packages import importr
 from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
 from sklearn.utils import compute_class_weight
 
-glmnet = importr("glmnet")
-base = importr("base")
-dollar = base.__dict__["$"]
-stats = importr('stats')
+# rpy2 and R packages; imported (starting R) on first use by _import_r
+ro = numpy2ri = glmnet = base = dollar = stats = None
+
+
+def _import_r():
+    global ro, numpy2ri, glmnet, base, dollar, stats
+
+    if glmnet is None:
+        import rpy2.robjects as ro
+        from rpy2.robjects import numpy2ri
+        from rpy2.robjects.packages import importr
+
+        glmnet = importr("glmnet")
+        base = importr("base")
+        dollar = base.__dict__["$"]
+        stats = importr('stats')
 """
 class GLMNet(BaseEstimator, RegressorMixin):
     # Todo: flesh out this class for non-CV fitting
@@ -85,6 +94,7 @@ class GLMNetLogisticRegressionCV(GLMNetCV):
 
 
 def get_coeffs(cvfit, lmda='min'):
+    _import_r()
 
     if not isinstance(lmda, numbers.Number):
         if isinstance(lmda, str):
@@ -116,6 +126,7 @@ def glmnet_fit(x,
                cv=False,
                loss_metric='mse'):
     # Todo: better options for sample or class weighting
+    _import_r()
     fit_func = glmnet.cv_glmnet if cv else glmnet.glmnet
     lower = float('-inf') if lower is None else lower
     upper = float('inf') if upper is None else upper
@@ -13,14 +13,23 @@ Authors:
 
 
 import numpy as np
-from numpy import divide, dot, finfo, log, matrix, multiply, ndarray, sum
+from numpy import (asarray, divide, dot, finfo, ix_, load, log, matrix,
+                   maximum, multiply, ndarray, sqrt, square, sum, zeros)
+from numpy.linalg import pinv
 from numpy.random import rand, seed
-from pandas import DataFrame
+from pandas import DataFrame, concat
 from sklearn.decomposition import NMF
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import KFold
 
 from .. import RANDOM_SEED
+from ..support.log import print_log
+from ..support.parallel_computing import parallelize
+from .solve import nnls_batch
+
+# Matrix being bi-cross-validated; set once in each process by
+# _set_nmf_bcv_matrix instead of being sent with every job
+NMF_BCV_MATRIX = None
 
 
 def nmf(matrix_,
@@ -38,28 +47,33 @@ def nmf(matrix_,
         nls_max_iter=2000,
         sparseness=None,
         beta=1,
-        eta=0.1):
+        eta=0.1,
+        batch_size=1000,
+        n_epochs=10):
     """
     Non-negative matrix factorize matrix with k from ks.
 
-    :param matrix_: numpy array or pandas DataFrame; (n_samples, n_features); the matrix to be factorized by NMF
+    :param matrix_: numpy array or pandas DataFrame; (n_samples, n_features); the matrix to be factorized by NMF;
+    numpy memmap or filepath to a .npy for 'Mini-batch'
     :param ks: iterable; list of ks to be used in the NMF
 
-    :param algorithm: str; 'Alternating Least Squares' or 'Lee & Seung'
+    :param algorithm: str; 'Alternating Least Squares', 'Lee & Seung', or 'Mini-batch'
 
     :param init:
     :param solver:
     :param tol:
     :param max_iter:
     :param random_seed:
-    :param alpha:
+    :param alpha: float; regularization of W (and H) for 'Alternating Least Squares'
     :param l1_ratio:
     :param verbose:
     :param shuffle_:
-    :param nls_max_iter:
-    :param sparseness:
-    :param beta:
-    :param eta:
+    :param nls_max_iter: ignored (removed from scikit-learn)
+    :param sparseness: ignored (removed from scikit-learn)
+    :param beta: ignored (removed from scikit-learn)
+    :param eta: ignored (removed from scikit-learn)
+    :param batch_size: int; number of columns per block for 'Mini-batch'
+    :param n_epochs: int; number of passes over the columns for 'Mini-batch'
 
     :return: dict and dict; {k: {w:w_matrix, h:h_matrix, e:reconstruction_error}} and
                             {k: cophenetic correlation coefficient}
@@ -75,20 +89,18 @@ def nmf(matrix_,
 
         # Compute W, H, and reconstruction error
         if algorithm == 'Alternating Least Squares':
+            # nls_max_iter, sparseness, beta, and eta were removed from
+            # scikit-learn's NMF (with the projected-gradient solver)
             model = NMF(n_components=k,
                         init=init,
                         solver=solver,
                         tol=tol,
                         max_iter=max_iter,
                         random_state=random_seed,
-                        alpha=alpha,
+                        alpha_W=alpha,
                         l1_ratio=l1_ratio,
                         verbose=verbose,
-                        shuffle=shuffle_,
-                        nls_max_iter=nls_max_iter,
-                        sparseness=sparseness,
-                        beta=beta,
-                        eta=eta)
+                        shuffle=shuffle_)
             w, h, e = model.fit_transform(
                 matrix_), model.components_, model.reconstruction_err_
 
@@ -96,9 +108,17 @@ def nmf(matrix_,
             w, h, e = nmf_div(
                 matrix_, k, n_max_iterations=max_iter, random_seed=random_seed)
 
+        elif algorithm == 'Mini-batch':
+            w, h, e = nmf_mini_batch(
+                matrix_,
+                k,
+                batch_size=batch_size,
+                n_epochs=n_epochs,
+                random_seed=random_seed)
+
         else:
             raise ValueError(
-                'NMF algorithm are: \'Alternating Least Squares\' or \'Lee & Seung\'.'
+                'NMF algorithm are: \'Alternating Least Squares\', \'Lee & Seung\', or \'Mini-batch\'.'
             )
 
         # Return pandas DataFrame if the input matrix is also a DataFrame
@@ -152,6 +172,91 @@ def nmf_div(V, k, n_max_iterations=1000, random_seed=RANDOM_SEED):
     return W, H, err
 
 
+def nmf_mini_batch(a,
+                   k,
+                   batch_size=1000,
+                   n_epochs=10,
+                   n_h_iterations=50,
+                   random_seed=RANDOM_SEED):
+    """
+    Non-negative matrix factorize a by streaming its column blocks: each
+    block's H is solved with W fixed, and W is updated from the running
+    sufficient statistics (A * H' and H * H') as in Mairal et al. (2010).
+    Only 1 block of a is in memory at a time.
+    :param a: numpy array, numpy memmap, DataFrame, or str; (n_rows,
+    n_columns); filepath to a .npy is memory-mapped
+    :param k: int; number of components
+    :param batch_size: int; number of columns per block
+    :param n_epochs: int; number of passes over the columns
+    :param n_h_iterations: int; number of coordinate-descent sweeps to
+    solve each block's H
+    :param random_seed: int;
+    :return: array, array, and float; W (n_rows, k), H (k, n_columns),
+    and reconstruction error (Frobenius norm)
+    """
+
+    if isinstance(a, str):
+        a = load(a, mmap_mode='r')
+    elif isinstance(a, DataFrame):
+        a = a.values
+
+    n_rows, n_columns = a.shape
+    blocks = [(i, min(i + batch_size, n_columns))
+              for i in range(0, n_columns, batch_size)]
+
+    # Initialize W and H on the scale of A (mean of A summed block by block;
+    # scale is 1 if A is all 0)
+    a_sum = 0
+    for start, end in blocks:
+        a_sum += asarray(a[:, start:end], dtype=float).sum()
+    a_mean = a_sum / (n_rows * n_columns)
+    if 0 < a_mean:
+        scale = sqrt(a_mean / k)
+    else:
+        scale = 1
+    seed(random_seed)
+    w = rand(n_rows, k) * scale
+    h = rand(k, n_columns) * scale
+
+    # Sufficient statistics: A * H' and H * H'
+    a_ht = zeros((n_rows, k))
+    h_ht = zeros((k, k))
+
+    eps = finfo(float).eps
+
+    for epoch in range(n_epochs):
+        for start, end in blocks:
+            a_block = asarray(a[:, start:end], dtype=float)
+
+            # Solve this block's H with W fixed
+            h[:, start:end] = nnls_batch(
+                w, a_block, x=h[:, start:end], max_iter=n_h_iterations,
+                tol=1e-4)
+            h_block = h[:, start:end]
+
+            # Forget the statistics of the previous pass over these columns
+            forget = 1 - (end - start) / n_columns
+            a_ht = forget * a_ht + dot(a_block, h_block.T)
+            h_ht = forget * h_ht + dot(h_block, h_block.T)
+
+            # Update W column by column (block coordinate descent)
+            for j in range(k):
+                if h_ht[j, j]:
+                    w[:, j] = maximum(
+                        w[:, j] +
+                        (a_ht[:, j] - dot(w, h_ht[:, j])) / h_ht[j, j], eps)
+
+    # Fill in H with the final W and compute reconstruction error
+    squared_error = 0
+    for start, end in blocks:
+        a_block = asarray(a[:, start:end], dtype=float)
+        h[:, start:end] = nnls_batch(
+            w, a_block, x=h[:, start:end], max_iter=n_h_iterations)
+        squared_error += ((a_block - dot(w, h[:, start:end]))**2).sum()
+
+    return w, h, sqrt(squared_error)
+
+
 def nmf_bcv(x, nmf, nfold=2, nrepeat=1):
     """
     Bi-crossvalidation of NMF as in Owen and Perry (2009).
@@ -166,8 +271,8 @@ def nmf_bcv(x, nmf, nfold=2, nrepeat=1):
     """
     errors = []
     for rep in range(nrepeat):
-        kf_rows = KFold(x.shape[0], nfold, shuffle=True)
-        kf_cols = KFold(x.shape[1], nfold, shuffle=True)
+        kf_rows = KFold(n_splits=nfold, shuffle=True).split(x)
+        kf_cols = list(KFold(n_splits=nfold, shuffle=True).split(x.T))
         for row_train, row_test in kf_rows:
             for col_train, col_test in kf_cols:
                 a = x[row_test][:, col_test]
@@ -188,3 +293,120 @@ def nmf_bcv(x, nmf, nfold=2, nrepeat=1):
                 errors.append(error)
     mean_error = np.mean(errors)
     return mean_error
+
+
+def compute_nmf_bcv_errors(matrix_,
+                           ks,
+                           n_folds=2,
+                           n_repeats=1,
+                           algorithm='Alternating Least Squares',
+                           n_jobs=1,
+                           random_seed=RANDOM_SEED):
+    """
+    Bi-cross-validate NMF of matrix_ with k from ks as in Owen and Perry
+    (2009). Rows and columns are split into n_folds folds; for each held-out
+    block A, the block D that shares neither its rows nor its columns is
+    NMF-ed (W_D * H_D) and A is predicted from the blocks B (A's rows) and C
+    (A's columns) as B * H_D^+ * W_D^+ * C.
+    Each (repeat, row fold, column fold) is a job that slices A, B, C, and D
+    once and reuses them for all ks.
+    :param matrix_: numpy array or pandas DataFrame; (n_rows, n_columns)
+    :param ks: iterable or int; iterable of int k used for NMF
+    :param n_folds: int; number of row and column folds (O&P suggest 2)
+    :param n_repeats: int; number of random row and column splits
+    :param algorithm: str; 'Alternating Least Squares', 'Lee & Seung', or
+    'Mini-batch'
+    :param n_jobs: int;
+    :param random_seed: int;
+    :return: DataFrame; (n_ks * n_repeats * n_folds^2, 5 [K, Repeat,
+    Row Fold, Column Fold, Error]); error is ||A - A_predicted||^2 / ||A||^2
+    """
+
+    if isinstance(ks, int):
+        ks = [ks]
+    else:
+        ks = sorted(set(ks))
+
+    x = asarray(matrix_, dtype=float)
+
+    args = []
+    for r in range(n_repeats):
+        row_folds = [
+            i
+            for _, i in KFold(
+                n_splits=n_folds, shuffle=True, random_state=random_seed +
+                r).split(x)
+        ]
+        column_folds = [
+            i
+            for _, i in KFold(
+                n_splits=n_folds, shuffle=True, random_state=random_seed +
+                r).split(x.T)
+        ]
+        for r_f, rows in enumerate(row_folds):
+            for c_f, columns in enumerate(column_folds):
+                args.append(
+                    [rows, columns, ks, r, r_f, c_f, algorithm, random_seed])
+
+    print_log('Bi-cross-validating NMF with ks={} ({} jobs, n_jobs={}) ...'.
+              format(ks, len(args), n_jobs))
+
+    return concat(
+        parallelize(
+            _compute_nmf_bcv_errors,
+            args,
+            n_jobs,
+            initializer=_set_nmf_bcv_matrix,
+            initargs=(x, )),
+        ignore_index=True)
+
+
+def _set_nmf_bcv_matrix(x):
+    """
+    Set the matrix being bi-cross-validated in this process.
+    :param x: array; (n_rows, n_columns)
+    :return: None
+    """
+
+    global NMF_BCV_MATRIX
+    NMF_BCV_MATRIX = x
+
+
+def _compute_nmf_bcv_errors(args):
+    """
+    Compute bi-cross-validation errors of 1 held-out block for all ks.
+    :param args: list-like;
+    :return: DataFrame; (n_ks, 5 [K, Repeat, Row Fold, Column Fold, Error])
+    """
+
+    rows, columns, ks, repeat, row_fold, column_fold, algorithm, \
+    random_seed = args
+
+    x = NMF_BCV_MATRIX
+
+    is_row = zeros(x.shape[0], dtype=bool)
+    is_row[rows] = True
+    is_column = zeros(x.shape[1], dtype=bool)
+    is_column[columns] = True
+
+    # Held-out block and the blocks sharing its rows, columns, and neither
+    a = x[ix_(is_row, is_column)]
+    b = x[ix_(is_row, ~is_column)]
+    c = x[ix_(~is_row, is_column)]
+    d = x[ix_(~is_row, ~is_column)]
+
+    a_sum_of_squares = square(a).sum()
+
+    errors = []
+    for k in ks:
+        nmf_ = nmf(d, k, algorithm=algorithm, random_seed=random_seed)[k]
+
+        # 'Lee & Seung' returns numpy matrices, for which ** is matrix power
+        w, h = asarray(nmf_['w']), asarray(nmf_['h'])
+        a_predicted = dot(dot(b, pinv(h)), dot(pinv(w), c))
+
+        error = square(a - a_predicted).sum() / a_sum_of_squares
+        errors.append([k, repeat, row_fold, column_fold, error])
+
+    return DataFrame(
+        errors, columns=['K', 'Repeat', 'Row Fold', 'Column Fold', 'Error'])
@@ -11,23 +11,37 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from sklearn.manifold import MDS
+from hashlib import sha1
+
+from numpy import argsort, asarray, eye, maximum, ones, sqrt
+from numpy.linalg import eigh
+from numpy.random import RandomState
+from scipy.spatial.distance import cdist
+from sklearn.manifold import MDS, smacof
 
 from .. import RANDOM_SEED
+from ..support.parallel_computing import parallelize
 from .score import compute_similarity_matrix
 
+# Distance matrices and coordinates computed by mds(..., cache=True)
+CACHE_SIZE = 32
+_DISTANCES_CACHE = {}
+_COORDINATES_CACHE = {}
+
 
 # TODO: set better default parameters: lower eps and n_init
 def mds(matrix,
         n_components=2,
         dissimilarity='euclidean',
         metric=True,
-        n_init=1000,
+        n_init=None,
         max_iter=1000,
         verbose=0,
         eps=1e-3,
         n_jobs=1,
-        random_state=RANDOM_SEED):
+        random_state=RANDOM_SEED,
+        init=None,
+        cache=False):
     """
     Multidimensional-scale rows of matrix from <n_dimensions>D into <n_components>D.
     :param matrix: DataFrame; (n_points, n_dimensions)
@@ -35,39 +49,243 @@ def mds(matrix,
     :param n_components:
     :param dissimilarity: str or function; given metric or capable of computing the distance between 2 array-likes
     :param metric:
-    :param n_init: int;
+    :param n_init: int; number of SMACOF runs; 1000 if init is None and 8 if init is 'classical' when None
     :param max_iter: int;
     :param verbose:
     :param eps:
     :param n_jobs:
     :param random_state: int; random seed for the initial coordinates
+    :param init: None or str; {None, 'classical'}; random initial coordinates if None; classical (Torgerson) MDS
+    coordinates (jittered after the 1st run) if 'classical'
+    :param cache: bool; reuse distances and coordinates computed earlier for the same matrix and parameters
+    :return: ndarray; (n_points, n_components)
+    """
+
+    if n_init is None:
+        if init is None:
+            n_init = 1000
+        else:
+            n_init = 8
+
+    if cache:
+        matrix_key = _hash_matrix(matrix)
+        dissimilarity_key = _name_dissimilarity(dissimilarity)
+        coordinates_key = (matrix_key, dissimilarity_key, n_components, metric,
+                           n_init, max_iter, eps, random_state, init)
+        if coordinates_key in _COORDINATES_CACHE:
+            return _COORDINATES_CACHE[coordinates_key].copy()
+
+    if init is None:
+        if isinstance(dissimilarity, str):
+            mds_obj = MDS(n_components=n_components,
+                          dissimilarity=dissimilarity,
+                          metric=metric,
+                          n_init=n_init,
+                          max_iter=max_iter,
+                          verbose=verbose,
+                          eps=eps,
+                          n_jobs=n_jobs,
+                          random_state=random_state)
+            coordinates = mds_obj.fit_transform(matrix)
+
+        else:  # Compute distances using dissimilarity, a function
+            mds_obj = MDS(n_components=n_components,
+                          dissimilarity='precomputed',
+                          metric=metric,
+                          n_init=n_init,
+                          max_iter=max_iter,
+                          verbose=verbose,
+                          eps=eps,
+                          n_jobs=n_jobs,
+                          random_state=random_state)
+            if cache:
+                distances = _compute_distances_with_cache(
+                    matrix, dissimilarity, (matrix_key, dissimilarity_key))
+            else:
+                distances = _compute_distances(matrix, dissimilarity)
+            coordinates = mds_obj.fit_transform(distances)
+
+    elif init == 'classical':
+        if cache:
+            distances = _compute_distances_with_cache(
+                matrix, dissimilarity, (matrix_key, dissimilarity_key))
+        else:
+            distances = _compute_distances(matrix, dissimilarity)
+
+        coordinates = _mds_from_classical(distances, n_components, metric,
+                                          n_init, max_iter, verbose, eps,
+                                          n_jobs, random_state)
+
+    else:
+        raise ValueError('Unknown init {}.'.format(init))
+
+    if cache:
+        _store(_COORDINATES_CACHE, coordinates_key, coordinates.copy())
+
+    return coordinates
+
+
+def classical_mds(distances, n_components=2):
+    """
+    Classical (Torgerson) multidimensional scaling: embed points by the top
+    eigenvectors of the double-centered squared distance matrix.
+    :param distances: array-like; (n_points, n_points)
+    :param n_components: int;
     :return: ndarray; (n_points, n_components)
     """
 
+    distances = asarray(distances, dtype=float)
+    n = distances.shape[0]
+
+    # Double center squared distances
+    j = eye(n) - ones((n, n)) / n
+    b = -0.5 * j.dot(distances**2).dot(j)
+
+    eigenvalues, eigenvectors = eigh((b + b.T) / 2)
+    i = argsort(eigenvalues)[::-1][:n_components]
+
+    return eigenvectors[:, i] * sqrt(maximum(eigenvalues[i], 0))
+
+
+def _mds_from_classical(distances, n_components, metric, n_init, max_iter,
+                        verbose, eps, n_jobs, random_state):
+    """
+    Run n_init SMACOF (in parallel) from classical MDS coordinates (jittered
+    after the 1st run) and return the coordinates with the lowest stress.
+    :param distances: array; (n_points, n_points)
+    :param n_components: int;
+    :param metric: bool;
+    :param n_init: int;
+    :param max_iter: int;
+    :param verbose: int;
+    :param eps: float;
+    :param n_jobs: int;
+    :param random_state: int;
+    :return: ndarray; (n_points, n_components)
+    """
+
+    distances = asarray(distances, dtype=float)
+    init = classical_mds(distances, n_components=n_components)
+
+    # Jitter initial coordinates of the restarts by 5% of their spread
+    random_state_ = RandomState(random_state)
+    inits = [init] + [
+        init + random_state_.normal(scale=0.05 * init.std(), size=init.shape)
+        for i in range(n_init - 1)
+    ]
+
+    args = [(distances, n_components, metric, i, max_iter, verbose, eps)
+            for i in inits]
+    if n_jobs == 1 or n_init == 1:
+        returns = [_smacof(a) for a in args]
+    else:
+        returns = parallelize(_smacof, args, min(n_jobs, n_init))
+
+    return min(returns, key=lambda r: r[1])[0]
+
+
+def _smacof(args):
+    """
+    Run SMACOF once from given initial coordinates.
+    :param args: tuple; (distances, n_components, metric, init, max_iter,
+    verbose, eps)
+    :return: ndarray and float; coordinates (n_points, n_components) and stress
+    """
+
+    distances, n_components, metric, init, max_iter, verbose, eps = args
+
+    return smacof(
+        distances,
+        metric=metric,
+        n_components=n_components,
+        init=init,
+        n_init=1,
+        max_iter=max_iter,
+        verbose=verbose,
+        eps=eps)
+
+
+def _compute_distances(matrix, dissimilarity):
+    """
+    Compute distances between rows of matrix.
+    :param matrix: DataFrame; (n_points, n_dimensions)
+    :param dissimilarity: str or function; 'euclidean' or function computing
+    the association between 2 array-likes
+    :return: array; (n_points, n_points)
+    """
+
     if isinstance(dissimilarity, str):
-        mds_obj = MDS(n_components=n_components,
-                      dissimilarity=dissimilarity,
-                      metric=metric,
-                      n_init=n_init,
-                      max_iter=max_iter,
-                      verbose=verbose,
-                      eps=eps,
-                      n_jobs=n_jobs,
-                      random_state=random_state)
-        coordinates = mds_obj.fit_transform(matrix)
-
-    else:  # Compute distances using dissimilarity, a function
-        mds_obj = MDS(n_components=n_components,
-                      dissimilarity='precomputed',
-                      metric=metric,
-                      n_init=n_init,
-                      max_iter=max_iter,
-                      verbose=verbose,
-                      eps=eps,
-                      n_jobs=n_jobs,
-                      random_state=random_state)
-        coordinates = mds_obj.fit_transform(
+        if dissimilarity != 'euclidean':
+            raise ValueError(
+                'Unknown dissimilarity {}.'.format(dissimilarity))
+        m = asarray(matrix, dtype=float)
+        return cdist(m, m)
+
+    else:
+        return asarray(
             compute_similarity_matrix(
                 matrix, matrix, dissimilarity, is_distance=True, axis=1))
 
-    return coordinates
+
+def _compute_distances_with_cache(matrix, dissimilarity, key):
+    """
+    Compute distances between rows of matrix, reusing earlier ones for the
+    same key.
+    :param matrix: DataFrame; (n_points, n_dimensions)
+    :param dissimilarity: str or function;
+    :param key: hashable;
+    :return: array; (n_points, n_points)
+    """
+
+    if key not in _DISTANCES_CACHE:
+        _store(_DISTANCES_CACHE, key,
+               _compute_distances(matrix, dissimilarity))
+
+    return _DISTANCES_CACHE[key]
+
+
+def _hash_matrix(matrix):
+    """
+    Hash values, shape, and labels (if any) of matrix.
+    :param matrix: DataFrame or array;
+    :return: str;
+    """
+
+    a = asarray(matrix, dtype=float)
+
+    h = sha1(a.tobytes())
+    h.update(str(a.shape).encode())
+    for labels in (getattr(matrix, 'index', ()), getattr(matrix, 'columns',
+                                                          ())):
+        h.update(str(list(labels)).encode())
+
+    return h.hexdigest()
+
+
+def _name_dissimilarity(dissimilarity):
+    """
+    Make a cache key for dissimilarity.
+    :param dissimilarity: str or function;
+    :return: str or tuple;
+    """
+
+    if isinstance(dissimilarity, str):
+        return dissimilarity
+    else:
+        return (getattr(dissimilarity, '__module__', None),
+                getattr(dissimilarity, '__qualname__', None), id(dissimilarity))
+
+
+def _store(cache, key, value):
+    """
+    Store value in cache, dropping the oldest entry when it is full.
+    :param cache: dict;
+    :param key: hashable;
+    :param value: object;
+    :return: None
+    """
+
+    if CACHE_SIZE <= len(cache):
+        cache.pop(next(iter(cache)))
+
+    cache[key] = value
@@ -11,34 +11,120 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from numpy import dot
+from numpy import abs, array_split, asarray, concatenate, dot, empty, maximum
 from numpy.linalg import pinv
 from pandas import DataFrame
 from scipy.optimize import nnls
 
+from ..support.parallel_computing import parallelize
 
-def solve_matrix_linear_equation(a, b, method='nnls'):
+
+def solve_matrix_linear_equation(a,
+                                 b,
+                                 method='nnls',
+                                 n_jobs=1,
+                                 max_iter=1000,
+                                 tol=1e-10):
     """
     Solve a * x = b of (n, k) * (k, m) = (n, m).
-    :param a: numpy array; (n, k)
-    :param b: numpy array; (n, m)
-    :param method: str; {'nnls', 'pinv'}
-    :return: numpy array; (k, m)
+    :param a: numpy array or DataFrame; (n, k)
+    :param b: numpy array or DataFrame; (n, m)
+    :param method: str; {'nnls', 'batch_nnls', 'pinv'}; 'nnls' solves each
+    column of b exactly (columns are split across n_jobs jobs); 'batch_nnls'
+    solves all columns together (see nnls_batch)
+    :param n_jobs: int; number of jobs for 'nnls'
+    :param max_iter: int; max number of sweeps for 'batch_nnls'
+    :param tol: number; tolerance for 'batch_nnls'
+    :return: numpy array or DataFrame; (k, m)
     """
 
+    a_ = asarray(a, dtype=float)
+    b_ = asarray(b, dtype=float)
+
     if method == 'nnls':
-        x = DataFrame(index=a.columns, columns=b.columns)
-        for i in range(b.shape[1]):
-            x.iloc[:, i] = nnls(a, b.iloc[:, i])[0]
+        if 1 < n_jobs:
+            x = concatenate(
+                parallelize(_nnls_columns,
+                            [(a_, b_block)
+                             for b_block in array_split(
+                                 b_, min(n_jobs, b_.shape[1]), axis=1)],
+                            n_jobs),
+                axis=1)
+        else:
+            x = _nnls_columns((a_, b_))
+
+    elif method == 'batch_nnls':
+        x = nnls_batch(a_, b_, max_iter=max_iter, tol=tol)
 
     elif method == 'pinv':
-        a_pinv = pinv(a)
-        x = dot(a_pinv, b)
+        a_pinv = pinv(a_)
+        x = dot(a_pinv, b_)
         x[x < 0] = 0
+
+    else:
+        raise ValueError(
+            'Unknown method {}. Choose from [\'nnls\', \'batch_nnls\', '
+            '\'pinv\']'.format(method))
+
+    if isinstance(a, DataFrame) and isinstance(b, DataFrame):
         x = DataFrame(x, index=a.columns, columns=b.columns)
 
+    return x
+
+
+def _nnls_columns(args):
+    """
+    Solve a * x = b for x >= 0 column by column.
+    :param args: list-like; (array (n, k); a, array (n, m); b)
+    :return: array; (k, m)
+    """
+
+    a, b = args
+
+    x = empty((a.shape[1], b.shape[1]))
+    for i in range(b.shape[1]):
+        x[:, i] = nnls(a, b[:, i])[0]
+
+    return x
+
+
+def nnls_batch(a, b, x=None, max_iter=1000, tol=1e-10):
+    """
+    Solve min ||a * x - b|| for x >= 0 for all columns of b together.
+    a' * a and a' * b are computed once; then each coordinate-descent sweep
+    updates x 1 row (1 coefficient of every column) at a time with the
+    exact minimizer projected onto x >= 0.
+    :param a: array; (n, k)
+    :param b: array; (n, m)
+    :param x: array; (k, m); initial x; clipped least-squares solution if
+    None
+    :param max_iter: int; max number of sweeps
+    :param tol: number; stop when no coefficient changes by more than tol *
+    max(x) in a sweep
+    :return: array; (k, m)
+    """
+
+    a = asarray(a, dtype=float)
+    b = asarray(b, dtype=float)
+
+    at_a = dot(a.T, a)
+    at_b = dot(a.T, b)
+
+    if x is None:
+        x = maximum(dot(pinv(a), b), 0)
     else:
-        raise ValueError('Unknown method {}. Choose from [\'nnls\', \'pinv\']'.
-                         format(method))
+        x = asarray(x, dtype=float).copy()
+
+    for _ in range(max_iter):
+        max_change = 0
+        for j in range(a.shape[1]):
+            if at_a[j, j]:
+                x_j = maximum(x[j] + (at_b[j] - dot(at_a[j], x)) / at_a[j, j],
+                              0)
+                max_change = max(max_change, abs(x_j - x[j]).max())
+                x[j] = x_j
+
+        if max_change <= tol * max(x.max(), 1):
+            break
 
     return x
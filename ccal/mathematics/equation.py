@@ -11,7 +11,7 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from numpy import argmax, empty, exp, sqrt
+from numpy import arange, argmax, asarray, exp, sqrt
 from scipy.special import stdtr
 from scipy.stats.distributions import t
 
@@ -32,38 +32,40 @@ def define_exponential_function(x, a, k, c):
 def define_skew_t_pdf(x, df, shape, location, scale):
     """
     Evaluate skew-t PDF (defined by `df`, `shape`, `location`, and `scale`) at `x`.
+    Arguments broadcast, so a matrix of x (n_functions, n_x) and parameter columns (n_functions, 1) evaluate many PDFs
+    at once.
     :param x: array-like; vector of independent variables used to compute probabilities of the skew-t PDF.
-    :param df: number; degree of freedom of the skew-t PDF
-    :param shape: number; skewness or shape parameter of the skew-t PDF
-    :param location: number; location of the skew-t PDF
-    :param scale: number; scale of the skew-t PDF
+    :param df: number or array-like; degree of freedom of the skew-t PDF
+    :param shape: number or array-like; skewness or shape parameter of the skew-t PDF
+    :param location: number or array-like; location of the skew-t PDF
+    :param scale: number or array-like; scale of the skew-t PDF
     :return array-like: skew-t PDF (defined by `df`, `shape`, `location`, and `scale`) evaluated at `x`.
     """
 
-    return (2 / scale) * t._pdf((
-        (x - location) / scale), df) * stdtr(df + 1, shape * (
-            (x - location) / scale) * sqrt((df + 1) / (df + x**2)))
+    x, df, shape, location, scale = (asarray(a, dtype=float)
+                                     for a in (x, df, shape, location, scale))
+
+    z = (x - location) / scale
+
+    return (2 / scale) * t.pdf(z, df) * stdtr(df + 1, shape * z * sqrt(
+        (df + 1) / (df + z**2)))
 
 
 def define_x_coordinates_for_reflection(function, x_grids):
     """
-    Make x_grids for getting reflecting PDF.
-    :param function: array-like; (1, x_grids.size)
-    :param x_grids: array-like; (1, x_grids.size)
-    :return: array; (1, x_grids.size)
+    Make x_grids for getting reflecting PDF: reflect x_grids around the x of the function's maximum.
+    :param function: array-like; (x_grids.size) or (n_functions, n_x_grids)
+    :param x_grids: array-like; (x_grids.size) or (n_functions, n_x_grids)
+    :return: array; (x_grids.size) or (n_functions, n_x_grids)
     """
 
-    pivot_x = x_grids[argmax(function)]
-
-    x_grids_for_reflection = empty(len(x_grids))
-    for i, a_x in enumerate(x_grids):
-
-        distance_to_reflecting_x = abs(a_x - pivot_x) * 2
-
-        if a_x < pivot_x:  # Left of the pivot x
-            x_grids_for_reflection[i] = a_x + distance_to_reflecting_x
+    function = asarray(function)
+    x_grids = asarray(x_grids, dtype=float)
 
-        else:  # Right of the pivot x
-            x_grids_for_reflection[i] = a_x - distance_to_reflecting_x
+    i = argmax(function, axis=-1)
+    if x_grids.ndim == 1:
+        pivot_x = x_grids[i]
+    else:
+        pivot_x = x_grids[arange(x_grids.shape[0]), i][:, None]
 
-    return x_grids_for_reflection
+    return 2 * pivot_x - x_grids
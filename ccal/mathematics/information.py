@@ -11,23 +11,38 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-import rpy2.robjects as ro
-from numpy import asarray, exp, finfo, isnan, log, sign, sqrt, sum, sort
+from numpy import (arange, asarray, bincount, correlate, dot, exp, finfo,
+                   isnan, linspace, log, pi, sign, sqrt, sum, sort, trunc)
 from numpy.random import random_sample, seed
-from rpy2.robjects.numpy2ri import numpy2ri
-from rpy2.robjects.packages import importr
-from scipy.stats import pearsonr
+from scipy.optimize import minimize_scalar
+from scipy.stats import norm, pearsonr
 
 from .. import RANDOM_SEED
 from ..support.d2 import drop_nan_columns
 
 EPS = finfo(float).eps
 
-ro.conversion.py2ri = numpy2ri
+# R's MASS; imported (starting R) on first use by _get_mass
+MASS = None
 
-mass = importr('MASS')
-bcv = mass.bcv
-kde2d = mass.kde2d
+
+def _get_mass():
+    """
+    Import R's MASS through rpy2 once.
+    :return: rpy2 package; MASS
+    """
+
+    global MASS
+
+    if MASS is None:
+        import rpy2.robjects as ro
+        from rpy2.robjects.numpy2ri import numpy2ri
+        from rpy2.robjects.packages import importr
+
+        ro.conversion.py2ri = numpy2ri
+        MASS = importr('MASS')
+
+    return MASS
 
 
 def information_coefficient(x, y, n_grids=25,
@@ -63,14 +78,15 @@ def information_coefficient(x, y, n_grids=25,
     y += random_sample(y.size) * jitter
 
     # Compute bandwidths
+    mass = _get_mass()
     cor, p = pearsonr(x, y)
-    bandwidth_x = asarray(bcv(x)[0]) * (1 + (-0.75) * abs(cor))
-    bandwidth_y = asarray(bcv(y)[0]) * (1 + (-0.75) * abs(cor))
+    bandwidth_x = asarray(mass.bcv(x)[0]) * (1 + (-0.75) * abs(cor))
+    bandwidth_y = asarray(mass.bcv(y)[0]) * (1 + (-0.75) * abs(cor))
 
     # Compute P(x, y), P(x), P(y)
     fxy = asarray(
-        kde2d(x, y, asarray([bandwidth_x, bandwidth_y]), n=asarray([n_grids]))[
-            2]) + EPS
+        mass.kde2d(x, y, asarray([bandwidth_x, bandwidth_y]),
+                   n=asarray([n_grids]))[2]) + EPS
     dx = (x.max() - x.min()) / (n_grids - 1)
     dy = (y.max() - y.min()) / (n_grids - 1)
     pxy = fxy / (fxy.sum() * dx * dy)
@@ -97,6 +113,80 @@ def information_coefficient(x, y, n_grids=25,
     return ic
 
 
+def estimate_bandwidth_bcv(x, n_bins=1000):
+    """
+    Estimate the bandwidth of Gaussian KDE of x by biased cross-validation
+    (Scott & Terrell, 1987); native port of R's MASS::bcv.
+    :param x: array; (n_values)
+    :param n_bins: int; number of bins for the pairwise-distance counts
+    :return: float; bandwidth
+    """
+
+    x = asarray(x, dtype=float)
+    n = x.size
+    if n < 2:
+        raise ValueError('Need at least 2 data points.')
+
+    h_max = 1.144 * x.std(ddof=1) * n**(-1 / 5) * 4
+    lower = 0.1 * h_max
+
+    # Count binned pairwise distances (bins as in MASS's VR_den_bin)
+    d = (x.max() - x.min()) * 1.01 / n_bins
+    bins = trunc(x / d).astype(int)
+    bin_counts = bincount(bins - bins.min())
+    pair_counts = correlate(bin_counts, bin_counts,
+                            'full')[bin_counts.size - 1:]
+    pair_counts[0] = (bin_counts * (bin_counts - 1) // 2).sum()
+    pair_counts = pair_counts[:n_bins]
+
+    def bcv_score(h):
+        h /= 4
+        delta = (arange(pair_counts.size) * d / h)**2
+        is_ = delta < 1000
+        terms = exp(-delta[is_] / 4) * (delta[is_]**2 - 12 * delta[is_] + 12)
+        return (1 + (terms * pair_counts[is_]).sum() / (32 * n)) / (
+            2 * n * h * sqrt(pi))
+
+    return minimize_scalar(
+        bcv_score,
+        bounds=(lower, h_max),
+        method='bounded',
+        options={'xatol': 0.1 * lower}).x
+
+
+def estimate_kde_2d(x, y, bandwidths, n_grids=25, lims=None):
+    """
+    Estimate 2D Gaussian kernel density of x and y on n_grids x n_grids
+    grids; native port of R's MASS::kde2d.
+    :param x: array; (n_values)
+    :param y: array; (n_values)
+    :param bandwidths: array-like; (2); x and y bandwidths (as in MASS::kde2d,
+    4 x standard deviation of the Gaussian kernel)
+    :param n_grids: int; number of grids in each dimension
+    :param lims: array-like; (4 [x_min, x_max, y_min, y_max]); grid limits;
+    ranges of x and y if None
+    :return: array, array, and array; x grids (n_grids), y grids (n_grids),
+    and densities (n_grids, n_grids) indexed by x and y grids
+    """
+
+    x = asarray(x, dtype=float)
+    y = asarray(y, dtype=float)
+
+    if lims is None:
+        lims = (x.min(), x.max(), y.min(), y.max())
+
+    x_grids = linspace(lims[0], lims[1], n_grids)
+    y_grids = linspace(lims[2], lims[3], n_grids)
+
+    h_x, h_y = asarray(bandwidths, dtype=float) / 4
+
+    # (n_grids, n_values) kernel values for each dimension
+    k_x = norm.pdf((x_grids[:, None] - x[None, :]) / h_x)
+    k_y = norm.pdf((y_grids[:, None] - y[None, :]) / h_y)
+
+    return x_grids, y_grids, dot(k_x, k_y.T) / (x.size * h_x * h_y)
+
+
 def compute_entropy(a):
     """
     Compute entropy of a.
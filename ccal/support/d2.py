@@ -11,13 +11,18 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from numpy import array, isnan, ones, rank
+from warnings import catch_warnings, simplefilter
+
+from numpy import (arange, argsort, array, asarray, bincount, broadcast_to,
+                   cumsum, empty, isnan, nan, nanmax, nanmean, nanmin, nanstd,
+                   ones, put_along_axis, shares_memory, take_along_axis, tile,
+                   where)
 from numpy.random import seed, shuffle
 from pandas import DataFrame, Series, concat
 from scipy.cluster.hierarchy import dendrogram, linkage
 
 from .. import RANDOM_SEED
-from ..support.d1 import drop_na_1d, normalize_1d
+from ..support.d1 import drop_na_1d
 
 
 def drop_na_2d(df, axis='both', how='all'):
@@ -224,109 +229,200 @@ def normalize_2d_or_1d(a,
                        normalizing_std=None,
                        normalizing_min=None,
                        normalizing_max=None,
-                       normalizing_size=None):
+                       normalizing_size=None,
+                       inplace=False):
     """
-    Normalize a DataFrame or Series.
-    :param a: array; (2, n)
+    Normalize a DataFrame, Series, or array; all slices along axis are normalized at once.
+    :param a: DataFrame, Series, or array; (n, m) or (n)
     :param method: str; normalization type; '-0-', '0-1', or 'rank'
-    :param rank_scale: number; scaling factor for rank normalization: (ranks / size) * n_ranks
     :param axis: int; None for global, 0 for by-column, and 1 for by-row normalization
-    :param normalizing_mean:
-    :param normalizing_std:
-    :param normalizing_min:
-    :param normalizing_max:
-    :param normalizing_size:
-    :return: array; (2, n)
+    :param rank_scale: number; scaling factor for rank normalization: ranks * rank_scale, where ranks start from 0 and
+    ties get their average rank
+    :param normalizing_mean: number or array; (n_slices); mean(s) to use instead of the slices' (NaN-skipping) means
+    :param normalizing_std: number or array; (n_slices); STD(s) to use instead of the slices' (NaN-skipping) STDs
+    :param normalizing_min: number or array; (n_slices); min(s) to use instead of the slices' (NaN-skipping) mins
+    :param normalizing_max: number or array; (n_slices); max(s) to use instead of the slices' (NaN-skipping) maxs
+    :param normalizing_size: int; size dividing slices that can't be '-0-' (STD = 0) or '0-1' (max - min = 0)
+    normalized; slice size if None
+    :param inplace: bool; write the normalized values into a (which must be float) and return it; pandas objects
+    are normalized without a copy when their values are a writable view
+    :return: DataFrame, Series, or array; (n, m) or (n); NaN stay NaN
     """
 
-    if rank(a) == 1:
-        n_a = normalize_1d(
-            a,
-            method,
-            rank_scale=rank_scale,
-            normalizing_mean=normalizing_mean,
-            normalizing_std=normalizing_std,
-            normalizing_min=normalizing_min,
-            normalizing_max=normalizing_max,
-            normalizing_size=normalizing_size)
-        if isinstance(a, Series):
-            return Series(n_a, index=a.index)
+    if a.ndim not in (1, 2):
+        raise ValueError('Can\'t normalize >2 dimensional array-like.')
+
+    is_pandas = isinstance(a, (DataFrame, Series))
+
+    is_view = False
+    if inplace:
+        if is_pandas and a.ndim == 2:
+            dtypes = a.dtypes
+        else:
+            dtypes = [a.dtype]
+        if any(d.kind != 'f' for d in dtypes):
+            raise ValueError('Can\'t normalize non-float array in place.')
+
+        if is_pandas:
+            # Normalize pandas' values directly if they are a writable view (a single float block), else a copy
+            values = a.values
+            is_view = values.flags.writeable and shares_memory(
+                values, a.values)
+            if not is_view:
+                values = array(values, dtype=float)
         else:
-            return n_a
-
-    elif rank(a) == 2:
-        if isinstance(a, DataFrame):
-            if axis == 0 or axis == 1:
-                return a.apply(
-                    normalize_1d,
-                    **{
-                        'method': method,
-                        'rank_scale': rank_scale,
-                        'normalizing_mean': normalizing_mean,
-                        'normalizing_std': normalizing_std,
-                        'normalizing_min': normalizing_min,
-                        'normalizing_max': normalizing_max,
-                        'normalizing_size': normalizing_size
-                    },
-                    axis=axis)
-
-            else:
-
-                # Get normalizing size
-                if normalizing_size is not None:
-                    size = normalizing_size
-                else:
-                    size = a.values.size
-
-                if method == '-0-':
-
-                    # Get normalizing mean
-                    if normalizing_mean is not None:
-                        mean = normalizing_mean
-                    else:
-                        mean = a.values.mean()
-
-                    # Get normalizing STD
-                    if normalizing_std is not None:
-                        std = normalizing_std
-                    else:
-                        std = a.values.std()
-
-                    # Normalize
-                    if std == 0:
-                        print(
-                            'Not \'0-1\' normalizing (std = 0), but \'/ size\' normalizing ...'
-                        )
-                        return a / size
-                    else:
-                        return (a - mean) / std
-
-                elif method == '0-1':
-
-                    # Get normalizing min
-                    if normalizing_min is not None:
-                        min_ = normalizing_min
-                    else:
-                        min_ = a.values.min()
-
-                    # Get normalizing max
-                    if normalizing_max is not None:
-                        max_ = normalizing_max
-                    else:
-                        max_ = a.values.max()
-
-                    # Normalize
-                    if max_ - min_ == 0:
-                        print(
-                            'Not \'0-1\' normalizing (max - min = 0), but \'/ size\' normalizing ...'
-                        )
-                        return a / size
-                    else:
-                        return (a - min_) / (max_ - min_)
-
-                elif method == 'rank':
-                    raise ValueError(
-                        'Normalizing combination of \'rank\' & axis=\'all\' has not been implemented yet.'
-                    )
+            values = a
     else:
-        raise ValueError('Can\'t normalize >2 dimensional array-like.')
+        values = array(a, dtype=float)
+
+    # Use pandas' STD (ddof=1) for slices of pandas objects and numpy's (ddof=0) otherwise, as normalize_1d does
+    if is_pandas and (a.ndim == 1 or axis is not None):
+        ddof = 1
+    else:
+        ddof = 0
+
+    if a.ndim == 1:
+        slices = values.reshape(1, -1)
+    elif axis is None:
+        slices = values.reshape(1, -1)
+    elif axis == 0:  # Columns
+        slices = values.T
+    elif axis == 1:  # Rows
+        slices = values
+    else:
+        raise ValueError('Unknown axis {}.'.format(axis))
+
+    _normalize_slices(slices, method, ddof, rank_scale, normalizing_mean,
+                      normalizing_std, normalizing_min, normalizing_max,
+                      normalizing_size)
+
+    # Reshaping a non-contiguous array copies it
+    if not shares_memory(slices, values):
+        values[...] = slices.reshape(values.shape)
+
+    if isinstance(a, DataFrame):
+        if inplace:
+            if not is_view:  # Write back keeping each column's float dtype
+                for i, d in enumerate(a.dtypes):
+                    a.iloc[:, i] = values[:, i].astype(d)
+            return a
+        else:
+            return DataFrame(values, index=a.index, columns=a.columns)
+
+    elif isinstance(a, Series):
+        if inplace:
+            if not is_view:
+                a.iloc[:] = values.astype(a.dtype)
+            return a
+        else:
+            return Series(values, index=a.index, name=a.name)
+
+    else:
+        return values
+
+
+def _normalize_slices(slices, method, ddof, rank_scale, normalizing_mean,
+                      normalizing_std, normalizing_min, normalizing_max,
+                      normalizing_size):
+    """
+    Normalize each row of slices in place.
+    :param slices: array; (n_slices, slice_size); float
+    :param method: str; normalization type; '-0-', '0-1', or 'rank'
+    :param ddof: int; delta degrees of freedom for STD
+    :param rank_scale: number;
+    :param normalizing_mean: None, number, or array; (n_slices)
+    :param normalizing_std: None, number, or array; (n_slices)
+    :param normalizing_min: None, number, or array; (n_slices)
+    :param normalizing_max: None, number, or array; (n_slices)
+    :param normalizing_size: None or int;
+    :return: None
+    """
+
+    if normalizing_size is not None:
+        size = normalizing_size
+    else:
+        size = slices.shape[1]
+
+    with catch_warnings():
+        # All-NaN slices stay NaN
+        simplefilter('ignore', RuntimeWarning)
+
+        if method == '-0-':
+            mean = _get_slice_parameter(normalizing_mean, nanmean, slices)
+            std = _get_slice_parameter(normalizing_std, nanstd, slices,
+                                       ddof=ddof)
+            is_constant = std == 0
+            shift, scale = where(is_constant, 0, mean), where(
+                is_constant, size, std)
+
+        elif method == '0-1':
+            min_ = _get_slice_parameter(normalizing_min, nanmin, slices)
+            max_ = _get_slice_parameter(normalizing_max, nanmax, slices)
+            is_constant = max_ - min_ == 0
+            shift, scale = where(is_constant, 0, min_), where(
+                is_constant, size, max_ - min_)
+
+        elif method == 'rank':
+            slices[...] = _rank_slices(slices) * rank_scale
+            return
+
+        else:
+            raise ValueError('Unknown method {}.'.format(method))
+
+    n_constant = broadcast_to(is_constant, (slices.shape[0], 1)).sum()
+    if n_constant:
+        print(
+            'Not \'{}\' normalizing {} constant slice(s), but \'/ size\' normalizing ...'.
+            format(method, n_constant))
+
+    slices -= shift
+    slices /= scale
+
+
+def _get_slice_parameter(parameter, function, slices, **kwargs):
+    """
+    Get a normalizing parameter for each slice.
+    :param parameter: None, number, or array; (n_slices); given parameter(s)
+    :param function: callable; computes the parameter along axis 1 when parameter is None
+    :param slices: array; (n_slices, slice_size)
+    :return: number or array; (n_slices, 1)
+    """
+
+    if parameter is None:
+        return function(slices, axis=1, keepdims=True, **kwargs)
+    else:
+        parameter = asarray(parameter, dtype=float)
+        if parameter.ndim:
+            return parameter.reshape(-1, 1)
+        else:
+            return parameter
+
+
+def _rank_slices(slices):
+    """
+    Rank each row of slices from 0, giving ties their average rank (as scipy.stats.rankdata does, minus 1).
+    :param slices: array; (n_slices, slice_size)
+    :return: array; (n_slices, slice_size); NaN stay NaN
+    """
+
+    n_slices, slice_size = slices.shape
+
+    # NaNs are sorted last and each is its own tie group
+    order = argsort(slices, axis=1, kind='mergesort')
+    sorted_slices = take_along_axis(slices, order, axis=1)
+
+    # Find tie groups (in all slices at once) and their starts within slices
+    is_start = ones(slices.shape, dtype=bool)
+    is_start[:, 1:] = sorted_slices[:, 1:] != sorted_slices[:, :-1]
+    is_start = is_start.ravel()
+    groups = cumsum(is_start) - 1
+    starts = tile(arange(slice_size), n_slices)[is_start]
+
+    average_ranks = starts + (bincount(groups) - 1) / 2
+
+    ranks = empty(slices.shape)
+    put_along_axis(
+        ranks, order, average_ranks[groups].reshape(slices.shape), axis=1)
+    ranks[isnan(slices)] = nan
+
+    return ranks
@@ -11,15 +11,30 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from os import environ, listdir, mkdir
+from gzip import open as gzip_open
+from hashlib import sha1
+from io import StringIO
+from json import dump as dump_json
+from json import load as load_json
+from os import environ, listdir, mkdir, remove, stat
 from os.path import abspath, isdir, isfile, islink, join, split
+from re import escape
+from shutil import rmtree
 from sys import platform
+from time import time
 
-from Bio import bgzf
-from pandas import DataFrame, Series, concat, read_csv
+from numpy import (arange, argsort, array, concatenate, cumsum, diff, empty,
+                   inf, int32, lexsort, load, maximum, nan, repeat, save,
+                   searchsorted, sort, unique, where, zeros)
+from pandas import (DataFrame, Index, Series, concat, read_csv, read_pickle,
+                    to_numeric)
 
+from .parallel_computing import parallelize
 from .str_ import remove_nested_quotes, split_ignoring_inside_quotes
 
+# Width of the zero-padded number of rows GCTWriter writes when it is unknown
+N_ROWS_WIDTH = 12
+
 
 # ==============================================================================
 # General functions
@@ -150,7 +165,8 @@ def read_gct(filepath,
              fill_na=None,
              drop_description=True,
              row_name=None,
-             column_name=None):
+             column_name=None,
+             cache=True):
     """
     Read a .gct (filepath) and convert it into a DataFrame.
 
@@ -159,16 +175,44 @@ def read_gct(filepath,
     :param drop_description: bool; drop the Description column (column 2 in the .gct) or not
     :param row_name: str;
     :param column_name: str;
+    :param cache: bool; read from (or, on the 1st read, write) a binary sidecar <filepath>.cache/ that is valid while
+    the .gct's path, size, and modification time are unchanged; only numeric .gcts are cached
     :return: DataFrame; [n_samples, n_features (or n_features + 1 if not dropping the Description column)]
     """
 
-    # Read .gct
-    df = read_csv(filepath, skiprows=2, sep='\t')
+    df = None
+    if cache:
+        df = _read_gct_cache(filepath)
+
+    if df is None:
+        df = _parse_gct(filepath)
+        if cache:
+            _write_gct_cache(filepath, df)
 
     # Fix missing values
     if fill_na:
         df.fillna(fill_na, inplace=True)
 
+    if drop_description:
+        df.drop('Description', axis=1, inplace=True)
+
+    # Set row and column name
+    df.index.name = row_name
+    df.columns.name = column_name
+
+    return df
+
+
+def _parse_gct(filepath):
+    """
+    Parse a .gct (filepath) into a DataFrame indexed by Name with the Description column.
+    :param filepath: str; filepath to .gct
+    :return: DataFrame; (n_samples, 1 + n_features)
+    """
+
+    # Read .gct
+    df = read_csv(filepath, skiprows=2, sep='\t')
+
     # Get 'Name' and 'Description' columns
     c1, c2 = df.columns[:2]
 
@@ -182,7 +226,7 @@ def read_gct(filepath,
             )
     df.set_index('Name', inplace=True)
 
-    # Check if the 2nd column is 'Description'; is so drop it as necessary
+    # Check if the 2nd column is 'Description'
     if c2 != 'Description':
         if c2.strip() != 'Description':
             raise ValueError('Column 2 != \'Description\'')
@@ -190,56 +234,353 @@ def read_gct(filepath,
             raise ValueError(
                 'Column 2 has more than 1 extra space around \'Description\'. Please strip it.'
             )
-    if drop_description:
-        df.drop('Description', axis=1, inplace=True)
 
-    # Set row and column name
-    df.index.name = row_name
-    df.columns.name = column_name
+    return df
+
+
+def _get_file_cache_key(filepath):
+    """
+    Make the key identifying the current content of a file (.gct, .gtf, ...) without reading it.
+    :param filepath: str;
+    :return: dict; {'path': str, 'size': int, 'mtime_ns': int}
+    """
+
+    s = stat(filepath)
+
+    return {
+        'path': abspath(filepath),
+        'size': s.st_size,
+        'mtime_ns': s.st_mtime_ns
+    }
+
+
+def _read_gct_cache(filepath):
+    """
+    Read a .gct from its binary sidecar if the sidecar is valid.
+    :param filepath: str; filepath to .gct
+    :return: None or DataFrame; (n_samples, 1 + n_features)
+    """
+
+    labels = _read_gct_cache_labels(filepath)
+    if labels is None:
+        return None
+
+    try:
+        values = load(join('{}.cache'.format(filepath), 'values.npy'))
+    except (OSError, ValueError):
+        return None
+
+    df = DataFrame(values, index=labels['index'], columns=labels['columns'])
+    if len(set(labels['dtypes'])) != 1:
+        df = df.astype(dict(zip(labels['columns'], labels['dtypes'])))
+    df.insert(0, 'Description', labels['descriptions'])
+    df.index.name = 'Name'
 
     return df
 
 
-def write_gct(matrix, filepath, descriptions=None):
+def _read_gct_cache_labels(filepath):
+    """
+    Read the labels of a .gct's binary sidecar if the sidecar is valid.
+    :param filepath: str; filepath to .gct
+    :return: None or dict; {'key': dict, 'index': list, 'columns': list, 'dtypes': list, 'descriptions': list}
+    """
+
+    try:
+        with open(join('{}.cache'.format(filepath), 'labels.json')) as f:
+            labels = load_json(f)
+
+        if labels['key'] != _get_file_cache_key(filepath):
+            return None
+
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return labels
+
+
+def _write_gct_cache(filepath, df):
     """
-    Establish .gct filepath and write matrix to it.
+    Write a .gct's values and labels to its binary sidecar <filepath>.cache/ (values.npy and labels.json); skip
+    non-numeric .gcts and unwritable directories.
+    :param filepath: str; filepath to .gct
+    :param df: DataFrame; (n_samples, 1 + n_features); parsed .gct
+    :return: None
+    """
+
+    values = df.iloc[:, 1:]
+    if not all(d.kind in 'biuf' for d in values.dtypes):
+        return
+
+    directory_path = '{}.cache'.format(filepath)
+    try:
+        if not isdir(directory_path):
+            mkdir(directory_path)
+
+        save(join(directory_path, 'values.npy'), values.values)
+
+        with open(join(directory_path, 'labels.json'), 'w') as f:
+            dump_json({
+                'key': _get_file_cache_key(filepath),
+                'index': values.index.tolist(),
+                'columns': values.columns.tolist(),
+                'dtypes': [d.str for d in values.dtypes],
+                'descriptions': df.iloc[:, 0].tolist(),
+            }, f)
+
+    except (OSError, TypeError):
+        pass
+
+
+def write_gct(matrix, filepath, descriptions=None, chunksize=10000):
+    """
+    Establish .gct filepath and write matrix to it (in row blocks, without copying matrix).
     :param matrix: DataFrame or Serires; (n_samples, m_features)
     :param filepath: str; filepath; adds .gct suffix if missing
     :param descriptions: iterable; (n_samples); description column
+    :param chunksize: int; number of rows to write at a time
     :return: None
     """
 
-    # Copy
-    obj = matrix.copy()
-
     # Work with only DataFrame
-    if isinstance(obj, Series):
-        obj = DataFrame(obj).T
+    if isinstance(matrix, Series):
+        matrix = DataFrame(matrix).T
 
-    # Add description column if missing
-    if obj.columns[0] != 'Description':
-        if descriptions:
-            obj.insert(0, 'Description', descriptions)
-        else:
-            obj.insert(0, 'Description', obj.index)
-
-    # Set row and column name
-    obj.index.name = 'Name'
-    obj.columns.name = None
+    # Use description column if present
+    if matrix.columns[0] == 'Description':
+        descriptions = matrix.iloc[:, 0]
+        matrix = matrix.iloc[:, 1:]
+    elif descriptions is not None:
+        descriptions = list(descriptions)
 
     # Save as .gct
     if not filepath.endswith('.gct'):
         filepath += '.gct'
-    establish_filepath(filepath)
-    with open(filepath, 'w') as f:
-        f.writelines('#1.2\n{}\t{}\n'.format(obj.shape[0], obj.shape[1] - 1))
-        obj.to_csv(f, sep='\t')
+    with GCTWriter(filepath, matrix.columns, n_rows=matrix.shape[0]) as w:
+        for i in range(0, matrix.shape[0], chunksize):
+            if descriptions is None:
+                w.write(matrix.iloc[i:i + chunksize])
+            else:
+                w.write(matrix.iloc[i:i + chunksize],
+                        descriptions=descriptions[i:i + chunksize])
+
+
+class GCTWriter:
+    """
+    Write a .gct in row blocks: the header is written at opening, and the number of rows is written at closing.
+    Use as a context manager:
+        with GCTWriter(filepath, columns) as w:
+            for block in blocks:
+                w.write(block)
+    """
+
+    def __init__(self, filepath, columns, n_rows=None):
+        """
+        :param filepath: str; filepath to .gct
+        :param columns: iterable; column labels
+        :param n_rows: int; number of rows if known (the dimension line is then written as is, else zero-padded and
+        patched at closing)
+        """
+
+        self.filepath = filepath
+        self.columns = Index(columns)
+        self.n_rows = n_rows
+        self.n_written_rows = 0
+
+        establish_filepath(filepath)
+        self._file = open(filepath, 'w')
+        self._file.write('#1.2\n')
+        self._dimension_position = self._file.tell()
+        if n_rows is None:
+            self._file.write('{:0{}d}\t{}\n'.format(0, N_ROWS_WIDTH,
+                                                   self.columns.size))
+        else:
+            self._file.write('{}\t{}\n'.format(n_rows, self.columns.size))
+        self._file.write('\t'.join(['Name', 'Description'] + [
+            str(c) for c in self.columns
+        ]) + '\n')
+
+        # Remove binary sidecar of the overwritten .gct
+        if isdir('{}.cache'.format(filepath)):
+            rmtree('{}.cache'.format(filepath), ignore_errors=True)
+
+    def write(self, block, descriptions=None):
+        """
+        Append rows.
+        :param block: DataFrame; (n_block_rows, n_columns)
+        :param descriptions: iterable; (n_block_rows); description column; row names if None
+        :return: None
+        """
+
+        if not block.columns.equals(self.columns):
+            raise ValueError('Block columns differ from the .gct columns.')
+
+        block = block.copy()
+        if descriptions is None:
+            block.insert(0, 'Description', block.index)
+        else:
+            block.insert(0, 'Description', list(descriptions))
+
+        block.to_csv(self._file, sep='\t', header=False)
+        self.n_written_rows += block.shape[0]
+
+    def close(self):
+        """
+        Write the number of rows and close.
+        :return: None
+        """
+
+        if self._file.closed:
+            return
+
+        if self.n_rows is None:
+            if N_ROWS_WIDTH < len(str(self.n_written_rows)):
+                raise ValueError('Too many rows ({}) for the dimension line.'.
+                                 format(self.n_written_rows))
+            self._file.seek(self._dimension_position)
+            self._file.write('{:0{}d}'.format(self.n_written_rows,
+                                               N_ROWS_WIDTH))
+        elif self.n_rows != self.n_written_rows:
+            self._file.close()
+            raise ValueError('Wrote {} rows instead of {}.'.format(
+                self.n_written_rows, self.n_rows))
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def iter_gct(filepath, chunksize=10000, fill_na=None, drop_description=True):
+    """
+    Read a .gct (filepath) in row blocks; the header is parsed once.
+    :param filepath: str; filepath to .gct
+    :param chunksize: int; number of rows in each block
+    :param fill_na: *; value to replace NaN in the blocks
+    :param drop_description: bool; drop the Description column (column 2 in the .gct) or not
+    :return: generator; DataFrames (n_block_rows, n_features (or n_features + 1 if not dropping the Description
+    column))
+    """
+
+    for df in read_csv(
+            filepath, skiprows=2, sep='\t', index_col=0,
+            chunksize=chunksize):
+
+        if df.index.name != 'Name':
+            raise ValueError('Column 1 != \'Name\'.')
+        if df.columns[0] != 'Description':
+            raise ValueError('Column 2 != \'Description\'')
+
+        if fill_na:
+            df.fillna(fill_na, inplace=True)
+
+        if drop_description:
+            df.drop('Description', axis=1, inplace=True)
+
+        df.index.name = None
+
+        yield df
+
+
+class LazyMatrix:
+    """
+    Numeric .gct matrix kept on disk as a memory-mapped binary sidecar (see read_gct); only selected rows and columns
+    are read into memory.
+    """
+
+    def __init__(self, filepath):
+        """
+        :param filepath: str; filepath to a numeric .gct
+        """
+
+        labels = _read_gct_cache_labels(filepath)
+        if labels is None:  # Parse .gct once to make its sidecar
+            _write_gct_cache(filepath, _parse_gct(filepath))
+            labels = _read_gct_cache_labels(filepath)
+            if labels is None:
+                raise ValueError(
+                    'Couldn\'t make binary sidecar for {} (non-numeric or unwritable).'.
+                    format(filepath))
+
+        self.filepath = filepath
+        self.index = Index(labels['index'])
+        self.columns = Index(labels['columns'])
+        self.values = load(
+            join('{}.cache'.format(filepath), 'values.npy'), mmap_mode='r')
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def select(self, index=None, columns=None):
+        """
+        Read rows and columns by label (missing labels become NaN rows or columns, as with .ix).
+        :param index: iterable; row labels; all rows if None
+        :param columns: iterable; column labels; all columns if None
+        :return: DataFrame; (n_selected_rows, n_selected_columns); float values
+        """
+
+        if index is None:
+            index = self.index
+            values = self.values
+            is_missing_row = zeros(self.shape[0], dtype=bool)
+        else:
+            index = Index(index)
+            rows = self.index.get_indexer(index)
+            is_missing_row = rows < 0
+            # Read only the selected rows
+            values = self.values[where(is_missing_row, 0, rows)]
+
+        if columns is None:
+            columns = self.columns
+            is_missing_column = zeros(self.shape[1], dtype=bool)
+        else:
+            columns = Index(columns)
+            columns_ = self.columns.get_indexer(columns)
+            is_missing_column = columns_ < 0
+            values = values[:, where(is_missing_column, 0, columns_)]
+
+        values = array(values, dtype=float)
+        values[is_missing_row, :] = nan
+        values[:, is_missing_column] = nan
+
+        return DataFrame(values, index=index, columns=columns)
+
+    def to_dataframe(self):
+        """
+        Read the whole matrix.
+        :return: DataFrame; (n_rows, n_columns)
+        """
+
+        return self.select()
+
+
+def load_matrix(matrix, columns=None):
+    """
+    Get a DataFrame from a DataFrame or LazyMatrix, reading only columns from a LazyMatrix if columns are given.
+    :param matrix: DataFrame or LazyMatrix;
+    :param columns: iterable; column labels to keep
+    :return: DataFrame;
+    """
+
+    if isinstance(matrix, LazyMatrix):
+        if columns is not None:
+            columns = [c for c in columns if c in set(matrix.columns)]
+        return matrix.select(columns=columns)
+
+    return matrix
 
 
 # ==============================================================================
 # .data_table.txt functions
 # ==============================================================================
-def load_data_table(data_table, indices=None):
+def load_data_table(data_table, indices=None, lazy=False, n_jobs=1):
     """
 
     :param data_table: str or DataFrame; path to a .data_table.txt or data_table DataFrame
@@ -255,10 +596,13 @@ def load_data_table(data_table, indices=None):
             },
             ...
         }
+    :param lazy: bool; keep matrices on disk (memory-mapped) and read only the selected rows; matrices without
+    selected rows stay LazyMatrix
+    :param n_jobs: int; number of files to read concurrently (in threads)
     :return: dict;
         {
             data_name: {
-                'dataframe': DataFrame,
+                'dataframe': DataFrame or LazyMatrix,
                 'data_type': str ('continuous', 'categorical', or 'binary'),
                 'emphasis': str ('high' or 'low'),
             }
@@ -269,7 +613,7 @@ def load_data_table(data_table, indices=None):
     if isinstance(data_table, str):
         data_table = read_data_table(data_table)
 
-    data_bundle = {}
+    args = []
     for data_name, (data_type, emphasis,
                     filepath) in data_table.iterrows():  # For each data
         if isinstance(indices, dict) and data_name not in indices:
@@ -277,29 +621,62 @@ def load_data_table(data_table, indices=None):
                   format(data_name))
             continue
 
-        print('Making data bundle for {} ...'.format(data_name))
-        data_bundle[data_name] = {}
+        if isinstance(indices, dict):
+            indices_ = indices[data_name]
+        else:
+            indices_ = None
+
+        args.append((data_name, data_type, emphasis, filepath, indices_, lazy))
+
+    # Read files concurrently (pandas parsing releases the GIL)
+    if n_jobs == 1 or len(args) < 2:
+        data = [_load_data(a) for a in args]
+    else:
+        data = parallelize(
+            _load_data, args, min(n_jobs, len(args)), use_threads=True)
+
+    return dict(data)
+
+
+def _load_data(args):
+    """
+    Load 1 data for load_data_table.
+    :param args: tuple; (data_name, data_type, emphasis, filepath, indices (dict or None), lazy)
+    :return: tuple; (data_name, dict)
+    """
+
+    data_name, data_type, emphasis, filepath, indices, lazy = args
+
+    print('Making data bundle for {} ...'.format(data_name))
+    start = time()
+
+    data = {}
+    if lazy:
+        df = LazyMatrix(filepath)
+    else:
         df = read_gct(join(filepath))
-        print('\tLoaded {}.'.format(filepath))
-        if isinstance(indices, dict):  # If indices is given
-            if data_name in indices:  # Keep specific indices
-                index = indices[data_name]['index']
-                df = df.ix[index, :]
+    print('\tLoaded {} ({:.2f} s).'.format(filepath, time() - start))
 
-                # Save the original index names
-                data_bundle[data_name]['original_index'] = index
+    if isinstance(indices, dict):  # Keep specific indices
+        index = indices['index']
+        if lazy:
+            df = df.select(index=index)
+        else:
+            df = df.ix[index, :]
 
-                if 'alias' in indices[
-                        data_name]:  # Rename these specific indices
-                    df.index = indices[data_name]['alias']
+        # Save the original index names
+        data['original_index'] = index
 
-                print('\tSelected rows: {}.'.format(df.index.tolist()))
+        if 'alias' in indices:  # Rename these specific indices
+            df.index = indices['alias']
 
-        data_bundle[data_name]['dataframe'] = df
-        data_bundle[data_name]['data_type'] = data_type
-        data_bundle[data_name]['emphasis'] = emphasis
+        print('\tSelected rows: {}.'.format(df.index.tolist()))
 
-    return data_bundle
+    data['dataframe'] = df
+    data['data_type'] = data_type
+    data['emphasis'] = emphasis
+
+    return data_name, data
 
 
 def read_data_table(filepath):
@@ -342,7 +719,8 @@ def read_gmts(filepaths,
               gene_sets=(),
               drop_description=True,
               save_clean=False,
-              collapse=False):
+              collapse=False,
+              n_jobs=1):
     """
     Read 1 or more GMTs.
     :param filepaths: str; filepath to a .gmt compress
@@ -350,19 +728,18 @@ def read_gmts(filepaths,
     :param drop_description: bool; drop Description column (2nd column) or not
     :param save_clean: bool; Save as .gmt (cleaned version) or not
     :param collapse: bool; collapse into a list of unique genes or not
+    :param n_jobs: int; number of GMTs to read concurrently (in processes)
     :return: DataFrame or list; (n_gene_sets, size of the largest gene set) or (n_unique genes)
     """
 
-    gmts = []
     if isinstance(filepaths, str):
         filepaths = [filepaths]
-    for fp in filepaths:
-        gmt = read_gmt(
-            fp,
-            gene_sets=gene_sets,
-            drop_description=drop_description,
-            save_clean=save_clean)
-        gmts.append(gmt)
+
+    args = [(fp, gene_sets, drop_description, save_clean) for fp in filepaths]
+    if n_jobs == 1 or len(args) < 2:
+        gmts = [_read_gmt(a) for a in args]
+    else:
+        gmts = parallelize(_read_gmt, args, min(n_jobs, len(args)))
     gmt = concat(gmts)
     gmt.dropna(axis=1, how='all', inplace=True)
     gmt.sort_index(inplace=True)
@@ -380,6 +757,26 @@ def read_gmts(filepaths,
         return gmt
 
 
+def _read_gmt(args):
+    """
+    Read 1 GMT for read_gmts.
+    :param args: tuple; (filepath, gene_sets, drop_description, save_clean)
+    :return: DataFrame; (n_gene_sets, size of the largest gene set)
+    """
+
+    filepath, gene_sets, drop_description, save_clean = args
+
+    start = time()
+    gmt = read_gmt(
+        filepath,
+        gene_sets=gene_sets,
+        drop_description=drop_description,
+        save_clean=save_clean)
+    print('Read {} ({:.2f} s).'.format(filepath, time() - start))
+
+    return gmt
+
+
 def read_gmt(filepath,
              gene_sets=(),
              drop_description=True,
@@ -387,7 +784,7 @@ def read_gmt(filepath,
              collapse=False):
     """
     Read GMT.
-    :param filepath: str; filepath to a .gmt compress
+    :param filepath: str; filepath to a .gmt (or .gmt.gz)
     :param gene_sets: iterable: list of gene set names to keep
     :param drop_description: bool; drop Description column (2nd column) or not
     :param save_clean: bool; Save as .gmt (cleaned version) or not
@@ -395,24 +792,8 @@ def read_gmt(filepath,
     :return: DataFrame or list; (n_gene_sets, size of the largest gene set) or (n_unique genes)
     """
 
-    # Parse
-    rows = []
-    with open(filepath) as f:
-        for line in f.readlines():
-            line_split = line.strip().split('\t')
-            # Sort genes and add as a GMT gene set (row)
-            rows.append(line_split[:2] + sorted(
-                [g for g in line_split[2:] if g]))
-
-    # Make a DataFrame
-    gmt = DataFrame(rows)
-
-    # Set index
-    gmt.set_index(0, inplace=True)
-    gmt.index.name = 'Gene Set'
-    gmt.sort_index(inplace=True)
-    gmt.columns = ['Description'
-                   ] + ['Gene {}'.format(i) for i in range(1, gmt.shape[1])]
+    # Parse into gene sets (sorted by name, with sorted genes) and make a DataFrame
+    gmt = read_gene_sets(filepath).to_dataframe(drop_description=False)
 
     if save_clean:  # Save the cleaned version
         gmt.to_csv(filepath, sep='\t', header=False)
@@ -434,6 +815,174 @@ def read_gmt(filepath,
         return gmt
 
 
+def read_gene_sets(filepaths, gene_sets=()):
+    """
+    Read 1 or more GMTs (plain or gzipped) in a single pass into GeneSets, without making the padded gene-set-x-gene
+    DataFrame.
+    :param filepaths: str or iterable; filepath(s) to .gmt or .gmt.gz
+    :param gene_sets: iterable: list of gene set names to keep
+    :return: GeneSets; sorted by gene set name, with genes sorted within each gene set
+    """
+
+    if isinstance(filepaths, str):
+        filepaths = [filepaths]
+    if isinstance(gene_sets, str):
+        gene_sets = [gene_sets]
+    gene_sets = set(gene_sets)
+
+    names = []
+    descriptions = []
+    sizes = []
+    vocabulary = {}
+    indices = []
+    for fp in filepaths:
+        with _open_text(fp) as f:
+            for line in f:
+                line_split = line.rstrip('\r\n').split('\t')
+                if not line_split[0] or (gene_sets and
+                                         line_split[0] not in gene_sets):
+                    continue
+
+                names.append(line_split[0])
+                if 1 < len(line_split):
+                    descriptions.append(line_split[1])
+                else:
+                    descriptions.append('')
+
+                # Intern genes
+                size = 0
+                for g in line_split[2:]:
+                    if g:
+                        indices.append(vocabulary.setdefault(g, len(vocabulary)))
+                        size += 1
+                sizes.append(size)
+
+    # Sort vocabulary so that sorting gene indices sorts gene names
+    genes = array(list(vocabulary), dtype=object)
+    order = argsort(genes, kind='mergesort')
+    ranks = empty(len(genes), dtype=int32)
+    ranks[order] = arange(len(genes))
+    genes = genes[order]
+    indices = ranks[array(indices, dtype=int)]
+
+    # Sort genes within gene sets and gene sets by name
+    names = array(names, dtype=object)
+    descriptions = array(descriptions, dtype=object)
+    sizes = array(sizes, dtype=int)
+    set_order = argsort(names, kind='mergesort')
+    set_ids = repeat(argsort(set_order), sizes)
+    indices = indices[lexsort((indices, set_ids))]
+
+    return GeneSets(names[set_order], descriptions[set_order], genes,
+                    concatenate(([0], cumsum(sizes[set_order]))), indices)
+
+
+def _open_text(filepath):
+    """
+    Open a plain or gzipped text file for reading.
+    :param filepath: str;
+    :return: file;
+    """
+
+    with open(filepath, 'rb') as f:
+        is_gzipped = f.read(2) == b'\x1f\x8b'
+    if is_gzipped:
+        return gzip_open(filepath, 'rt')
+    else:
+        return open(filepath)
+
+
+class GeneSets:
+    """
+    Gene sets in compressed sparse row layout: gene set names and descriptions, a sorted vocabulary of unique genes,
+    and each gene set's genes as indices[offsets[i]:offsets[i + 1]] into the vocabulary.
+    """
+
+    def __init__(self, names, descriptions, genes, offsets, indices):
+        """
+        :param names: array; (n_gene_sets); gene set names
+        :param descriptions: array; (n_gene_sets); gene set descriptions
+        :param genes: array; (n_unique_genes); gene vocabulary
+        :param offsets: array; (n_gene_sets + 1); start of each gene set in indices
+        :param indices: array; (n_genes_in_all_gene_sets); indices into genes
+        """
+
+        self.names = Index(names, name='Gene Set')
+        self.descriptions = descriptions
+        self.genes = genes
+        self.offsets = offsets
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        """
+        Get the genes of a gene set.
+        :param name: str; gene set name
+        :return: array; genes
+        """
+
+        i = self.names.get_loc(name)
+        return self.genes[self.indices[self.offsets[i]:self.offsets[i + 1]]]
+
+    @property
+    def sizes(self):
+        return Series(diff(self.offsets), index=self.names, name='size')
+
+    def items(self):
+        """
+        Iterate over gene sets.
+        :return: generator; (gene set name, array of genes)
+        """
+
+        for i, name in enumerate(self.names):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            yield name, self.genes[self.indices[start:end]]
+
+    def select(self, gene_sets):
+        """
+        Keep specific gene sets.
+        :param gene_sets: iterable: list of gene set names to keep
+        :return: GeneSets;
+        """
+
+        is_kept = self.names.isin(list(gene_sets))
+        sizes = diff(self.offsets)
+        return GeneSets(self.names[is_kept], self.descriptions[is_kept],
+                        self.genes,
+                        concatenate(([0], cumsum(sizes[is_kept]))),
+                        self.indices[repeat(is_kept, sizes)])
+
+    def collapse(self):
+        """
+        Collapse into a list of unique genes.
+        :return: list; (n_unique genes)
+        """
+
+        return self.genes[unique(self.indices)].tolist()
+
+    def to_dataframe(self, drop_description=True):
+        """
+        Make the padded DataFrame view returned by read_gmt.
+        :param drop_description: bool; drop Description column (2nd column) or not
+        :return: DataFrame; (n_gene_sets, size of the largest gene set)
+        """
+
+        sizes = diff(self.offsets)
+        values = empty((len(self), sizes.max(initial=0)), dtype=object)
+        values[repeat(arange(len(self)), sizes),
+               arange(len(self.indices)) - repeat(self.offsets[:-1], sizes)] = \
+            self.genes[self.indices]
+
+        columns = ['Gene {}'.format(i) for i in range(1, values.shape[1] + 1)]
+        gmt = DataFrame(values, index=self.names, columns=columns)
+        if not drop_description:
+            gmt.insert(0, 'Description', self.descriptions)
+
+        return gmt
+
+
 def write_gmt(gmt, filepath):
     """
     Write a GMT DataFrame to filepath.gmt.
@@ -526,13 +1075,187 @@ def read_fpkm_tracking(filepath, signature=None):
     return fpkm.groupby(level=0).mean()
 
 
+def read_fpkm_trackings(filepaths, samples=None, gct_filepath=None, n_jobs=1):
+    """
+    Read Cufflinks outputs, reading only gene_short_name and FPKM columns, and make a gene-x-sample FPKM matrix
+    (FPKMs of transcripts of the same gene are averaged; transcripts without gene_short_name are dropped).
+    :param filepaths: iterable; filepaths to cufflinks outputs
+    :param samples: iterable; sample names; the names of the directories containing filepaths if None
+    :param gct_filepath: str; filepath to write the matrix as .gct, with its binary sidecar so that read_gct and
+    LazyMatrix skip parsing it
+    :param n_jobs: int; number of files to read concurrently (in threads)
+    :return: DataFrame; (n_genes, n_samples)
+    """
+
+    filepaths = list(filepaths)
+    if samples is None:
+        samples = [split(split(abspath(fp))[0])[1] for fp in filepaths]
+    else:
+        samples = list(samples)
+    if len(samples) != len(filepaths):
+        raise ValueError('Numbers of filepaths and samples differ.')
+
+    args = list(zip(filepaths, samples))
+    if n_jobs == 1 or len(args) < 2:
+        fpkms = [_read_fpkm_tracking(a) for a in args]
+    else:
+        fpkms = parallelize(
+            _read_fpkm_tracking, args, min(n_jobs, len(args)), use_threads=True)
+
+    g_x_s = concat(fpkms, axis=1).sort_index()
+    g_x_s.index.name = None
+    print('Made gene-x-sample FPKM matrix {}.'.format(g_x_s.shape))
+
+    if gct_filepath:
+        if not gct_filepath.endswith('.gct'):
+            gct_filepath += '.gct'
+        write_gct(g_x_s, gct_filepath)
+
+        # Write the sidecar as read_gct would after parsing the .gct
+        df = g_x_s.copy()
+        df.insert(0, 'Description', g_x_s.index)
+        df.index.name = 'Name'
+        _write_gct_cache(gct_filepath, df)
+
+    return g_x_s
+
+
+def _read_fpkm_tracking(args):
+    """
+    Read 1 cufflinks output for read_fpkm_trackings.
+    :param args: tuple; (filepath, sample)
+    :return: Series; (n_genes); FPKMs named sample
+    """
+
+    filepath, sample = args
+
+    start = time()
+    fpkm_tracking = read_csv(
+        filepath,
+        sep='\t',
+        usecols=['gene_short_name', 'FPKM'],
+        dtype={'gene_short_name': str,
+               'FPKM': float})
+    fpkm_tracking = fpkm_tracking[fpkm_tracking['gene_short_name'] != '-']
+    fpkm = fpkm_tracking.groupby('gene_short_name', sort=False)['FPKM'].mean()
+    fpkm.name = sample
+    print('Read {} ({:.2f} s).'.format(filepath, time() - start))
+
+    return fpkm
+
+
 # ==============================================================================
 # VCF functions
 # ==============================================================================
-def read_vcf(filepath):
+VCF_COLUMNS = [
+    'CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT'
+]
+
+
+def read_vcf(filepath,
+             columns=None,
+             samples=None,
+             info_fields=(),
+             format_fields=(),
+             region=None,
+             chunksize=None):
     """
-    Read a VCF.
+    Read a VCF (plain or bgzipped) in 1 pass: parse the meta-information and header, then read data from the same
+    file handle.
     :param filepath: str;
+    :param columns: iterable; fixed columns (CHROM, POS, ...) to keep; all if None
+    :param samples: iterable; samples to keep; all if None
+    :param info_fields: iterable; INFO fields to extract into typed columns ('INFO_<field>')
+    :param format_fields: iterable; FORMAT fields to extract into typed columns ('<sample>_<field>') for the kept
+    samples
+    :param region: str; 'CHROM', 'CHROM:START' or 'CHROM:START-END' (1-based, inclusive) to keep; uses the tabix index
+    (with pysam) when present, else filters while reading
+    :param chunksize: int; read data in blocks of chunksize rows; vcf['data'] becomes a generator of DataFrames
+    :return: dict;
+    """
+
+    f = _open_text(filepath)
+    try:
+        vcf = _read_vcf_header(f)
+    except Exception:
+        f.close()
+        raise
+
+    # Select columns
+    if columns is None:
+        columns = VCF_COLUMNS
+    if samples is None:
+        samples = vcf['samples']
+    else:
+        missing_samples = sorted(set(samples) - set(vcf['samples']))
+        if missing_samples:
+            f.close()
+            raise ValueError('Unknown samples {}.'.format(missing_samples))
+    # Sites-only VCFs have no FORMAT (and no samples)
+    usecols = [c for c in VCF_COLUMNS if c in columns and c in vcf['header']
+               ] + list(samples)
+    for c in ['CHROM', 'POS']:
+        if region and c not in usecols:
+            usecols.append(c)
+    if info_fields and 'INFO' not in usecols:
+        usecols.append('INFO')
+    if format_fields and len(samples) and 'FORMAT' not in usecols:
+        usecols.append('FORMAT')
+
+    read_csv_kwargs = {
+        'sep': '\t',
+        'header': None,
+        'names': vcf['header'],
+        'usecols': usecols,
+        'dtype': {c: str
+                  for c in vcf['header']},
+        'na_values': {
+            'QUAL': ['.']
+        },
+        'chunksize': chunksize,
+    }
+    read_csv_kwargs['dtype'].update({'POS': int, 'QUAL': float})
+
+    if region:
+        region = _parse_vcf_region(region)
+        lines = _fetch_tabix_region(filepath, region)
+        if lines is not None:  # Read only the indexed region
+            f.close()
+            f = lines
+
+    data = read_csv(f, **read_csv_kwargs)
+
+    def process(df):
+        if region:
+            chrom, start, end = region
+            df = df[(df['CHROM'] == chrom) & (start <= df['POS']) &
+                    (df['POS'] <= end)]
+        df = _extract_vcf_fields(df, vcf, samples, info_fields,
+                                 format_fields)
+        return df[[c for c in df.columns if c in columns or c not in VCF_COLUMNS]]
+
+    if chunksize:
+
+        def iterate_data():
+            try:
+                for df in data:
+                    yield process(df)
+            finally:
+                f.close()
+
+        vcf['data'] = iterate_data()
+
+    else:
+        f.close()
+        vcf['data'] = process(data)
+
+    return vcf
+
+
+def _read_vcf_header(f):
+    """
+    Parse VCF meta-information and header, leaving f at the 1st data line.
+    :param f: file;
     :return: dict;
     """
 
@@ -548,20 +1271,7 @@ def read_vcf(filepath):
         'data': None,
     }
 
-    # Open VCF
-    try:
-        f = open(filepath)
-        f.readline()
-        f.seek(0)
-        bgzipped = False
-    except UnicodeDecodeError:
-        f = bgzf.open(filepath)
-        bgzipped = True
-
-    for row in f:
-
-        if bgzipped:
-            row = row.decode()
+    for row in iter(f.readline, ''):
         row = row.strip()
 
         if row.startswith('##'):  # Meta-information
@@ -606,20 +1316,126 @@ def read_vcf(filepath):
             # Remove '#' prefix
             row = row[1:]
 
-            # Get header line number
             vcf['header'] = row.split('\t')
             vcf['samples'] = vcf['header'][9:]
+
+            # Data start at the next line
+            return vcf
+
         else:
             break
 
-    # Close VCF
-    f.close()
+    raise ValueError('No #CHROM header line.')
 
-    # Read data
-    vcf['data'] = read_csv(
-        filepath, sep='\t', comment='#', header=None, names=vcf['header'])
 
-    return vcf
+def _parse_vcf_region(region):
+    """
+    Parse 'CHROM', 'CHROM:START' or 'CHROM:START-END'.
+    :param region: str;
+    :return: tuple; (str, int, int or inf)
+    """
+
+    chrom, _, positions = region.partition(':')
+    positions = positions.replace(',', '')
+    if not positions:
+        return chrom, 1, inf
+
+    start, _, end = positions.partition('-')
+    if end:
+        return chrom, int(start), int(end)
+    else:
+        return chrom, int(start), inf
+
+
+def _fetch_tabix_region(filepath, region):
+    """
+    Fetch data lines in region using the tabix (.tbi or .csi) index of a bgzipped VCF.
+    :param filepath: str;
+    :param region: tuple; (str, int, int or inf)
+    :return: StringIO or None; None if pysam or the index isn't available
+    """
+
+    if not any(
+            isfile('{}.{}'.format(filepath, e)) for e in ['tbi', 'csi']):
+        return None
+    try:
+        from pysam import TabixFile
+    except ImportError:
+        return None
+
+    chrom, start, end = region
+    if end == inf:
+        end = None
+    with TabixFile(filepath) as t:
+        if chrom not in t.contigs:
+            lines = []
+        else:
+            lines = list(t.fetch(chrom, start - 1, end))
+
+    return StringIO(''.join('{}\n'.format(l) for l in lines))
+
+
+def _extract_vcf_fields(df, vcf, samples, info_fields, format_fields):
+    """
+    Extract INFO and FORMAT fields into typed columns.
+    :param df: DataFrame; VCF data
+    :param vcf: dict; VCF meta-information
+    :param samples: iterable; samples
+    :param info_fields: iterable; INFO fields
+    :param format_fields: iterable; FORMAT fields
+    :return: DataFrame;
+    """
+
+    df = df.copy()
+
+    for field in info_fields:
+        definition = vcf['meta_information']['INFO'].get(field, {})
+        if definition.get('Type') == 'Flag':
+            df['INFO_{}'.format(field)] = df['INFO'].str.contains(
+                r'(?:^|;){}(?:;|$)'.format(escape(field)), na=False)
+        else:
+            df['INFO_{}'.format(field)] = _type_vcf_field(
+                df['INFO'].str.extract(
+                    r'(?:^|;){}=([^;]*)'.format(escape(field)), expand=False),
+                definition)
+
+    if format_fields and len(samples):
+        # FORMAT is usually constant, so split each sample once per FORMAT
+        for format_ in df['FORMAT'].dropna().unique():
+            is_format = df['FORMAT'] == format_
+            keys = format_.split(':')
+            for sample in samples:
+                values = df.loc[is_format, sample].str.split(':', expand=True)
+                for field in format_fields:
+                    if field in keys and keys.index(field) < values.shape[1]:
+                        df.loc[is_format, '{}_{}'.format(
+                            sample, field)] = values[keys.index(field)]
+
+        for sample in samples:
+            for field in format_fields:
+                c = '{}_{}'.format(sample, field)
+                if c not in df.columns:
+                    df[c] = nan
+                df[c] = _type_vcf_field(
+                    df[c], vcf['meta_information']['FORMAT'].get(field, {}))
+
+    return df
+
+
+def _type_vcf_field(values, definition):
+    """
+    Convert single-value Integer and Float fields into floats (NaN for missing).
+    :param values: Series; str values
+    :param definition: dict; INFO or FORMAT meta-information of the field
+    :return: Series;
+    """
+
+    if definition.get('Number') == '1' and definition.get('Type') in [
+            'Integer', 'Float'
+    ]:
+        return to_numeric(values.replace('.', nan), errors='coerce')
+    else:
+        return values
 
 
 # ==============================================================================
@@ -749,3 +1565,234 @@ def read_gtf(feature_filename, sources, types):
                         feature_to_id[gene_name] = ensembl_id
 
     return features, feature_to_id
+
+
+FEATURE_COLUMNS = [
+    'contig', 'source', 'type', 'start', 'end', 'score', 'strand', 'phase',
+    'attributes'
+]
+
+
+def read_features(filepath,
+                  sources=None,
+                  types=None,
+                  attributes=('gene_id', 'gene_name', 'Name', 'version',
+                              'gene_source'),
+                  cache=True):
+    """
+    Read a GTF or GFF3 (plain or gzipped) into typed columns, parsing attributes with vectorized regular expressions,
+    and index features for coordinate lookups. The parsed table is cached in <filepath>.cache/ keyed by the file's
+    content hash (rehashed only when the file's path, size, or modification time changes) and the attributes.
+    :param filepath: str; filepath to .gtf, .gff3, or .gff (or .gz of these)
+    :param sources: iterable; sources (column 2) to keep; all if None
+    :param types: iterable; feature types (column 3) to keep; all if None
+    :param attributes: iterable; attributes to extract into columns
+    :param cache: bool; read from and write to the cache or not
+    :return: Features;
+    """
+
+    attributes = list(attributes)
+    if filepath.endswith('.gz'):
+        extension = split_file_extension(filepath[:-3])[1]
+    else:
+        extension = split_file_extension(filepath)[1]
+    if extension == 'gtf':
+        attribute_pattern = r'(?:^|;)\s*{} "?([^";]*)"?'
+    elif extension in ['gff3', 'gff']:
+        attribute_pattern = r'(?:^|;){}=([^;]*)'
+    else:
+        raise ValueError('Unknown feature file extension {}.'.format(
+            extension))
+
+    # Read the cached table of the current file content and attributes
+    df = None
+    if cache:
+        content_hash = _get_features_content_hash(filepath)
+        cache_filepath = join('{}.cache'.format(filepath),
+                              'features.{}.{}.pkl'.format(
+                                  content_hash,
+                                  sha1('\n'.join(attributes).encode())
+                                  .hexdigest()[:12]))
+        if isfile(cache_filepath):
+            try:
+                df = read_pickle(cache_filepath)
+            except (OSError, ValueError, EOFError):
+                df = None
+
+    if df is None:
+        df = read_csv(
+            filepath,
+            sep='\t',
+            comment='#',
+            header=None,
+            names=FEATURE_COLUMNS,
+            dtype={
+                'contig': 'category',
+                'source': 'category',
+                'type': 'category',
+                'start': int,
+                'end': int,
+                'score': str,
+                'strand': str,
+                'phase': str,
+                'attributes': str,
+            },
+            compression='infer')
+
+        # Convert 1-based fully-closed intervals to 0-based half-open intervals
+        df['start'] -= 1
+        df['strand'] = df['strand'].map({
+            '+': 1,
+            '-': -1
+        }).fillna(0).astype('int8')
+
+        for a in attributes:
+            df[a] = df['attributes'].str.extract(
+                attribute_pattern.format(escape(a)), expand=False)
+        df.drop(['score', 'phase', 'attributes'], axis=1, inplace=True)
+
+        if cache:
+            _write_features_cache(filepath, content_hash, cache_filepath, df)
+
+    if sources is not None:
+        df = df[df['source'].isin(list(sources))]
+    if types is not None:
+        df = df[df['type'].isin(list(types))]
+
+    return Features(df.reset_index(drop=True))
+
+
+def _get_features_content_hash(filepath):
+    """
+    Get the content hash of a feature file, hashing the file only if its path, size, or modification time changed since
+    the hash was saved in <filepath>.cache/features.json.
+    :param filepath: str;
+    :return: str; SHA-1 hex digest
+    """
+
+    directory_path = '{}.cache'.format(filepath)
+    index_filepath = join(directory_path, 'features.json')
+    key = _get_file_cache_key(filepath)
+
+    try:
+        with open(index_filepath) as f:
+            index = load_json(f)
+        if index['key'] == key:
+            return index['hash']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    content_hash = _hash_file(filepath)
+    try:
+        if not isdir(directory_path):
+            mkdir(directory_path)
+        with open(index_filepath, 'w') as f:
+            dump_json({'key': key, 'hash': content_hash}, f)
+    except OSError:
+        pass
+
+    return content_hash
+
+
+def _write_features_cache(filepath, content_hash, cache_filepath, df):
+    """
+    Write parsed features to cache_filepath and remove the cached tables of other (superseded) file contents.
+    :param filepath: str; filepath to the feature file
+    :param content_hash: str; SHA-1 hex digest of the current file content
+    :param cache_filepath: str; <filepath>.cache/features.<content_hash>.<attributes hash>.pkl
+    :param df: DataFrame; parsed features
+    :return: None
+    """
+
+    directory_path = '{}.cache'.format(filepath)
+    try:
+        if not isdir(directory_path):
+            mkdir(directory_path)
+
+        for fn in listdir(directory_path):
+            if fn.startswith('features.') and fn.endswith(
+                    '.pkl') and not fn.startswith(
+                        'features.{}.'.format(content_hash)):
+                remove(join(directory_path, fn))
+
+        df.to_pickle(cache_filepath)
+
+    except OSError:
+        pass
+
+
+def _hash_file(filepath, block_size=1 << 20):
+    """
+    Hash the content of a file.
+    :param filepath: str;
+    :param block_size: int; number of bytes read at a time
+    :return: str; SHA-1 hex digest
+    """
+
+    h = sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+class Features:
+    """
+    Genomic features (contig, start, end, strand, attributes, ...) with a per-contig interval index: features sorted by
+    start, and the running maximum of their ends, searched with searchsorted.
+    """
+
+    def __init__(self, df):
+        """
+        :param df: DataFrame; (n_features, n_columns); has contig, start (0-based), and end (exclusive) columns
+        """
+
+        self.df = df
+
+        self._index = {}
+        for contig, rows in df.groupby('contig', observed=True).indices.items():
+            rows = rows[argsort(df['start'].values[rows], kind='mergesort')]
+            self._index[contig] = (rows, df['start'].values[rows],
+                                   maximum.accumulate(df['end'].values[rows]))
+
+    def __len__(self):
+        return len(self.df)
+
+    def query(self, contig, start, end):
+        """
+        Get features overlapping [start, end) on contig.
+        :param contig: str;
+        :param start: int; 0-based
+        :param end: int; exclusive
+        :return: DataFrame; (n_overlapping_features, n_columns)
+        """
+
+        if contig not in self._index:
+            return self.df.iloc[[]]
+
+        rows, starts, max_ends = self._index[contig]
+
+        # Features after j start at or after end; features before i end at or before start
+        i = searchsorted(max_ends, start, side='right')
+        j = searchsorted(starts, end, side='left')
+        rows = rows[i:j][self.df['end'].values[rows[i:j]] > start]
+
+        return self.df.iloc[sort(rows)]
+
+    def map_names_to_ids(self, name='gene_name', id_='gene_id'):
+        """
+        Map feature names to IDs; a name with multiple IDs maps to the one with the highest version (when there is a
+        version column) or else to the first one.
+        :param name: str; name column
+        :param id_: str; ID column
+        :return: Series; (n_unique_names); IDs indexed by names
+        """
+
+        df = self.df.dropna(subset=[name, id_])
+        if 'version' in df.columns:
+            df = df.assign(
+                version_=to_numeric(df['version'], errors='coerce')
+            ).sort_values('version_', ascending=False, kind='mergesort')
+
+        return df.drop_duplicates(subset=name).set_index(name)[id_]
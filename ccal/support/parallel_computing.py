@@ -11,12 +11,13 @@ Authors:
         Computational Cancer Analysis Laboratory, UCSD Cancer Center
 """
 
-from multiprocessing.pool import Pool
+from multiprocessing.pool import Pool, ThreadPool
 
 from numpy.random import seed
 
 
-def parallelize(function, list_of_args, n_jobs, random_seed=None):
+def parallelize(function, list_of_args, n_jobs, random_seed=None,
+                use_threads=False, initializer=None, initargs=()):
     """
     Apply function on list_of_args using parallel computing across n_jobs jobs; n_jobs doesn't have to be the length of
     list_of_args.
@@ -24,13 +25,21 @@ def parallelize(function, list_of_args, n_jobs, random_seed=None):
     :param list_of_args: iterable;
     :param n_jobs: int; 0 <
     :param random_seed: int;
+    :param use_threads: bool; use threads (sharing memory; for I/O or GIL-releasing functions) instead of processes
+    :param initializer: function; called with initargs once in each process (to send data shared by all args once)
+    :param initargs: iterable;
     :return: list;
     """
 
     if random_seed:
         seed(random_seed)
 
-    with Pool(n_jobs) as p:
+    if use_threads:
+        pool = ThreadPool
+    else:
+        pool = Pool
+
+    with pool(n_jobs, initializer=initializer, initargs=initargs) as p:
         # Each process initializes with the current jobs' randomness (seed & seed index)
         # Any changes to these jobs' randomnesses won't update the current process' randomness (seed & seed index)
         return_ = p.map(function, list_of_args)
@@ -12,19 +12,10 @@ Authors:
 """
 
 from os.path import isfile
+from sys import modules, version_info
 
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.cm import bwr, gist_rainbow
-from matplotlib.colorbar import ColorbarBase, make_axes
-from matplotlib.colors import (ColorConverter, LinearSegmentedColormap,
-                               ListedColormap, Normalize)
-from matplotlib.gridspec import GridSpec
-from matplotlib.pyplot import (figure, gca, savefig, sca, subplot, suptitle,
-                               tight_layout)
 from numpy import array, unique
 from pandas import DataFrame, Series, isnull
-from seaborn import (barplot, boxplot, clustermap, despine, distplot, heatmap,
-                     set_style, violinplot)
 
 from .d2 import get_dendrogram_leaf_indices, normalize_2d_or_1d
 from .file import establish_filepath
@@ -44,38 +35,81 @@ FONT_SMALLER = {'fontsize': 12, 'weight': 'bold', 'color': '#220530'}
 # Color maps
 C_BAD = 'wheat'
 
-# Continuous 1
-CMAP_CONTINUOUS = bwr
-CMAP_CONTINUOUS.set_bad(C_BAD)
-
-# Continuous 2
-reds = [0.26, 0.26, 0.26, 0.39, 0.69, 1, 1, 1, 1, 1, 1]
-greens_half = [0.26, 0.16, 0.09, 0.26, 0.69]
-colordict = {
-    'red':
-    tuple([(0.1 * i, r, r) for i, r in enumerate(reds)]),
-    'green':
-    tuple([
-        (0.1 * i, r, r)
-        for i, r in enumerate(greens_half + [1] + list(reversed(greens_half)))
-    ]),
-    'blue':
-    tuple([(0.1 * i, r, r) for i, r in enumerate(reversed(reds))])
-}
-CMAP_CONTINUOUS_ASSOCIATION = LinearSegmentedColormap('association', colordict)
-CMAP_CONTINUOUS_ASSOCIATION.set_bad(C_BAD)
-
-# Categorical
-CMAP_CATEGORICAL = gist_rainbow
-CMAP_CATEGORICAL.set_bad(C_BAD)
-
-# Binary
-CMAP_BINARY = ListedColormap(['#cdcdcd', '#404040'])
-CMAP_BINARY.set_bad(C_BAD)
+CMAP_NAMES = ('CMAP_CONTINUOUS', 'CMAP_CONTINUOUS_ASSOCIATION',
+              'CMAP_CATEGORICAL', 'CMAP_BINARY')
+_CMAPS = {}
 
 DPI = 300
 
 
+def _get_cmap(name):
+    """
+    Get a color map, making all color maps (and importing matplotlib) on first
+    use.
+    :param name: str; one of CMAP_NAMES
+    :return: matplotlib colormap;
+    """
+
+    if not _CMAPS:
+        from matplotlib.cm import bwr, gist_rainbow
+        from matplotlib.colors import LinearSegmentedColormap, ListedColormap
+
+        # Continuous 1
+        _CMAPS['CMAP_CONTINUOUS'] = bwr
+
+        # Continuous 2
+        reds = [0.26, 0.26, 0.26, 0.39, 0.69, 1, 1, 1, 1, 1, 1]
+        greens_half = [0.26, 0.16, 0.09, 0.26, 0.69]
+        colordict = {
+            'red':
+            tuple([(0.1 * i, r, r) for i, r in enumerate(reds)]),
+            'green':
+            tuple([(0.1 * i, r, r)
+                   for i, r in enumerate(greens_half + [1] +
+                                         list(reversed(greens_half)))]),
+            'blue':
+            tuple([(0.1 * i, r, r) for i, r in enumerate(reversed(reds))])
+        }
+        _CMAPS['CMAP_CONTINUOUS_ASSOCIATION'] = LinearSegmentedColormap(
+            'association', colordict)
+
+        # Categorical
+        _CMAPS['CMAP_CATEGORICAL'] = gist_rainbow
+
+        # Binary
+        _CMAPS['CMAP_BINARY'] = ListedColormap(['#cdcdcd', '#404040'])
+
+        for cmap in _CMAPS.values():
+            cmap.set_bad(C_BAD)
+
+    return _CMAPS[name]
+
+
+def __getattr__(name):
+    """
+    Make color maps on first access (PEP 562) so that importing this module
+    doesn't import matplotlib.
+    :param name: str;
+    :return: matplotlib colormap;
+    """
+
+    if name in CMAP_NAMES:
+        return _get_cmap(name)
+    else:
+        raise AttributeError('module {} has no attribute {}.'.format(
+            __name__, name))
+
+
+if version_info < (3, 7):  # Module __getattr__ (PEP 562) needs a module
+    # subclass before Python 3.7
+
+    class _LazyModule(type(modules[__name__])):
+        def __getattr__(self, name):
+            return __getattr__(name)
+
+    modules[__name__].__class__ = _LazyModule
+
+
 # ==============================================================================
 # Functions
 # ==============================================================================
@@ -101,6 +135,8 @@ def plot_points(*args,
     :return: None
     """
 
+    from matplotlib.pyplot import figure, gca
+
     if not ax:
         figure(figsize=FIGURE_SIZE)
         ax = gca()
@@ -167,6 +203,9 @@ def plot_distribution(a,
     :return: None
     """
 
+    from matplotlib.pyplot import figure
+    from seaborn import distplot
+
     if not ax:
         figure(figsize=FIGURE_SIZE)
 
@@ -277,6 +316,9 @@ def plot_violin_box_or_bar(x=None,
     :return: None
     """
 
+    from matplotlib.pyplot import figure
+    from seaborn import barplot, boxplot, violinplot
+
     # Initialize a figure
     if not ax:
         figure(figsize=figure_size)
@@ -446,6 +488,12 @@ def plot_heatmap(dataframe,
     :return: None
     """
 
+    from matplotlib.colorbar import ColorbarBase, make_axes
+    from matplotlib.colors import ListedColormap, Normalize
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import figure, subplot
+    from seaborn import heatmap
+
     df = dataframe.copy()
 
     if normalization_method:
@@ -508,11 +556,11 @@ def plot_heatmap(dataframe,
 
     if not cmap:
         if data_type == 'continuous':
-            cmap = CMAP_CONTINUOUS
+            cmap = _get_cmap('CMAP_CONTINUOUS')
         elif data_type == 'categorical':
-            cmap = CMAP_CATEGORICAL
+            cmap = _get_cmap('CMAP_CATEGORICAL')
         elif data_type == 'binary':
-            cmap = CMAP_BINARY
+            cmap = _get_cmap('CMAP_BINARY')
         else:
             raise ValueError(
                 'Target data type must be continuous, categorical, or binary.')
@@ -597,12 +645,12 @@ def plot_heatmap(dataframe,
 
     if len(row_annotation):
         if len(set(row_annotation)) <= 2:
-            cmap = CMAP_BINARY
+            cmap = _get_cmap('CMAP_BINARY')
         else:
             if len(annotation_colors):
                 cmap = ListedColormap(annotation_colors)
             else:
-                cmap = CMAP_CATEGORICAL
+                cmap = _get_cmap('CMAP_CATEGORICAL')
         heatmap(
             DataFrame(row_annotation),
             ax=ax_right,
@@ -613,12 +661,12 @@ def plot_heatmap(dataframe,
 
     if len(column_annotation):
         if len(set(column_annotation)) <= 2:
-            cmap = CMAP_BINARY
+            cmap = _get_cmap('CMAP_BINARY')
         else:
             if len(annotation_colors):
                 cmap = ListedColormap(annotation_colors)
             else:
-                cmap = CMAP_CATEGORICAL
+                cmap = _get_cmap('CMAP_CATEGORICAL')
         heatmap(
             DataFrame(column_annotation).T,
             ax=ax_top,
@@ -636,6 +684,12 @@ def plot_columns(df, figure_size=FIGURE_SIZE):
     """
     """
 
+    from matplotlib.colorbar import ColorbarBase, make_axes
+    from matplotlib.colors import Normalize
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.pyplot import figure, subplot, tight_layout
+    from seaborn import heatmap
+
     figure(figsize=figure_size)
 
     n_cols = df.shape[1]
@@ -654,7 +708,7 @@ def plot_columns(df, figure_size=FIGURE_SIZE):
             yticklabels=False,
             ax=ax,
             cbar=False,
-            cmap=CMAP_CONTINUOUS)
+            cmap=_get_cmap('CMAP_CONTINUOUS'))
         decorate(ax=ax, ylabel=c_n)
     tight_layout()
 
@@ -668,7 +722,7 @@ def plot_columns(df, figure_size=FIGURE_SIZE):
             shrink=0.7,
             norm=Normalize(c.min(), c.max()),
             ticks=[c.min(), c.mean(), c.max()],
-            cmap=CMAP_CONTINUOUS)
+            cmap=_get_cmap('CMAP_CONTINUOUS'))
         ColorbarBase(cax, **kw)
         decorate(ax=cax, xtick_rotation=90)
 
@@ -689,7 +743,7 @@ def plot_clustermap(dataframe,
                     col_colors=None,
                     annotate=False,
                     mask=None,
-                    cmap=CMAP_CONTINUOUS,
+                    cmap=None,
                     title=None,
                     xlabel=None,
                     ylabel=None,
@@ -730,6 +784,12 @@ def plot_clustermap(dataframe,
     :return: None
     """
 
+    from matplotlib.pyplot import figure
+    from seaborn import clustermap
+
+    if cmap is None:
+        cmap = _get_cmap('CMAP_CONTINUOUS')
+
     # Initialize a figure
     figure(figsize=figsize)
 
@@ -786,6 +846,9 @@ def plot_nmf(nmf_results=None,
     :return: None
     """
 
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.pyplot import figure, savefig
+
     # Check for W and H matrix
     if isinstance(nmf_results, dict) and k:
         w_matrix = nmf_results[k]['w']
@@ -854,6 +917,9 @@ def assign_colors_to_states(states, colors=None):
     :return: dict; {state: color}
     """
 
+    from matplotlib.colors import (ColorConverter, LinearSegmentedColormap,
+                                   ListedColormap)
+
     if isinstance(states, int):  # Number of states: count from 1
         unique_states = range(states)
 
@@ -879,9 +945,9 @@ def assign_colors_to_states(states, colors=None):
         color_converter = ColorConverter()
         colors = [tuple(c) for c in color_converter.to_rgba_array(colors)]
     else:  # Use categorical colormap
+        cmap = _get_cmap('CMAP_CATEGORICAL')
         colors = [
-            CMAP_CATEGORICAL(int(s / max(unique_states) * CMAP_CATEGORICAL.N))
-            for s in unique_states
+            cmap(int(s / max(unique_states) * cmap.N)) for s in unique_states
         ]
 
     # Return state-to-color dict
@@ -938,6 +1004,9 @@ def decorate(ax=None,
     :return:
     """
 
+    from matplotlib.pyplot import gca, sca, suptitle
+    from seaborn import despine, set_style
+
     # Set ax
     if not ax:
         ax = gca()
@@ -1003,6 +1072,8 @@ def save_plot(filepath, overwrite=True, file_extension='pdf', dpi=DPI):
     :return: None
     """
 
+    from matplotlib.pyplot import savefig
+
     if not isfile(filepath
                   ) or overwrite:  # If the figure doesn't exist or overwriting
         establish_filepath(filepath)
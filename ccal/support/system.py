@@ -15,7 +15,6 @@ from os import environ
 from subprocess import PIPE, Popen, run
 
 from numpy.random import get_state, seed
-from pip import get_installed_distributions, main
 
 
 def run_command(command):
@@ -41,6 +40,9 @@ def install_libraries(libraries_needed):
     :return: None
     """
 
+    # Import pip only when installing; enumerating distributions is slow
+    from pip import get_installed_distributions, main
+
     print('Trying to install ({}) ...'.format(', '.join(libraries_needed)))
 
     # Get currently installed libraries
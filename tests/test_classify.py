@@ -0,0 +1,40 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import repeat
+from numpy.random import RandomState
+
+from ccal.machine_learning.classify import classify, fit_classifier
+
+
+def _make_training_and_classes(random_seed=0):
+    random_state = RandomState(random_seed)
+    classes = repeat([1, 2, 3], 20)
+    training = random_state.randn(60, 2) * 0.1 + classes[:, None]
+    return training, classes
+
+
+def test_fit_classifier_with_default_parameters():
+    training, classes = _make_training_and_classes()
+
+    clf = fit_classifier(training, classes)
+
+    assert (clf.predict(training) == classes).all()
+    # One-vs-rest decision function has 1 column per class
+    assert clf.decision_function(training).shape == (60, 3)
+
+
+def test_classify_predicts_testing():
+    training, classes = _make_training_and_classes()
+
+    assert (classify(training, classes, training[::20]) == [1, 2, 3]).all()
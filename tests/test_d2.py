@@ -0,0 +1,166 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import allclose, apply_along_axis, array, isnan, nan, where
+from numpy.random import RandomState
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal, assert_series_equal
+from pytest import mark, raises
+from scipy.stats import rankdata
+
+from ccal.support.d2 import normalize_2d_or_1d
+
+
+def _make_dataframe(n_rows=6, n_columns=9, random_seed=0):
+    random_state = RandomState(random_seed)
+    return DataFrame(
+        random_state.randn(n_rows, n_columns),
+        index=['R{}'.format(i) for i in range(n_rows)],
+        columns=['C{}'.format(i) for i in range(n_columns)])
+
+
+def _normalize_1d(a, method, rank_scale=10000, size=None):
+    """
+    Normalize 1 slice (a Series or array).
+    """
+
+    if size is None:
+        size = a.size
+
+    if method == '-0-':
+        std = a.std()
+        if std == 0:
+            return a / size
+        else:
+            return (a - a.mean()) / std
+
+    elif method == '0-1':
+        range_ = a.max() - a.min()
+        if range_ == 0:
+            return a / size
+        else:
+            return (a - a.min()) / range_
+
+    elif method == 'rank':
+        a = array(a, dtype=float)
+        is_nan = isnan(a)
+        ranks = where(is_nan, nan, 0)
+        ranks[~is_nan] = (rankdata(a[~is_nan]) - 1) * rank_scale
+        return ranks
+
+
+# ==============================================================================
+# normalize_2d_or_1d
+# ==============================================================================
+@mark.parametrize('method', ['-0-', '0-1'])
+@mark.parametrize('axis', [0, 1])
+def test_normalize_2d_or_1d_matches_normalizing_slice_by_slice(method, axis):
+    df = _make_dataframe()
+    df.iloc[0] = 1
+    df.iloc[:, 0] = 2
+    df.iloc[2, 3] = nan
+
+    assert_frame_equal(
+        normalize_2d_or_1d(df, method, axis=axis),
+        df.apply(_normalize_1d, method=method, axis=axis))
+
+
+@mark.parametrize('method', ['-0-', '0-1'])
+def test_normalize_2d_or_1d_globally(method):
+    df = _make_dataframe()
+
+    a = df.values
+    if method == '-0-':
+        normalized = (a - a.mean()) / a.std()
+    else:
+        normalized = (a - a.min()) / (a.max() - a.min())
+
+    assert allclose(normalize_2d_or_1d(df, method), normalized)
+    assert allclose(normalize_2d_or_1d(a, method), normalized)
+    assert allclose(normalize_2d_or_1d(a[0], method), _normalize_1d(
+        a[0], method))
+    assert_series_equal(
+        normalize_2d_or_1d(df.iloc[0], method),
+        _normalize_1d(df.iloc[0], method))
+
+
+@mark.parametrize('axis', [0, 1])
+def test_normalize_2d_or_1d_ranks_ties_and_nan(axis):
+    df = _make_dataframe().round()
+    df.iloc[1, 2] = df.iloc[4, 5] = nan
+
+    ranks = normalize_2d_or_1d(df, 'rank', axis=axis, rank_scale=10)
+
+    assert allclose(
+        ranks,
+        apply_along_axis(
+            _normalize_1d, axis, df.values, 'rank', rank_scale=10),
+        equal_nan=True)
+    assert isnan(ranks.iloc[1, 2]) and isnan(ranks.iloc[4, 5])
+
+    # Without ties and NaNs, ranks are argsort of argsort
+    a = _make_dataframe().values
+    assert allclose(
+        normalize_2d_or_1d(a, 'rank', axis=1, rank_scale=1),
+        a.argsort(axis=1).argsort(axis=1))
+
+
+def test_normalize_2d_or_1d_with_normalizing_parameters():
+    df = _make_dataframe()
+    mean, std = df.mean(axis=1) + 1, df.std(axis=1) * 2
+
+    assert_frame_equal(
+        normalize_2d_or_1d(
+            df, '-0-', axis=1, normalizing_mean=mean, normalizing_std=std),
+        df.sub(mean, axis=0).div(std, axis=0))
+    assert_frame_equal(
+        normalize_2d_or_1d(
+            df, '0-1', axis=0, normalizing_min=-3, normalizing_max=3),
+        (df + 3) / 6)
+
+    df.iloc[:, 0] = 1
+    assert (normalize_2d_or_1d(
+        df, '0-1', axis=0, normalizing_size=2).iloc[:, 0] == 0.5).all()
+
+
+def test_normalize_2d_or_1d_in_place():
+    df = _make_dataframe()
+    normalized = normalize_2d_or_1d(df, '0-1', axis=1)
+
+    assert normalize_2d_or_1d(df, '0-1', axis=1, inplace=True) is df
+    assert_frame_equal(df, normalized)
+
+    a = _make_dataframe().values.copy()
+    normalized = normalize_2d_or_1d(a, '-0-', axis=0)
+    assert normalize_2d_or_1d(a, '-0-', axis=0, inplace=True) is a
+    assert allclose(a, normalized)
+
+    s = _make_dataframe().iloc[0].copy()
+    normalized = normalize_2d_or_1d(s, 'rank')
+    assert normalize_2d_or_1d(s, 'rank', inplace=True) is s
+    assert_series_equal(s, normalized)
+
+    with raises(ValueError):
+        normalize_2d_or_1d(_make_dataframe().round().astype(int), '0-1',
+                           inplace=True)
+
+
+def test_normalize_2d_or_1d_with_bad_arguments():
+    df = _make_dataframe()
+
+    with raises(ValueError):
+        normalize_2d_or_1d(df, 'log')
+    with raises(ValueError):
+        normalize_2d_or_1d(df, '0-1', axis=2)
+    with raises(ValueError):
+        normalize_2d_or_1d(df.values.reshape(2, 3, 9), '0-1')
@@ -0,0 +1,93 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import allclose, argmax, array, empty, linspace, stack
+from pytest import importorskip
+
+from ccal.mathematics.equation import (define_skew_t_pdf,
+                                       define_x_coordinates_for_reflection)
+
+PARAMETERS = [(3, -2, 0, 1), (8, 0, 1, 0.5), (30, 5, -1, 2)]
+
+
+def _define_x_coordinates_for_reflection(function, x_grids):
+    """
+    Reflect x_grids around the x of the function's maximum grid by grid.
+    """
+
+    pivot_x = x_grids[argmax(function)]
+
+    x_grids_for_reflection = empty(len(x_grids))
+    for i, a_x in enumerate(x_grids):
+
+        distance_to_reflecting_x = abs(a_x - pivot_x) * 2
+
+        if a_x < pivot_x:  # Left of the pivot x
+            x_grids_for_reflection[i] = a_x + distance_to_reflecting_x
+
+        else:  # Right of the pivot x
+            x_grids_for_reflection[i] = a_x - distance_to_reflecting_x
+
+    return x_grids_for_reflection
+
+
+# ==============================================================================
+# define_skew_t_pdf
+# ==============================================================================
+def test_define_skew_t_pdf_matches_statsmodels():
+    skew_t = importorskip(
+        'statsmodels.sandbox.distributions.extras').ACSkewT_gen()
+    x = linspace(-6, 6, 100)
+
+    for df, shape, location, scale in PARAMETERS:
+        assert allclose(
+            define_skew_t_pdf(x, df, shape, location, scale),
+            skew_t.pdf(x, df, shape, loc=location, scale=scale))
+
+
+def test_define_skew_t_pdf_broadcasts_parameter_columns():
+    x = stack([linspace(-6, 6, 100) + i for i in range(len(PARAMETERS))])
+    df, shape, location, scale = (array(p)[:, None] for p in zip(*PARAMETERS))
+
+    pdfs = define_skew_t_pdf(x, df, shape, location, scale)
+
+    assert pdfs.shape == x.shape
+    for pdf, x_, parameters in zip(pdfs, x, PARAMETERS):
+        assert allclose(pdf, define_skew_t_pdf(x_, *parameters))
+
+
+# ==============================================================================
+# define_x_coordinates_for_reflection
+# ==============================================================================
+def test_define_x_coordinates_for_reflection_matches_grid_by_grid():
+    x_grids = linspace(-6, 6, 301)
+
+    for parameters in PARAMETERS:
+        pdf = define_skew_t_pdf(x_grids, *parameters)
+        assert allclose(
+            define_x_coordinates_for_reflection(pdf, x_grids),
+            _define_x_coordinates_for_reflection(pdf, x_grids))
+
+
+def test_define_x_coordinates_for_reflection_with_2d_stack():
+    x_grids = stack([linspace(-6 + i, 6 + 2 * i, 301) for i in range(3)])
+    pdfs = stack([
+        define_skew_t_pdf(x, *parameters)
+        for x, parameters in zip(x_grids, PARAMETERS)
+    ])
+
+    reflections = define_x_coordinates_for_reflection(pdfs, x_grids)
+
+    assert reflections.shape == x_grids.shape
+    for reflection, pdf, x in zip(reflections, pdfs, x_grids):
+        assert allclose(reflection, _define_x_coordinates_for_reflection(pdf, x))
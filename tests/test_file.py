@@ -0,0 +1,694 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from gzip import open as gzip_open
+from os import listdir, stat, utime
+from os.path import isdir, isfile
+
+from numpy import isnan, memmap
+from numpy.random import RandomState
+from pandas import DataFrame, concat, read_csv
+from pandas.testing import assert_frame_equal
+from pytest import raises
+
+from ccal.support.file import (GCTWriter, LazyMatrix, iter_gct,
+                               load_data_table, load_matrix, read_features,
+                               read_fpkm_trackings, read_gct, read_gene_sets,
+                               read_gff3, read_gmt, read_gmts, read_gtf,
+                               read_vcf, write_gct)
+
+
+def _make_matrix(n_rows=20, n_columns=8, random_seed=0):
+    return DataFrame(
+        RandomState(random_seed).randn(n_rows, n_columns),
+        index=['G{}'.format(i) for i in range(n_rows)],
+        columns=['S{}'.format(i) for i in range(n_columns)])
+
+
+def _write_gct_by_hand(df, filepath, descriptions=None):
+    if descriptions is None:
+        descriptions = df.index
+    with open(filepath, 'w') as f:
+        f.write('#1.2\n{}\t{}\n'.format(*df.shape))
+        f.write('\t'.join(['Name', 'Description'] + list(df.columns)) + '\n')
+        for (i, row), d in zip(df.iterrows(), descriptions):
+            f.write('\t'.join([i, d] + [str(v) for v in row]) + '\n')
+
+
+def _write_gmt_by_hand(gene_sets, filepath):
+    with open(filepath, 'w') as f:
+        for name, genes in gene_sets:
+            f.write('\t'.join([name, 'Description of ' + name] + genes) + '\n')
+
+
+def _read_gct_with_pandas(filepath):
+    df = read_csv(filepath, skiprows=2, sep='\t', index_col=0)
+    df.drop('Description', axis=1, inplace=True)
+    df.index.name = None
+    return df
+
+
+# ==============================================================================
+# .gct binary cache
+# ==============================================================================
+def test_read_gct_writes_and_reads_cache(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    _write_gct_by_hand(_make_matrix(), filepath)
+
+    df_0 = read_gct(filepath)
+    assert isfile('{}.cache/values.npy'.format(filepath))
+    df_1 = read_gct(filepath)
+
+    assert_frame_equal(df_0, _read_gct_with_pandas(filepath))
+    assert_frame_equal(df_1, df_0)
+    assert_frame_equal(
+        read_gct(filepath, drop_description=False),
+        read_gct(filepath, drop_description=False, cache=False))
+
+
+def test_read_gct_cache_is_invalidated_by_modification(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    _write_gct_by_hand(_make_matrix(), filepath)
+    read_gct(filepath)
+
+    # Same size, different values and modification time
+    df = _make_matrix()
+    df.iloc[0] = df.iloc[0].values[::-1]
+    _write_gct_by_hand(df, filepath)
+    s = stat(filepath)
+    utime(filepath, ns=(s.st_atime_ns, s.st_mtime_ns + 10**9))
+
+    assert_frame_equal(read_gct(filepath), _read_gct_with_pandas(filepath))
+    assert_frame_equal(read_gct(filepath), _read_gct_with_pandas(filepath))
+
+
+def test_read_gct_does_not_cache_non_numeric(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    df = _make_matrix().astype(str)
+    df.iloc[:, 0] = 'a'
+    _write_gct_by_hand(df, filepath)
+
+    read_gct(filepath)
+
+    assert not isdir('{}.cache'.format(filepath))
+
+
+# ==============================================================================
+# LazyMatrix
+# ==============================================================================
+def test_lazy_matrix_selects_as_eager_reindexing(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    df = _make_matrix()
+    _write_gct_by_hand(df, filepath)
+
+    lazy_matrix = LazyMatrix(filepath)
+
+    assert isinstance(lazy_matrix.values, memmap)
+    assert lazy_matrix.shape == df.shape
+    assert_frame_equal(lazy_matrix.to_dataframe(), df)
+
+    index = ['G3', 'G0', 'Missing', 'G19']
+    columns = ['S7', 'Missing', 'S1']
+    assert_frame_equal(
+        lazy_matrix.select(index=index, columns=columns),
+        df.reindex(index=index, columns=columns))
+    assert_frame_equal(
+        lazy_matrix.select(index=index), df.reindex(index=index))
+    assert_frame_equal(
+        lazy_matrix.select(columns=columns), df.reindex(columns=columns))
+
+
+def test_load_matrix_reads_only_present_columns(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    df = _make_matrix()
+    _write_gct_by_hand(df, filepath)
+
+    assert_frame_equal(
+        load_matrix(LazyMatrix(filepath), columns=['S2', 'Missing', 'S0']),
+        df[['S2', 'S0']])
+    assert load_matrix(df) is df
+
+
+# ==============================================================================
+# Streaming .gct
+# ==============================================================================
+def _write_gct_at_once(matrix, filepath, descriptions=None):
+    """
+    Write .gct with 1 DataFrame.to_csv.
+    """
+
+    obj = matrix.copy()
+    if obj.columns[0] != 'Description':
+        if descriptions:
+            obj.insert(0, 'Description', descriptions)
+        else:
+            obj.insert(0, 'Description', obj.index)
+    obj.index.name = 'Name'
+    obj.columns.name = None
+    with open(filepath, 'w') as f:
+        f.writelines('#1.2\n{}\t{}\n'.format(obj.shape[0], obj.shape[1] - 1))
+        obj.to_csv(f, sep='\t')
+
+
+def _read_bytes(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+def test_write_gct_in_chunks_matches_writing_at_once(tmpdir):
+    df = _make_matrix(n_rows=23)
+    descriptions = ['D{}'.format(i) for i in range(df.shape[0])]
+    df_with_descriptions = df.copy()
+    df_with_descriptions.insert(0, 'Description', descriptions)
+
+    for matrix, descriptions_ in ((df, None), (df, descriptions),
+                                  (df_with_descriptions, None)):
+        filepath_0 = str(tmpdir.join('at_once.gct'))
+        filepath_1 = str(tmpdir.join('in_chunks.gct'))
+        _write_gct_at_once(matrix, filepath_0, descriptions=descriptions_)
+        write_gct(matrix, filepath_1, descriptions=descriptions_, chunksize=7)
+
+        assert _read_bytes(filepath_1) == _read_bytes(filepath_0)
+
+
+def test_gct_writer_with_unknown_n_rows(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    df = _make_matrix(n_rows=23)
+
+    with GCTWriter(filepath, df.columns) as w:
+        for i in range(0, df.shape[0], 10):
+            w.write(df.iloc[i:i + 10])
+
+    with open(filepath) as f:
+        f.readline()
+        assert [int(n) for n in f.readline().split('\t')] == [23, 8]
+    assert_frame_equal(read_gct(filepath, cache=False), df)
+
+
+def test_gct_writer_checks_columns_and_n_rows(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    df = _make_matrix()
+
+    with raises(ValueError):
+        with GCTWriter(filepath, df.columns) as w:
+            w.write(df.iloc[:, ::-1])
+
+    with raises(ValueError):
+        with GCTWriter(filepath, df.columns, n_rows=df.shape[0] + 1) as w:
+            w.write(df)
+
+
+def test_write_gct_removes_stale_cache(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    write_gct(_make_matrix(random_seed=0), filepath)
+    read_gct(filepath)
+
+    df = _make_matrix(random_seed=1)
+    write_gct(df, filepath)
+
+    assert_frame_equal(read_gct(filepath), df)
+
+
+def test_iter_gct_matches_read_gct(tmpdir):
+    filepath = str(tmpdir.join('matrix.gct'))
+    _write_gct_by_hand(_make_matrix(n_rows=23), filepath)
+
+    blocks = list(iter_gct(filepath, chunksize=10))
+
+    assert [b.shape[0] for b in blocks] == [10, 10, 3]
+    assert_frame_equal(concat(blocks), read_gct(filepath, cache=False))
+    assert_frame_equal(
+        concat(iter_gct(filepath, chunksize=10, drop_description=False)),
+        read_gct(filepath, drop_description=False, cache=False))
+
+
+# ==============================================================================
+# Parallel loading
+# ==============================================================================
+def _make_data_table(tmpdir):
+    rows = []
+    for i in range(3):
+        filepath = str(tmpdir.join('data_{}.gct'.format(i)))
+        _write_gct_by_hand(_make_matrix(random_seed=i), filepath)
+        rows.append(('Data {}'.format(i), 'continuous', 'high', filepath))
+    return DataFrame(
+        rows, columns=['Data Name', 'Data Type', 'Emphasis',
+                       'Filepath']).set_index('Data Name')
+
+
+def test_load_data_table_with_threads(tmpdir):
+    data_table = _make_data_table(tmpdir)
+
+    data_1 = load_data_table(data_table, n_jobs=1)
+    data_2 = load_data_table(data_table, n_jobs=3)
+
+    assert list(data_2) == list(data_1) == list(data_table.index)
+    for data_name, data in data_1.items():
+        assert_frame_equal(data_2[data_name]['dataframe'], data['dataframe'])
+        assert data_2[data_name]['data_type'] == data['data_type']
+
+
+def test_load_data_table_lazily_selects_indices(tmpdir):
+    data_table = _make_data_table(tmpdir)
+    indices = {
+        'Data 0': {
+            'index': ['G2', 'G5'],
+            'alias': ['Gene 2', 'Gene 5']
+        },
+        'Data 2': {
+            'index': ['G1']
+        },
+    }
+
+    data = load_data_table(data_table, indices=indices, lazy=True, n_jobs=2)
+
+    assert sorted(data) == ['Data 0', 'Data 2']
+    df = _make_matrix(random_seed=0).loc[['G2', 'G5']]
+    df.index = ['Gene 2', 'Gene 5']
+    assert_frame_equal(data['Data 0']['dataframe'], df)
+    assert data['Data 0']['original_index'] == ['G2', 'G5']
+    assert_frame_equal(data['Data 2']['dataframe'],
+                       _make_matrix(random_seed=2).loc[['G1']])
+
+
+def test_read_gmts_with_processes(tmpdir):
+    filepaths = []
+    for i in range(3):
+        filepath = str(tmpdir.join('gene_sets_{}.gmt'.format(i)))
+        _write_gmt_by_hand(
+            [('Set {}{}'.format(i, j), ['G{}'.format(k) for k in range(i + j)])
+             for j in range(1, 4)], filepath)
+        filepaths.append(filepath)
+
+    gmt = read_gmts(filepaths)
+
+    assert gmt.shape == (9, 5)
+    assert_frame_equal(read_gmts(filepaths, n_jobs=3), gmt)
+    assert read_gmts(filepaths, collapse=True, n_jobs=3) == [
+        'G{}'.format(k) for k in range(5)
+    ]
+
+
+# ==============================================================================
+# GMT parsing
+# ==============================================================================
+GMT = ('Set B\tB\tG3\tG1\t\tG2\n'
+       'Set A\tA\tG4\tG1\t\t\n'
+       'Set C\tC\n'
+       'Set D\tD\tG5\r\n')
+
+
+def _read_gmt_by_line(filepath):
+    """
+    Read GMT line by line into a DataFrame.
+    """
+
+    rows = []
+    with open(filepath) as f:
+        for line in f.readlines():
+            line_split = line.strip().split('\t')
+            rows.append(line_split[:2] + sorted(
+                [g for g in line_split[2:] if g]))
+    gmt = DataFrame(rows)
+    gmt.set_index(0, inplace=True)
+    gmt.index.name = 'Gene Set'
+    gmt.sort_index(inplace=True)
+    gmt.columns = ['Description'
+                   ] + ['Gene {}'.format(i) for i in range(1, gmt.shape[1])]
+    return gmt
+
+
+def _write_gmt_text(tmpdir, filename, text=GMT):
+    filepath = str(tmpdir.join(filename))
+    if filepath.endswith('.gz'):
+        with gzip_open(filepath, 'wt', newline='') as f:
+            f.write(text)
+    else:
+        with open(filepath, 'w', newline='') as f:
+            f.write(text)
+    return filepath
+
+
+def test_read_gmt_matches_reading_line_by_line(tmpdir):
+    filepath = _write_gmt_text(tmpdir, 'gene_sets.gmt')
+    gmt = _read_gmt_by_line(filepath)
+
+    assert_frame_equal(read_gmt(filepath, drop_description=False), gmt)
+    assert_frame_equal(
+        read_gmt(
+            _write_gmt_text(tmpdir, 'gene_sets.gmt.gz'),
+            drop_description=False), gmt)
+    assert read_gmt(filepath, collapse=True) == ['G1', 'G2', 'G3', 'G4', 'G5']
+
+
+def test_read_gene_sets(tmpdir):
+    gene_sets = read_gene_sets(_write_gmt_text(tmpdir, 'gene_sets.gmt.gz'))
+
+    assert len(gene_sets) == 4
+    assert gene_sets.names.tolist() == ['Set A', 'Set B', 'Set C', 'Set D']
+    assert gene_sets.descriptions.tolist() == ['A', 'B', 'C', 'D']
+    assert gene_sets['Set B'].tolist() == ['G1', 'G2', 'G3']
+    assert gene_sets['Set C'].tolist() == []
+    assert gene_sets.sizes.tolist() == [2, 3, 0, 1]
+    assert [(n, g.tolist()) for n, g in gene_sets.items()][:2] == [
+        ('Set A', ['G1', 'G4']), ('Set B', ['G1', 'G2', 'G3'])
+    ]
+
+    selected = gene_sets.select(['Set D', 'Set B', 'Missing'])
+    assert selected.names.tolist() == ['Set B', 'Set D']
+    assert selected['Set D'].tolist() == ['G5']
+    assert selected.collapse() == ['G1', 'G2', 'G3', 'G5']
+
+
+def test_read_gene_sets_from_files_and_selected(tmpdir):
+    filepath_0 = _write_gmt_text(tmpdir, 'gene_sets_0.gmt')
+    filepath_1 = _write_gmt_text(tmpdir, 'gene_sets_1.gmt',
+                                 'Set 0\t0\tG9\tG0\n')
+
+    gene_sets = read_gene_sets([filepath_1, filepath_0], gene_sets='Set 0')
+    assert gene_sets.names.tolist() == ['Set 0']
+    assert gene_sets['Set 0'].tolist() == ['G0', 'G9']
+
+    gene_sets = read_gene_sets([filepath_1, filepath_0],
+                               gene_sets=['Set 0', 'Set A'])
+    assert gene_sets.names.tolist() == ['Set 0', 'Set A']
+    assert gene_sets.collapse() == ['G0', 'G1', 'G4', 'G9']
+
+
+# ==============================================================================
+# VCF
+# ==============================================================================
+VCF_META_INFORMATION = (
+    '##fileformat=VCFv4.2\n'
+    '##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">\n'
+    '##INFO=<ID=A.B,Number=1,Type=Float,Description="Dotted">\n'
+    '##INFO=<ID=AxB,Number=1,Type=Float,Description="Not A.B">\n'
+    '##INFO=<ID=DB,Number=0,Type=Flag,Description="dbSNP">\n'
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+    '##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Quality">\n')
+VCF_HEADER = [
+    'CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT',
+    'S1', 'S2'
+]
+VCF_DATA = [
+    ['1', '100', 'rs1', 'A', 'G', '50', 'PASS', 'DP=10;AxB=9;DB', 'GT:GQ',
+     '0/1:30', '1/1:.'],
+    ['1', '200', '.', 'C', 'T', '.', 'PASS', 'DP=20;A.B=0.5', 'GT', '0/0',
+     '0/1'],
+    ['2', '50', 'rs2', 'G', 'A', '10', 'q10', 'DBX;DP=.', 'GT:GQ', '1/1:99',
+     '0/0:5'],
+]
+
+
+def _write_vcf(tmpdir, filename, header=VCF_HEADER, data=VCF_DATA):
+    text = VCF_META_INFORMATION + '#' + '\t'.join(header) + '\n' + ''.join(
+        '\t'.join(row[:len(header)]) + '\n' for row in data)
+    filepath = str(tmpdir.join(filename))
+    if filepath.endswith('.gz'):
+        with gzip_open(filepath, 'wt') as f:
+            f.write(text)
+    else:
+        with open(filepath, 'w') as f:
+            f.write(text)
+    return filepath
+
+
+def test_read_vcf(tmpdir):
+    for filename in ['variants.vcf', 'variants.vcf.gz']:
+        vcf = read_vcf(_write_vcf(tmpdir, filename))
+
+        assert vcf['samples'] == ['S1', 'S2']
+        assert vcf['header'] == VCF_HEADER
+        assert vcf['meta_information']['INFO']['DP']['Type'] == 'Integer'
+        assert vcf['meta_information']['INFO']['A.B']['Type'] == 'Float'
+        assert sorted(vcf['meta_information']['FORMAT']) == ['GQ', 'GT']
+
+        df = vcf['data']
+        assert df.columns.tolist() == VCF_HEADER
+        assert df['POS'].tolist() == [100, 200, 50]
+        assert df['QUAL'].iloc[0] == 50 and isnan(df['QUAL'].iloc[1])
+        assert df['S2'].tolist() == ['1/1:.', '0/1', '0/0:5']
+
+
+def test_read_vcf_selects_columns_and_extracts_fields(tmpdir):
+    vcf = read_vcf(
+        _write_vcf(tmpdir, 'variants.vcf'),
+        columns=['CHROM', 'POS'],
+        samples=['S2'],
+        info_fields=['DP', 'A.B', 'DB'],
+        format_fields=['GT', 'GQ'])
+
+    df = vcf['data']
+    assert df.columns.tolist() == [
+        'CHROM', 'POS', 'S2', 'INFO_DP', 'INFO_A.B', 'INFO_DB', 'S2_GT',
+        'S2_GQ'
+    ]
+    assert df['INFO_DP'].tolist()[:2] == [10, 20]
+    assert isnan(df['INFO_DP'].iloc[2])
+    # 'A.B' isn't a pattern matching 'AxB'
+    assert isnan(df['INFO_A.B'].iloc[0]) and df['INFO_A.B'].iloc[1] == 0.5
+    # 'DB' flag isn't set by 'DBX'
+    assert df['INFO_DB'].tolist() == [True, False, False]
+    assert df['S2_GT'].tolist() == ['1/1', '0/1', '0/0']
+    assert isnan(df['S2_GQ'].iloc[0]) and isnan(df['S2_GQ'].iloc[1])
+    assert df['S2_GQ'].iloc[2] == 5
+
+    with raises(ValueError):
+        read_vcf(_write_vcf(tmpdir, 'variants.vcf'), samples=['S3'])
+
+
+def test_read_vcf_in_region_and_chunks(tmpdir):
+    filepath = _write_vcf(tmpdir, 'variants.vcf')
+
+    assert read_vcf(filepath, region='1:150-250')['data']['POS'].tolist() == [
+        200
+    ]
+    assert read_vcf(filepath, region='1')['data']['POS'].tolist() == [100, 200]
+    assert read_vcf(
+        filepath, columns=['ID'], region='2:1')['data'].columns.tolist() == [
+            'ID', 'S1', 'S2'
+        ]
+
+    vcf = read_vcf(filepath, info_fields=['DP'], chunksize=2)
+    blocks = list(vcf['data'])
+    assert [b.shape[0] for b in blocks] == [2, 1]
+    assert_frame_equal(
+        concat(blocks),
+        read_vcf(filepath, info_fields=['DP'])['data'])
+
+
+def test_read_sites_only_vcf(tmpdir):
+    filepath = _write_vcf(tmpdir, 'sites.vcf', header=VCF_HEADER[:8])
+
+    vcf = read_vcf(filepath, info_fields=['DP'], format_fields=['GT'])
+
+    assert vcf['samples'] == []
+    assert vcf['data'].columns.tolist() == VCF_HEADER[:8] + ['INFO_DP']
+    assert vcf['data']['INFO_DP'].tolist()[:2] == [10, 20]
+
+
+# ==============================================================================
+# GTF and GFF3
+# ==============================================================================
+def _make_gene_rows(n=40, random_seed=0):
+    random_state = RandomState(random_seed)
+    rows = []
+    for i in range(n):
+        start = random_state.randint(1, 10000)
+        rows.append(('chr{}'.format(1 + i % 2),
+                     ['ensembl', 'havana'][i % 3 == 0],
+                     ['gene', 'transcript'][i % 4 == 0], start,
+                     start + random_state.randint(0, 2000), '+-.'[i % 3],
+                     'ENSG{:03d}'.format(i), 'GENE{}'.format(i % 30), i % 5))
+    return rows
+
+
+def _write_gtf(tmpdir, filename, rows):
+    lines = ['#!genome-build test\n']
+    for contig, source, type_, start, end, strand, id_, name, _ in rows:
+        lines.append('\t'.join([
+            contig, source, type_, str(start), str(end), '.', strand, '.',
+            'gene_id "{}"; gene_name "{}"; gene_source "{}";'.format(
+                id_, name, source)
+        ]) + '\n')
+    filepath = str(tmpdir.join(filename))
+    with open(filepath, 'w') as f:
+        f.writelines(lines)
+    return filepath
+
+
+def _write_gff3(tmpdir, filename, rows):
+    lines = ['##gff-version 3\n']
+    for contig, source, type_, start, end, strand, id_, name, version in rows:
+        lines.append('\t'.join([
+            contig, source, type_, str(start), str(end), '.', strand, '.',
+            'ID=gene:{0};Name={1};gene_id={0};version={2}'.format(
+                id_, name, version)
+        ]) + '\n')
+    filepath = str(tmpdir.join(filename))
+    with open(filepath, 'w') as f:
+        f.writelines(lines)
+    return filepath
+
+
+def test_read_features_matches_read_gtf(tmpdir):
+    filepath = _write_gtf(tmpdir, 'genes.gtf', _make_gene_rows())
+    with open(filepath) as f:
+        features, feature_to_id = read_gtf(f, {'ensembl'}, {'gene'})
+
+    df = read_features(filepath, sources=['ensembl'], types=['gene']).df
+
+    assert sorted(df['gene_id']) == sorted(features)
+    for _, row in df.iterrows():
+        feature = features[row['gene_id']]
+        # read_gtf keeps 1-based starts
+        assert (row['contig'], row['start'] + 1, row['end'], row['strand'],
+                row['gene_name']) == (feature['contig'], feature['start'],
+                                      feature['end'], feature['strand'],
+                                      feature['gene_name'])
+    assert read_features(
+        filepath, sources=['ensembl'],
+        types=['gene']).map_names_to_ids().to_dict() == feature_to_id
+
+
+def test_read_features_matches_read_gff3(tmpdir):
+    filepath = _write_gff3(tmpdir, 'genes.gff3', _make_gene_rows())
+    with open(filepath) as f:
+        features, feature_to_id = read_gff3(f, {'havana'}, {'gene'})
+
+    df = read_features(filepath, sources=['havana'], types=['gene']).df
+
+    assert sorted(df['gene_id']) == sorted(features)
+    for _, row in df.iterrows():
+        feature = features[row['gene_id']]
+        assert (row['contig'], row['start'], row['end'], row['strand'],
+                row['Name'], float(row['version'])) == (
+                    feature['contig'], feature['start'], feature['end'],
+                    feature['strand'], feature['gene_name'],
+                    feature['version'])
+
+
+def test_features_query_matches_checking_every_feature(tmpdir):
+    features = read_features(
+        _write_gtf(tmpdir, 'genes.gtf', _make_gene_rows(n=200)), cache=False)
+    df = features.df
+
+    for contig, start, end in [('chr1', 0, 100), ('chr1', 2000, 2500),
+                               ('chr2', 5000, 5001), ('chr2', 0, 20000),
+                               ('chr3', 0, 20000), ('chr1', 3000, 3000)]:
+        is_overlapping = (df['contig'] == contig) & (df['start'] < end) & (
+            start < df['end'])
+        assert_frame_equal(
+            features.query(contig, start, end), df[is_overlapping])
+
+
+def _count_cached_tables(filepath):
+    return sum(
+        fn.endswith('.pkl') for fn in listdir('{}.cache'.format(filepath)))
+
+
+def test_read_features_cache_is_invalidated_by_modification(tmpdir):
+    rows = _make_gene_rows()
+    filepath = _write_gtf(tmpdir, 'genes.gtf', rows)
+
+    df = read_features(filepath).df
+    assert _count_cached_tables(filepath) == 1
+    assert_frame_equal(read_features(filepath).df, df)
+    assert_frame_equal(read_features(filepath, cache=False).df, df)
+
+    # Same size, different content and modification time
+    rows[0], rows[1] = rows[1], rows[0]
+    _write_gtf(tmpdir, 'genes.gtf', rows)
+    s = stat(filepath)
+    utime(filepath, ns=(s.st_atime_ns, s.st_mtime_ns + 10**9))
+
+    assert_frame_equal(
+        read_features(filepath).df, read_features(filepath, cache=False).df)
+    assert read_features(filepath).df['gene_id'].iloc[0] == 'ENSG001'
+    assert _count_cached_tables(filepath) == 1
+
+    # Different attributes are cached separately
+    assert read_features(filepath, attributes=['gene_name']).df.columns[
+        -1] == 'gene_name'
+
+
+# ==============================================================================
+# fpkm_tracking
+# ==============================================================================
+FPKM_TRACKING_COLUMNS = [
+    'tracking_id', 'class_code', 'nearest_ref_id', 'gene_id',
+    'gene_short_name', 'tss_id', 'locus', 'length', 'coverage', 'FPKM',
+    'FPKM_conf_lo', 'FPKM_conf_hi', 'FPKM_status'
+]
+
+
+def _write_fpkm_trackings(tmpdir, n_samples=3, n_transcripts=50):
+    filepaths = []
+    for i in range(n_samples):
+        random_state = RandomState(i)
+        rows = []
+        for j in range(n_transcripts):
+            gene = random_state.choice(['-'] + [
+                'GENE{}'.format(k) for k in range(10 + i)
+            ])
+            fpkm = random_state.rand() * 100
+            rows.append([
+                'T{}'.format(j), '-', '-', 'XLOC_{}'.format(j), gene, '-',
+                'chr1:1-100', '-', '-',
+                str(fpkm), str(fpkm / 2), str(fpkm * 2), 'OK'
+            ])
+        directory = tmpdir.mkdir('Sample {}'.format(i))
+        filepath = str(directory.join('genes.fpkm_tracking'))
+        with open(filepath, 'w') as f:
+            f.write('\t'.join(FPKM_TRACKING_COLUMNS) + '\n')
+            f.writelines('\t'.join(row) + '\n' for row in rows)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def _read_fpkm_tracking_with_all_columns(filepath):
+    fpkm = read_csv(filepath, sep='\t', index_col=4)[['FPKM']]
+    fpkm = fpkm.loc[fpkm.index != '-', :]
+    return fpkm.groupby(level=0).mean()['FPKM']
+
+
+def test_read_fpkm_trackings_matches_reading_all_columns(tmpdir):
+    filepaths = _write_fpkm_trackings(tmpdir)
+
+    g_x_s = read_fpkm_trackings(filepaths)
+
+    df = concat(
+        [_read_fpkm_tracking_with_all_columns(fp) for fp in filepaths],
+        axis=1).sort_index()
+    df.columns = ['Sample 0', 'Sample 1', 'Sample 2']
+    df.index.name = None
+    assert_frame_equal(g_x_s, df)
+    assert g_x_s.loc['GENE11', 'Sample 0':'Sample 1'].isnull().all()
+    assert_frame_equal(read_fpkm_trackings(filepaths, n_jobs=3), g_x_s)
+
+    with raises(ValueError):
+        read_fpkm_trackings(filepaths, samples=['A', 'B'])
+
+
+def test_read_fpkm_trackings_writes_cached_gct(tmpdir):
+    filepaths = _write_fpkm_trackings(tmpdir)
+    gct_filepath = str(tmpdir.join('fpkm'))
+
+    g_x_s = read_fpkm_trackings(
+        filepaths, samples=['A', 'B', 'C'], gct_filepath=gct_filepath)
+
+    gct_filepath += '.gct'
+    assert isfile('{}.cache/values.npy'.format(gct_filepath))
+    assert_frame_equal(read_gct(gct_filepath), g_x_s)
+    assert_frame_equal(read_gct(gct_filepath, cache=False), g_x_s)
+    assert_frame_equal(LazyMatrix(gct_filepath).to_dataframe(), g_x_s)
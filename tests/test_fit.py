@@ -0,0 +1,105 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from os.path import isfile
+
+from numpy import allclose, log, nan, sqrt
+from numpy.random import RandomState
+from pandas import DataFrame
+from pytest import mark, raises
+
+from ccal.computational_cancer_biology.mutual_vulnerability import \
+    fit_essentiality
+from ccal.machine_learning.fit import fit_skew_t
+from ccal.mathematics.equation import define_skew_t_pdf
+
+# Features are selected with DataFrame.ix (removed in pandas 1)
+requires_ix = mark.skipif(
+    not hasattr(DataFrame, 'ix'), reason='needs pandas with DataFrame.ix')
+
+
+def _sample_skew_t(n, df, shape, location, scale, random_seed=0):
+    """
+    Sample skew-t as skew-normal divided by sqrt(chi-square / df).
+    """
+
+    random_state = RandomState(random_seed)
+    delta = shape / sqrt(1 + shape**2)
+    z = delta * abs(random_state.randn(n)) + sqrt(
+        1 - delta**2) * random_state.randn(n)
+    return location + scale * z / sqrt(random_state.chisquare(df, n) / df)
+
+
+def _compute_log_likelihood(x, df, shape, location, scale):
+    return log(define_skew_t_pdf(x, df, shape, location, scale)).sum()
+
+
+# ==============================================================================
+# fit_skew_t
+# ==============================================================================
+@mark.parametrize('shape', [-4, 0, 4])
+def test_fit_skew_t_maximizes_likelihood(shape):
+    x = _sample_skew_t(2000, 8, shape, 1, 2)
+
+    n, df, shape_, location, scale = fit_skew_t(x)
+
+    assert n == 2000
+    assert _compute_log_likelihood(x, df, shape_, location, scale) >= \
+        _compute_log_likelihood(x, 8, shape, 1, 2)
+    assert abs(scale - 2) < 0.5
+    if shape:
+        assert shape * shape_ > 0
+
+
+def test_fit_skew_t_ignores_nan():
+    x = _sample_skew_t(500, 8, 2, 0, 1)
+
+    assert allclose(fit_skew_t(x), fit_skew_t(list(x) + [nan, nan]))
+
+
+@mark.parametrize('x', [[], [1], [1, 1, 1], [2, nan, 2]])
+def test_fit_skew_t_with_0_variance(x):
+    with raises(ValueError):
+        fit_skew_t(x)
+
+
+# ==============================================================================
+# fit_essentiality
+# ==============================================================================
+@requires_ix
+def test_fit_essentiality_skips_constant_features_and_reuses_cache(
+        tmpdir, capsys):
+    random_state = RandomState(0)
+    feature_x_sample = DataFrame(
+        random_state.randn(4, 100), index=['A', 'B', 'C', 'D'])
+    feature_x_sample.loc['C'] = 1
+    filepath_prefix = str(tmpdir.join('essentiality_'))
+
+    f_x_f = fit_essentiality(feature_x_sample, filepath_prefix, cache=True)
+
+    assert sorted(f_x_f.index) == ['A', 'B', 'D']
+    assert f_x_f['N'].eq(100).all()
+    assert isfile('{}skew_t_fit.txt'.format(filepath_prefix))
+    assert allclose(f_x_f.loc['A'], fit_skew_t(feature_x_sample.loc['A']))
+
+    # Only the changed feature is refit
+    feature_x_sample.loc['B'] *= 2
+    capsys.readouterr()
+
+    f_x_f_2 = fit_essentiality(feature_x_sample, filepath_prefix, cache=True)
+
+    out = capsys.readouterr().out
+    assert 'Using 2 cached fits' in out
+    assert 'Fitting 1 features with 1 jobs' in out
+    assert allclose(f_x_f_2.loc[['A', 'D']], f_x_f.loc[['A', 'D']])
+    assert allclose(f_x_f_2.loc['B'], fit_skew_t(feature_x_sample.loc['B']))
@@ -0,0 +1,73 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from os.path import abspath, dirname
+from subprocess import check_output
+from sys import executable
+
+from pytest import importorskip, mark, raises
+
+import ccal
+
+HEAVY_MODULES = [
+    'matplotlib', 'seaborn', 'statsmodels', 'sklearn', 'rpy2', 'networkx',
+    'pip'
+]
+
+
+def _list_imported_heavy_modules(module):
+    """
+    Import module in a fresh interpreter and list the heavy modules it imported.
+    """
+
+    return check_output(
+        [
+            executable, '-c',
+            'import sys, {}; print(" ".join(m for m in {} if m in '
+            'sys.modules))'.format(module, HEAVY_MODULES)
+        ],
+        cwd=dirname(dirname(abspath(__file__)))).decode().split()
+
+
+@mark.parametrize('module', [
+    'ccal', 'ccal.support.plot',
+    'ccal.computational_cancer_biology.association',
+    'ccal.computational_cancer_biology.mutual_vulnerability',
+    'ccal.computational_cancer_biology.oncogps'
+])
+def test_import_does_not_import_heavy_modules(module):
+    assert _list_imported_heavy_modules(module) == []
+
+
+def test_lazy_attributes():
+    from ccal.computational_cancer_biology import oncogps
+    from ccal.support.file import read_gct
+
+    assert ccal.read_gct is read_gct
+    assert ccal.oncogps is oncogps
+    assert {'read_gct', 'oncogps', 'plot_heatmap'} <= set(dir(ccal))
+
+    with raises(AttributeError):
+        ccal.missing
+
+
+def test_lazy_colormaps():
+    colors = importorskip('matplotlib.colors')
+    from ccal.support import plot
+
+    for name in plot.CMAP_NAMES:
+        assert isinstance(getattr(plot, name), colors.Colormap)
+    assert plot.CMAP_BINARY is plot.CMAP_BINARY
+
+    with raises(AttributeError):
+        plot.CMAP_MISSING
@@ -0,0 +1,89 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import allclose, exp, linspace, pi, sqrt, triu_indices
+from numpy.random import RandomState
+from pytest import raises
+from scipy.optimize import minimize_scalar
+
+from ccal.mathematics.information import (estimate_bandwidth_bcv,
+                                          estimate_kde_2d)
+
+
+# ==============================================================================
+# estimate_kde_2d
+# ==============================================================================
+def test_estimate_kde_2d_matches_sum_of_gaussian_kernels():
+    random_state = RandomState(0)
+    x = random_state.rand(30)
+    y = random_state.rand(30)
+    bandwidths = (0.4, 0.6)
+
+    x_grids, y_grids, densities = estimate_kde_2d(
+        x, y, bandwidths, n_grids=7, lims=(0, 1, 0, 1))
+
+    assert allclose(x_grids, linspace(0, 1, 7))
+    assert allclose(y_grids, linspace(0, 1, 7))
+    assert densities.shape == (7, 7)
+
+    # MASS::kde2d's Gaussian kernels have standard deviation bandwidth / 4
+    h_x, h_y = bandwidths[0] / 4, bandwidths[1] / 4
+    for i, g_x in enumerate(x_grids):
+        for j, g_y in enumerate(y_grids):
+            density = (exp(-0.5 * ((g_x - x) / h_x)**2 - 0.5 * (
+                (g_y - y) / h_y)**2) / (2 * pi * h_x * h_y)).mean()
+            assert allclose(densities[i, j], density)
+
+
+def test_estimate_kde_2d_integrates_to_1():
+    random_state = RandomState(0)
+    x = random_state.randn(50)
+    y = random_state.randn(50)
+
+    x_grids, y_grids, densities = estimate_kde_2d(
+        x, y, (1, 1), n_grids=200, lims=(-6, 6, -6, 6))
+
+    assert allclose(
+        densities.sum() * (x_grids[1] - x_grids[0]) *
+        (y_grids[1] - y_grids[0]),
+        1,
+        atol=1e-3)
+
+
+# ==============================================================================
+# estimate_bandwidth_bcv
+# ==============================================================================
+def test_estimate_bandwidth_bcv_matches_unbinned_bcv():
+    x = RandomState(0).randn(200)
+    n = x.size
+
+    # Biased cross-validation score over all pairwise distances (not binned)
+    i, j = triu_indices(n, 1)
+    distances = abs(x[i] - x[j])
+
+    def bcv_score(h):
+        h /= 4
+        delta = (distances / h)**2
+        return (1 + (exp(-delta / 4) * (delta**2 - 12 * delta + 12)).sum() /
+                (32 * n)) / (2 * n * h * sqrt(pi))
+
+    h_max = 1.144 * x.std(ddof=1) * n**(-1 / 5) * 4
+    bandwidth = minimize_scalar(
+        bcv_score, bounds=(0.1 * h_max, h_max), method='bounded').x
+
+    assert allclose(estimate_bandwidth_bcv(x), bandwidth, rtol=0.05)
+
+
+def test_estimate_bandwidth_bcv_with_1_value():
+    with raises(ValueError):
+        estimate_bandwidth_bcv([1])
@@ -0,0 +1,123 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import (allclose, arange, asarray, isfinite, isin, ix_, save,
+                   zeros)
+from numpy.linalg import norm, pinv
+from numpy.random import RandomState
+from pandas import DataFrame
+from sklearn.model_selection import KFold
+
+from ccal.machine_learning.matrix_decompose import (compute_nmf_bcv_errors,
+                                                    nmf, nmf_mini_batch)
+
+
+def _make_low_rank_matrix(n_rows=60, n_columns=250, k=3, random_seed=0):
+    random_state = RandomState(random_seed)
+    return random_state.rand(n_rows, k).dot(random_state.rand(k, n_columns))
+
+
+# ==============================================================================
+# nmf_mini_batch
+# ==============================================================================
+def test_nmf_mini_batch_reconstructs_low_rank_matrix():
+    a = _make_low_rank_matrix()
+
+    w, h, e = nmf_mini_batch(a, 3, batch_size=50, n_epochs=10)
+
+    assert w.shape == (60, 3) and h.shape == (3, 250)
+    assert (0 <= w).all() and (0 <= h).all()
+    assert allclose(e, norm(a - w.dot(h)))
+    assert e / norm(a) < 0.05
+
+
+def test_nmf_mini_batch_reads_npy_as_memmap(tmpdir):
+    a = _make_low_rank_matrix()
+    filepath = str(tmpdir.join('a.npy'))
+    save(filepath, a)
+
+    w_0, h_0, e_0 = nmf_mini_batch(a, 3, batch_size=50, n_epochs=2)
+    w_1, h_1, e_1 = nmf_mini_batch(filepath, 3, batch_size=50, n_epochs=2)
+
+    assert allclose(w_0, w_1) and allclose(h_0, h_1) and allclose(e_0, e_1)
+
+
+def test_nmf_mini_batch_with_all_0_first_block():
+    a = _make_low_rank_matrix()
+    a[:, :50] = 0
+
+    w, h, e = nmf_mini_batch(a, 3, batch_size=50, n_epochs=10)
+
+    assert isfinite(w).all() and isfinite(h).all()
+    assert e / norm(a) < 0.05
+
+
+def test_nmf_mini_batch_with_all_0_matrix():
+    w, h, e = nmf_mini_batch(zeros((10, 20)), 2, batch_size=5, n_epochs=2)
+
+    assert isfinite(w).all() and isfinite(h).all()
+    assert e == 0
+
+
+def test_nmf_mini_batch_through_nmf_keeps_dataframe_labels():
+    a = DataFrame(_make_low_rank_matrix())
+
+    nmf_result = nmf(a, [3], algorithm='Mini-batch', batch_size=50)[3]
+
+    assert nmf_result['w'].index.equals(a.index)
+    assert nmf_result['h'].columns.equals(a.columns)
+
+
+# ==============================================================================
+# compute_nmf_bcv_errors
+# ==============================================================================
+def test_compute_nmf_bcv_errors_matches_held_out_block_prediction():
+    x = _make_low_rank_matrix(n_rows=20, n_columns=16)
+
+    errors = compute_nmf_bcv_errors(
+        x, [2, 3], n_folds=2, algorithm='Lee & Seung', random_seed=0)
+
+    assert errors.shape == (2 * 2 * 2, 5)
+    assert errors.columns.tolist() == [
+        'K', 'Repeat', 'Row Fold', 'Column Fold', 'Error'
+    ]
+    assert (0 <= errors['Error']).all()
+
+    # Recompute the error of the 1st held-out block for k=2
+    rows = list(KFold(n_splits=2, shuffle=True, random_state=0).split(x))[0][1]
+    columns = list(KFold(n_splits=2, shuffle=True,
+                         random_state=0).split(x.T))[0][1]
+    is_row = isin(arange(x.shape[0]), rows)
+    is_column = isin(arange(x.shape[1]), columns)
+    a = x[ix_(is_row, is_column)]
+    b = x[ix_(is_row, ~is_column)]
+    c = x[ix_(~is_row, is_column)]
+    d = x[ix_(~is_row, ~is_column)]
+    nmf_result = nmf(d, 2, algorithm='Lee & Seung', random_seed=0)[2]
+    w, h = asarray(nmf_result['w']), asarray(nmf_result['h'])
+    a_predicted = b.dot(pinv(h)).dot(pinv(w).dot(c))
+
+    error = errors[(errors['K'] == 2) & (errors['Row Fold'] == 0) &
+                   (errors['Column Fold'] == 0)]['Error'].iloc[0]
+    assert allclose(error, ((a - a_predicted)**2).sum() / (a**2).sum())
+
+
+def test_compute_nmf_bcv_errors_with_processes():
+    x = _make_low_rank_matrix(n_rows=20, n_columns=16)
+
+    errors_1 = compute_nmf_bcv_errors(
+        x, 2, n_repeats=2, algorithm='Lee & Seung', n_jobs=1)
+    errors_2 = compute_nmf_bcv_errors(
+        x, 2, n_repeats=2, algorithm='Lee & Seung', n_jobs=2)
+
+    assert errors_1.equals(errors_2)
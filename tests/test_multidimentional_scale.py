@@ -0,0 +1,83 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import allclose, sqrt
+from numpy.random import RandomState
+from pandas import DataFrame
+from scipy.spatial.distance import cdist
+
+from ccal.machine_learning.multidimentional_scale import classical_mds, mds
+
+
+def _make_points(n_points=8, random_seed=0):
+    return DataFrame(RandomState(random_seed).rand(n_points, 2))
+
+
+def test_classical_mds_keeps_distances_of_2d_points():
+    points = _make_points()
+    distances = cdist(points, points)
+
+    coordinates = classical_mds(distances)
+
+    assert coordinates.shape == (8, 2)
+    assert allclose(cdist(coordinates, coordinates), distances)
+
+
+def test_mds_from_classical_keeps_distances_of_2d_points():
+    points = _make_points()
+
+    coordinates = mds(points, init='classical', n_init=2, eps=1e-9)
+
+    assert allclose(
+        cdist(coordinates, coordinates), cdist(points, points), atol=1e-3)
+
+    assert allclose(
+        mds(points, init='classical', n_init=4, n_jobs=2),
+        mds(points, init='classical', n_init=4, n_jobs=1))
+
+
+def test_mds_with_cache_computes_distances_once():
+    points = _make_points(random_seed=1)
+    n_calls = []
+
+    # Association whose distance (1 - association) is Euclidean
+    def compute_association(x, y):
+        n_calls.append(1)
+        return 1 - sqrt(((x - y)**2).sum())
+
+    coordinates = mds(
+        points,
+        dissimilarity=compute_association,
+        init='classical',
+        n_init=1,
+        cache=True)
+    n_calls_after_1st_mds = len(n_calls)
+    assert n_calls_after_1st_mds
+
+    # Same matrix and parameters reuse coordinates
+    coordinates[:] = 0
+    assert allclose(
+        mds(points,
+            dissimilarity=compute_association,
+            init='classical',
+            n_init=1,
+            cache=True),
+        mds(points, init='classical', n_init=1))
+
+    # Other parameters reuse distances
+    mds(points,
+        dissimilarity=compute_association,
+        init='classical',
+        n_init=2,
+        cache=True)
+    assert len(n_calls) == n_calls_after_1st_mds
@@ -0,0 +1,109 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import (abs, allclose, argmax, argmin, array, cumsum, isnan,
+                   linspace, nan, sign, where)
+from numpy.random import RandomState
+from pandas import DataFrame
+from pytest import importorskip, mark
+
+from ccal.computational_cancer_biology.mutual_vulnerability import (
+    _make_essentiality_matrix, make_essentiality_matrix)
+
+# Fit and sample matrices are aligned with DataFrame.ix (removed in pandas 1)
+requires_ix = mark.skipif(
+    not hasattr(DataFrame, 'ix'), reason='needs pandas with DataFrame.ix')
+
+
+def _make_feature_x_sample_and_fit(n_features=6, n_samples=50,
+                                   random_seed=0):
+    random_state = RandomState(random_seed)
+    feature_x_sample = DataFrame(
+        random_state.randn(n_features, n_samples),
+        index=['F{}'.format(i) for i in range(n_features)],
+        columns=['S{}'.format(i) for i in range(n_samples)])
+    feature_x_sample.iloc[0, :5] = nan
+    feature_x_fit = DataFrame(
+        [[n_samples, 5 + i, (-1)**i * (1 + i / 2), 0.1 * i, 0.5 + 0.2 * i]
+         for i in range(n_features)],
+        index=feature_x_sample.index,
+        columns=['N', 'DF', 'Shape', 'Location', 'Scale'])
+    return feature_x_sample, feature_x_fit
+
+
+def _make_essentiality_row(values, fit, n_grids, function, factor):
+    """
+    Compute 1 feature's essentiality indices value by value.
+    """
+
+    skew_t = importorskip(
+        'statsmodels.sandbox.distributions.extras').ACSkewT_gen()
+
+    n, df, shape, location, scale = fit
+    values = array(values, dtype=float)
+    grids = linspace(values[~isnan(values)].min(),
+                     values[~isnan(values)].max(), n_grids)
+
+    f1 = skew_t.pdf(grids, df, shape, loc=location, scale=scale)
+    pivot_x = grids[argmax(f1)]
+    f2 = skew_t.pdf(2 * pivot_x - grids, df, shape, loc=location, scale=scale)
+
+    if function == 'scaled_fractional_difference':
+        ei = where(f2 < f1, ((f1 - f2) / f1)**scale, 0)
+    else:  # 'carea1 - carea2'
+        darea1 = f1 / f1.sum() * (grids[1] - grids[0])
+        darea2 = f2 / f2.sum() * (grids[1] - grids[0])
+        if 0 < shape:
+            ei = cumsum(darea1[::-1])[::-1] - cumsum(darea2[::-1])[::-1]
+        else:
+            ei = cumsum(darea1) - cumsum(darea2)
+    ei = (ei - ei.min()) / (ei.max() - ei.min())
+
+    return array([
+        nan if isnan(v) else ei[argmin(abs(grids - v))] * sign(shape) * factor
+        for v in values
+    ])
+
+
+@mark.parametrize('function',
+                  ['scaled_fractional_difference', 'carea1 - carea2'])
+def test_make_essentiality_matrix_matches_value_by_value(function):
+    feature_x_sample, feature_x_fit = _make_feature_x_sample_and_fit()
+
+    matrix = _make_essentiality_matrix(
+        (feature_x_sample, feature_x_fit, 500, function, 2, 4))
+
+    assert matrix.index.equals(feature_x_sample.index)
+    assert matrix.columns.equals(feature_x_sample.columns)
+    for (f_i, values), (_, fit) in zip(feature_x_sample.iterrows(),
+                                        feature_x_fit.iterrows()):
+        assert allclose(
+            matrix.loc[f_i],
+            _make_essentiality_row(values, fit, 500, function, 2),
+            equal_nan=True)
+
+
+@requires_ix
+def test_make_essentiality_matrix_matches_fits_by_feature():
+    feature_x_sample, feature_x_fit = _make_feature_x_sample_and_fit()
+
+    matrix = make_essentiality_matrix(
+        feature_x_sample, feature_x_fit, n_grids=500)
+
+    assert matrix.equals(
+        make_essentiality_matrix(
+            feature_x_sample,
+            feature_x_fit.iloc[::-1],
+            n_grids=500,
+            n_jobs=2,
+            batch_size=2))
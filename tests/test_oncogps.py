@@ -0,0 +1,394 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from colorsys import hsv_to_rgb, rgb_to_hsv
+
+from numpy import allclose, exp, eye, linspace, nan, repeat, sqrt
+from numpy.random import RandomState
+from pandas import DataFrame, Index
+from pytest import importorskip, mark, raises
+from sklearn.svm import SVR
+
+from ccal.computational_cancer_biology import oncogps
+from ccal.computational_cancer_biology.oncogps import (
+    OncoGPSModel, _compute_annotation_grids_and_probabilities,
+    _compute_component_ratios, _compute_sample_coordinates,
+    _compute_state_grids_and_probabilities, _predict_grids, _shade_grids,
+    _smooth_on_grids, load_oncogps_model, make_oncogps_maps)
+from ccal.mathematics.information import (estimate_bandwidth_bcv,
+                                          estimate_kde_2d)
+from ccal.support.d2 import normalize_2d_or_1d
+
+# Fitting drops uniform H-matrix slices with DataFrame.ix (removed in pandas 1)
+requires_ix = mark.skipif(
+    not hasattr(DataFrame, 'ix'), reason='needs pandas with DataFrame.ix')
+
+
+def _make_h_and_states(n_components=3, n_samples=60, random_seed=0):
+    h = DataFrame(
+        RandomState(random_seed).rand(n_components, n_samples),
+        index=['C{}'.format(i + 1) for i in range(n_components)],
+        columns=['S{}'.format(i) for i in range(n_samples)])
+    return h, h.values.argmax(axis=0) + 1
+
+
+def _make_equilateral_components():
+    return DataFrame(
+        [[0.5, sqrt(3) / 2], [1, 0], [0, 0]],
+        index=['C1', 'C2', 'C3'],
+        columns=['x', 'y'])
+
+
+# ==============================================================================
+# OncoGPSModel
+# ==============================================================================
+def test_oncogps_model_transforms_with_fitted_values():
+    model = OncoGPSModel()
+    model.components_ = _make_equilateral_components()
+    model.n_pulls_ = 3
+    model.power_ = 1
+
+    # A sample pulled by only 1 component is placed on that component
+    h = DataFrame(eye(3), index=['C1', 'C2', 'C3'], columns=['S1', 'S2', 'S3'])
+
+    coordinates = model.transform(h, normalization=None)
+
+    assert coordinates.index.equals(h.columns)
+    assert allclose(coordinates, model.components_)
+
+    # Constructor parameters are not used for transforming
+    assert model.components is None
+    assert model.n_pulls is None and model.power is None
+
+
+@requires_ix
+def test_oncogps_model_fit_keeps_parameters():
+    h, states = _make_h_and_states()
+
+    model = OncoGPSModel(equilateral=True, n_grids=32).fit(h, states)
+
+    assert model.components is None
+    assert model.n_pulls is None and model.power is None
+    assert model.components_.shape == (3, 2)
+    assert model.n_pulls_ == 3 and 0 < model.power_
+
+    # Refitting with other parameters refits the fitted values
+    model.n_pulls = 2
+    model.power = 2
+    model.fit(h, states)
+    assert model.n_pulls_ == 2 and model.power_ == 2
+
+
+@requires_ix
+def test_oncogps_model_saves_and_loads(tmpdir):
+    h, states = _make_h_and_states()
+    filepath = str(tmpdir.join('model.pkl'))
+
+    model = OncoGPSModel(equilateral=True, n_grids=32).fit(h, states)
+    model.save(filepath)
+    loaded_model = load_oncogps_model(filepath)
+
+    assert loaded_model.predict(h).equals(model.predict(h))
+    assert allclose(loaded_model.transform(h), model.transform(h))
+
+
+def test_oncogps_model_gets_classifier_features_by_training_h_rows():
+    h = DataFrame(
+        RandomState(0).rand(3, 4),
+        index=['C1', 'C2', 'C3'],
+        columns=['S1', 'S2', 'S3', 'S4'])
+    coordinates = DataFrame(
+        RandomState(1).rand(3, 2), index=['S3', 'S1', 'S2'])
+
+    model = OncoGPSModel(classification_space='nd')
+    model.training_h_index = Index(['C3', 'C1'])
+    assert allclose(
+        model._get_classifier_features(h, coordinates),
+        h.loc[['C3', 'C1'], ['S3', 'S1', 'S2']].T)
+
+    model.classification_space = '2d'
+    assert allclose(
+        model._get_classifier_features(h, coordinates), coordinates)
+
+    model.classification_space = '3d'
+    with raises(ValueError):
+        model._get_classifier_features(h, coordinates)
+
+
+@requires_ix
+@mark.parametrize('classification_space', ['2d', 'nd'])
+def test_oncogps_model_classifies_states(classification_space):
+    h, states = _make_h_and_states()
+
+    model = OncoGPSModel(
+        equilateral=True,
+        n_grids=32,
+        classification_space=classification_space,
+        state_probability=True).fit(h, states)
+
+    assert 0.8 < (model.predict(h) == states).mean()
+    assert 0.8 < (model.predict(h, batch_size=7) == states).mean()
+
+    probabilities = model.predict_proba(h)
+    assert probabilities.shape == (60, 3)
+    assert allclose(probabilities.sum(axis=1), 1)
+
+
+# ==============================================================================
+# Sample coordinates
+# ==============================================================================
+def test_compute_sample_coordinates_matches_sample_by_sample():
+    random_state = RandomState(0)
+    components = random_state.rand(5, 2)
+    h = random_state.rand(5, 20)
+
+    for n_pulls in (1, 3, 5):
+        coordinates = _compute_sample_coordinates(components, h, n_pulls, 1.5)
+
+        assert coordinates.shape == (20, 2)
+        for i in range(20):
+            c = h[:, i].copy()
+            c[c < sorted(c)[-n_pulls]] = 0
+            assert allclose(coordinates[i],
+                            (c[:, None]**1.5 * components).sum(axis=0) /
+                            (c**1.5).sum())
+
+
+def test_compute_sample_coordinates_ignores_nan():
+    components = _make_equilateral_components()
+    h = DataFrame([[nan, 0.5], [1, 0.5], [1, nan]], index=components.index)
+
+    coordinates = _compute_sample_coordinates(components, h, 3, 1)
+
+    assert allclose(coordinates, [[0.5, 0], [0.75, sqrt(3) / 4]])
+
+
+# ==============================================================================
+# Component ratios
+# ==============================================================================
+def test_compute_component_ratios_matches_sample_by_sample():
+    h = DataFrame(RandomState(0).rand(5, 20))
+
+    for n in (1, 2, 0.5):
+        ratios = _compute_component_ratios(h, n)
+
+        assert ratios.index.equals(h.columns)
+        n_ = int(5 * n) if n < 1 else n
+        for c, column in h.items():
+            column = column.sort_values(ascending=False)
+            assert allclose(ratios[c], column[:n_].sum() /
+                            column[n_:].sum() * column.sum())
+
+
+def test_compute_component_ratios_ignores_nan():
+    h = DataFrame([[3, 3], [2, nan], [1, 1]])
+
+    assert allclose(_compute_component_ratios(h, 1), [3 / 3 * 6, 3 / 1 * 4])
+
+
+# ==============================================================================
+# State grids
+# ==============================================================================
+def test_compute_state_grids_and_probabilities_takes_most_probable_state():
+    random_state = RandomState(0)
+    states = repeat([1, 2, 3], 20)
+    samples = DataFrame({
+        'x': random_state.rand(60) * 0.3 + (states - 1) * 0.3,
+        'y': random_state.rand(60),
+        'state': states
+    })
+
+    grids, grids_probabilities = _compute_state_grids_and_probabilities(
+        samples, 16, 1)
+
+    assert grids.shape == grids_probabilities.shape == (16, 16)
+
+    bandwidths = [
+        estimate_bandwidth_bcv(samples['x']),
+        estimate_bandwidth_bcv(samples['y'])
+    ]
+    kdes = {
+        s: estimate_kde_2d(
+            samples['x'][states == s],
+            samples['y'][states == s],
+            bandwidths,
+            n_grids=16,
+            lims=(0, 1, 0, 1))[2]
+        for s in (1, 2, 3)
+    }
+    for i in range(16):
+        for j in range(16):
+            s = max(kdes, key=lambda s: kdes[s][i, j])
+            assert grids[i, j] == s
+            assert allclose(grids_probabilities[i, j], kdes[s][i, j])
+
+    # States are left to right
+    assert (grids[0] == 1).all() and (grids[-1] == 3).all()
+
+
+# ==============================================================================
+# Annotation grids
+# ==============================================================================
+def _make_annotated_samples(n_samples=40, random_seed=0):
+    random_state = RandomState(random_seed)
+    samples = DataFrame(
+        random_state.rand(n_samples, 2),
+        index=['S{}'.format(i) for i in range(n_samples)],
+        columns=['x', 'y'])
+    annotation = samples['x'] + random_state.randn(n_samples) * 0.1
+    annotation.iloc[::10] = nan
+    return samples, annotation
+
+
+@requires_ix
+def test_compute_annotation_grids_and_probabilities_matches_grid_by_grid():
+    samples, annotation = _make_annotated_samples()
+
+    grids, grids_probabilities = _compute_annotation_grids_and_probabilities(
+        samples, annotation, 8)
+
+    # Fit and predict each grid 1 at a time
+    is_ = annotation.notnull()
+    values = normalize_2d_or_1d(annotation, '-0-')
+    svr_state = SVR().fit(samples[is_].values, values[is_].values)
+    svr_probability = SVR().fit(samples[is_].values,
+                                  values[is_].abs().values)
+    for i, fraction_i in enumerate(linspace(0, 1, 8)):
+        for j, fraction_j in enumerate(linspace(0, 1, 8)):
+            p = svr_state.predict([[fraction_i, fraction_j]])[0]
+            assert grids[i, j] == (1 if values.mean() <= p else -1)
+            assert allclose(grids_probabilities[i, j],
+                            svr_probability.predict(
+                                [[fraction_i, fraction_j]])[0])
+
+    grids_2, grids_probabilities_2 = \
+        _compute_annotation_grids_and_probabilities(
+            samples, annotation, 8, n_jobs=2)
+    assert (grids == grids_2).all()
+    assert allclose(grids_probabilities, grids_probabilities_2)
+
+
+def test_predict_grids_with_each_regressor():
+    samples, annotation = _make_annotated_samples()
+    is_ = annotation.notnull()
+    regressors = (SVR().fit(samples[is_].values, annotation[is_].values),
+                  SVR().fit(samples[is_].values,
+                            annotation[is_].abs().values))
+    coordinates = RandomState(1).rand(10, 2)
+
+    predictions = _predict_grids((regressors, coordinates))
+
+    assert len(predictions) == 2
+    for r, p in zip(regressors, predictions):
+        assert allclose(p, r.predict(coordinates))
+
+
+def test_smooth_on_grids_matches_nadaraya_watson():
+    random_state = RandomState(0)
+    coordinates = random_state.rand(30, 2)
+    values = random_state.randn(30)
+    fractions = linspace(0, 1, 6)
+
+    smoothed, smoothed_abs = _smooth_on_grids(
+        coordinates, (values, abs(values)), fractions)
+
+    bandwidths = coordinates.std(axis=0, ddof=1) * 30**(-1 / 6)
+    for i, fraction_i in enumerate(fractions):
+        for j, fraction_j in enumerate(fractions):
+            weights = exp(-0.5 * (
+                (fraction_i - coordinates[:, 0]) / bandwidths[0])**2 - 0.5 * (
+                    (fraction_j - coordinates[:, 1]) / bandwidths[1])**2)
+            assert allclose(smoothed[i, j],
+                            (weights * values).sum() / weights.sum())
+            assert allclose(smoothed_abs[i, j],
+                            (weights * abs(values)).sum() / weights.sum())
+
+
+# ==============================================================================
+# Plot
+# ==============================================================================
+def test_shade_grids_matches_grid_by_grid_shading():
+    random_state = RandomState(0)
+    rgbs = random_state.rand(5, 5, 3)
+    probabilities = random_state.rand(5, 5)
+    mask = 0.3 < random_state.rand(5, 5)
+
+    image = _shade_grids(rgbs, probabilities, mask, alpha_factor=1.5)
+
+    o = (probabilities - probabilities.min()) / (
+        probabilities.max() - probabilities.min())
+    for i in range(5):
+        for j in range(5):
+            if mask[i, j]:
+                hsv = rgb_to_hsv(*rgbs[i, j])
+                rgb = hsv_to_rgb(hsv[0], min(o[i, j] * 1.5, 1),
+                                 hsv[2] * o[i, j] + (1 - o[i, j]))
+            else:
+                rgb = (1, 1, 1)
+            assert allclose(image[i, j], rgb)
+
+
+# ==============================================================================
+# Onco-GPS maps
+# ==============================================================================
+def test_make_oncogps_maps_plots_each_annotation_with_given_model(
+        monkeypatch, tmpdir):
+    args = []
+    monkeypatch.setattr(oncogps, '_make_oncogps_map', args.append)
+    model = OncoGPSModel()
+    annotations = DataFrame(
+        [[1, 2], [3, 4]], index=['A', 'B/C'], columns=['S1', 'S2'])
+
+    returned_model = make_oncogps_maps(
+        None,
+        None,
+        annotations,
+        str(tmpdir),
+        extension='png',
+        model=model,
+        title='Map',
+        state_probability=True)
+
+    assert returned_model is model
+    assert len(args) == 2
+    for a, annotation_name, filename in zip(args, ('A', 'B/C'),
+                                            ('A.png', 'B_C.png')):
+        assert a[0] is model and a[1] is None
+        assert a[2] == annotation_name
+        assert a[3].equals(annotations.loc[annotation_name])
+        assert a[4] == str(tmpdir.join(filename))
+        # Only make_oncogps parameters are passed to make_oncogps
+        assert a[6] == {'title': 'Map'}
+
+
+@requires_ix
+def test_make_oncogps_maps_saves_each_map(tmpdir):
+    importorskip('seaborn')
+    h, states = _make_h_and_states()
+    annotations = DataFrame(
+        RandomState(1).rand(2, h.shape[1]),
+        index=['A', 'B'],
+        columns=h.columns)
+
+    model = make_oncogps_maps(
+        h,
+        states,
+        annotations,
+        str(tmpdir),
+        extension='png',
+        n_jobs=2,
+        equilateral=True,
+        n_grids=32)
+
+    assert isinstance(model, OncoGPSModel)
+    assert tmpdir.join('A.png').check() and tmpdir.join('B.png').check()
@@ -0,0 +1,75 @@
+"""
+Computational Cancer Analysis Library
+
+Authors:
+    Huwate (Kwat) Yeerna (Medetgul-Ernar)
+        kwat.medetgul.ernar@gmail.com
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+
+    Pablo Tamayo
+        ptamayo@ucsd.edu
+        Computational Cancer Analysis Laboratory, UCSD Cancer Center
+"""
+
+from numpy import allclose, column_stack
+from numpy.random import RandomState
+from pandas import DataFrame
+from pytest import raises
+from scipy.optimize import nnls
+
+from ccal.machine_learning.solve import (nnls_batch,
+                                         solve_matrix_linear_equation)
+
+
+def _make_a_and_b(n=30, k=4, m=25, random_seed=0):
+    random_state = RandomState(random_seed)
+    a = random_state.rand(n, k)
+    # Some true coefficients are 0 and b is noisy, so some constraints bind
+    x = random_state.rand(k, m) * (0.3 < random_state.rand(k, m))
+    b = a.dot(x) + random_state.randn(n, m) * 0.1
+    return a, b
+
+
+def _nnls_by_column(a, b):
+    return column_stack([nnls(a, b[:, i])[0] for i in range(b.shape[1])])
+
+
+def test_nnls_batch_matches_scipy_nnls():
+    a, b = _make_a_and_b()
+
+    assert allclose(nnls_batch(a, b), _nnls_by_column(a, b), atol=1e-6)
+
+
+def test_nnls_batch_from_initial_x():
+    a, b = _make_a_and_b()
+    x = RandomState(1).rand(a.shape[1], b.shape[1])
+
+    assert allclose(nnls_batch(a, b, x=x), _nnls_by_column(a, b), atol=1e-6)
+
+
+def test_solve_matrix_linear_equation_methods_agree():
+    a, b = _make_a_and_b()
+    x = _nnls_by_column(a, b)
+
+    assert allclose(solve_matrix_linear_equation(a, b, method='nnls'), x)
+    assert allclose(
+        solve_matrix_linear_equation(a, b, method='nnls', n_jobs=2), x)
+    assert allclose(
+        solve_matrix_linear_equation(a, b, method='batch_nnls'), x, atol=1e-6)
+
+
+def test_solve_matrix_linear_equation_keeps_dataframe_labels():
+    a, b = _make_a_and_b()
+    a = DataFrame(a, columns=['C{}'.format(i) for i in range(a.shape[1])])
+    b = DataFrame(b, columns=['S{}'.format(i) for i in range(b.shape[1])])
+
+    x = solve_matrix_linear_equation(a, b, method='batch_nnls')
+
+    assert x.index.equals(a.columns) and x.columns.equals(b.columns)
+
+
+def test_solve_matrix_linear_equation_with_unknown_method():
+    a, b = _make_a_and_b()
+
+    with raises(ValueError):
+        solve_matrix_linear_equation(a, b, method='lstsq')